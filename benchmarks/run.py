@@ -0,0 +1,261 @@
+"""Benchmark harness for the load, plot, pointer-drag and export paths.
+
+Runs headless on the Agg backend. Every (phase, size) case runs in a fresh process so the
+recorded peak RSS belongs to that case alone. Results are written as JSON and two result
+files can be compared:
+
+    python -m benchmarks.run --rows 1e4,1e5,1e6 --output results.json
+    python -m benchmarks.run compare old.json new.json
+"""
+import argparse
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+PHASES = ('load', 'load_cached', 'plot', 'drag', 'export')
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+class _Var:
+    """Stands in for a tk.StringVar so PointerManager runs without Tk."""
+
+    def __init__(self):
+        self.value = ""
+
+    def set(self, value):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+
+class _App:
+    """Stands in for CSVPlotterApp: the attributes PointerManager writes back to."""
+    _selected_start_dt = None
+    _selected_end_dt = None
+
+
+def _plot(engine, y_count):
+    """Does what CSVPlotterApp.plot_columns does, minus Tk. Returns (fig, ax, decimator)."""
+    import matplotlib.pyplot as plt
+    from classes.decimator import LineDecimator
+
+    y_cols = [c['name'] for c in engine.column_info() if c['kind'] == 'numeric' and c['name'] != 'timestamp'][:y_count]
+    fig, ax = plt.subplots(figsize=(10, 7))
+    decimator = LineDecimator(ax, engine.x_values('timestamp'))
+    for y_col in y_cols:
+        y = engine.y_values(y_col)
+        decimator.add_line(y, pyramid=engine.pyramid(y_col) if decimator.wants_pyramid(len(y)) else None, label=y_col)
+    ax.legend()
+    ax.grid(True)
+    fig.tight_layout()
+    decimator.connect(fig.canvas)
+    fig.canvas.draw()
+    return fig, ax, decimator
+
+
+def run_case(phase, file_path, cache_dir, y_count, drag_events):
+    """Runs one phase in the current process and returns its measurements."""
+    import matplotlib
+    matplotlib.use('Agg')
+    from classes.column_cache import ColumnCache
+    from classes.data_engine import DataEngine
+
+    cache = ColumnCache(cache_dir=cache_dir) if phase == 'load_cached' else None
+    engine = DataEngine(cache=cache)
+    result = {'baseline_rss_mb': peak_rss_mb()}
+
+    started = time.perf_counter()
+    engine.load(file_path)
+    load_seconds = time.perf_counter() - started
+    if phase in ('load', 'load_cached'):
+        result['seconds'] = load_seconds
+
+    elif phase == 'plot':
+        started = time.perf_counter()
+        fig, ax, _ = _plot(engine, y_count)
+        result['seconds'] = time.perf_counter() - started
+
+        # Zoom into the middle tenth, as the toolbar would
+        x_min, x_max = ax.get_xlim()
+        span = x_max - x_min
+        started = time.perf_counter()
+        ax.set_xlim(x_min + 0.45 * span, x_min + 0.55 * span)
+        fig.canvas.draw()
+        result['zoom_seconds'] = time.perf_counter() - started
+
+    elif phase == 'drag':
+        from matplotlib.backend_bases import MouseEvent
+        from classes.pointer_manager import PointerManager
+
+        fig, ax, decimator = _plot(engine, y_count)
+        x_min, x_max = ax.get_xlim()
+        span = x_max - x_min
+        start_line = ax.axvline(x_min + 0.2 * span, color='red', linestyle='--', linewidth=2)
+        end_line = ax.axvline(x_min + 0.8 * span, color='green', linestyle='--', linewidth=2)
+        # No coalescing here: every event renders a frame, so this measures the per-frame cost
+        manager = PointerManager(ax, fig.canvas, start_line, end_line, (x_min, x_max), _Var(), _Var(), _App(),
+                                 min_frame_interval=0, sample_index=engine.axis_index('timestamp', decimator.x),
+                                 count_var=_Var())
+
+        def event_at(name, x_data, button=None):
+            x_px, y_px = ax.transData.transform((x_data, sum(ax.get_ylim()) / 2))
+            return MouseEvent(name, fig.canvas, x_px, y_px, button=button)
+
+        manager.on_press(event_at('button_press_event', x_min + 0.2 * span, button=1))
+        latencies = []
+        for i in range(drag_events):
+            event = event_at('motion_notify_event', x_min + (0.2 + 0.5 * i / drag_events) * span)
+            started = time.perf_counter()
+            manager.on_motion(event)
+            fig.canvas.flush_events()
+            latencies.append(time.perf_counter() - started)
+        manager.on_release(event_at('button_release_event', x_min + 0.7 * span, button=1))
+
+        result['selected_rows'] = manager.selected_row_count()
+        latencies.sort()
+        result['seconds'] = sum(latencies)
+        result['event_mean_ms'] = 1000 * sum(latencies) / len(latencies)
+        result['event_p95_ms'] = 1000 * latencies[int(0.95 * (len(latencies) - 1))]
+
+    elif phase == 'export':
+        first, last = engine.time_range()
+        span = last - first
+        out_dir = tempfile.mkdtemp(prefix="csv-editor-bench-")
+        try:
+            started = time.perf_counter()
+            rows = engine.export(first + span // 4, last - span // 4, os.path.join(out_dir, 'export.csv'))
+            result['seconds'] = time.perf_counter() - started
+            result['exported_rows'] = rows
+        finally:
+            shutil.rmtree(out_dir, ignore_errors=True)
+
+    result['peak_rss_mb'] = peak_rss_mb()
+    return result
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run(args):
+    from benchmarks.synthetic import generate_sensor_csv
+    import matplotlib
+    import numpy
+    import pandas
+
+    sizes = [int(float(s)) for s in args.rows.split(',')]
+    phases = args.phases.split(',')
+    unknown = set(phases) - set(PHASES)
+    if unknown:
+        sys.exit(f"Unknown phase(s): {', '.join(sorted(unknown))} (expected {', '.join(PHASES)})")
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="csv-editor-bench-")
+    os.makedirs(work_dir, exist_ok=True)
+    report = {
+        'meta': {
+            'revision': _git_revision(),
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': numpy.__version__,
+            'pandas': pandas.__version__,
+            'matplotlib': matplotlib.__version__,
+            'columns': args.columns,
+            'dtypes': args.dtypes,
+        },
+        'results': [],
+    }
+
+    context = multiprocessing.get_context('spawn')
+    try:
+        for rows in sizes:
+            file_path = os.path.join(work_dir, f"synthetic_{rows}x{args.columns}.csv")
+            if not os.path.exists(file_path):
+                print(f"Generating {rows:,} rows -> {file_path}", file=sys.stderr)
+                generate_sensor_csv(file_path, rows, columns=args.columns, dtypes=tuple(args.dtypes.split(',')),
+                                    gap_every=args.gap_every, gap_ns=args.gap_ns)
+            cache_dir = os.path.join(work_dir, 'cache')
+
+            for phase in phases:
+                if phase == 'load_cached':
+                    # Populate the cache in a throwaway process so the timed run is a pure reopen
+                    with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                        pool.submit(run_case, 'load_cached', file_path, cache_dir, args.y_columns, args.drag_events).result()
+
+                with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    result = pool.submit(run_case, phase, file_path, cache_dir, args.y_columns, args.drag_events).result()
+                result.update({'phase': phase, 'rows': rows, 'file_bytes': os.path.getsize(file_path)})
+                report['results'].append(result)
+                print(f"{phase:<12} {rows:>12,} rows  {result['seconds']:9.3f}s  peak {result['peak_rss_mb']:8.1f} MB",
+                      file=sys.stderr)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    with open(args.output, 'w') as fh:
+        json.dump(report, fh, indent=2)
+    print(f"Results written to {args.output}", file=sys.stderr)
+
+
+def compare(args):
+    with open(args.baseline) as fh:
+        baseline = json.load(fh)
+    with open(args.candidate) as fh:
+        candidate = json.load(fh)
+
+    old = {(r['phase'], r['rows']): r for r in baseline['results']}
+    print(f"{'phase':<12} {'rows':>12}  {'old s':>9} {'new s':>9} {'ratio':>7}  {'old MB':>8} {'new MB':>8}")
+    for r in candidate['results']:
+        o = old.get((r['phase'], r['rows']))
+        if o is None:
+            continue
+        ratio = r['seconds'] / o['seconds'] if o['seconds'] else float('inf')
+        print(f"{r['phase']:<12} {r['rows']:>12,}  {o['seconds']:9.3f} {r['seconds']:9.3f} {ratio:7.2f}x"
+              f"  {o['peak_rss_mb']:8.1f} {r['peak_rss_mb']:8.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the CSV editor's load, plot, drag and export paths.")
+    subparsers = parser.add_subparsers(dest="command")
+
+    compare_parser = subparsers.add_parser("compare", help="Compare two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.set_defaults(func=compare)
+
+    parser.add_argument("--rows", default="1e4,1e5,1e6", help="Comma-separated sizes, e.g. 1e4,1e6,1e8")
+    parser.add_argument("--columns", type=int, default=8)
+    parser.add_argument("--dtypes", default="float64", help="Comma-separated channel dtypes (see benchmarks.synthetic)")
+    parser.add_argument("--gap-every", type=int, default=0)
+    parser.add_argument("--gap-ns", type=int, default=0)
+    parser.add_argument("--phases", default=",".join(PHASES))
+    parser.add_argument("--y-columns", type=int, default=3, help="Channels plotted in the plot/drag phases")
+    parser.add_argument("--drag-events", type=int, default=100)
+    parser.add_argument("--work-dir", help="Keep generated files here (reused across runs) instead of a temp dir")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.set_defaults(func=run)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+DTYPES = ('float64', 'float32', 'int', 'category')
+
+
+def generate_sensor_csv(file_path, rows, columns=8, dtypes=('float64',), start_ns=1_700_000_000_000_000_000,
+                        period_ns=1_000_000, gap_every=0, gap_ns=0, block_rows=1_000_000, seed=0):
+    """Writes a synthetic sensor log with an integer nanosecond 'timestamp' column.
+
+    `columns` data channels cycle through `dtypes` ('float64', 'float32', 'int', 'category').
+    Every `gap_every` rows the clock jumps forward by an extra `gap_ns` to mimic recorder dropouts.
+    Rows are generated and written in blocks, so files far larger than memory can be produced.
+    """
+    rng = np.random.default_rng(seed)
+    unknown = set(dtypes) - set(DTYPES)
+    if unknown:
+        raise ValueError(f"Unknown dtype(s): {', '.join(sorted(unknown))} (expected {', '.join(DTYPES)})")
+
+    channel_types = [dtypes[i % len(dtypes)] for i in range(columns)]
+    phases = rng.uniform(0, 2 * np.pi, size=columns)
+    labels = np.array(['idle', 'walk', 'run', 'drive'])
+
+    with open(file_path, 'w', newline='') as fh:
+        for block_start in range(0, max(rows, 1), block_rows):
+            n = min(block_rows, rows - block_start)
+            if n <= 0:
+                break
+            row_ids = np.arange(block_start, block_start + n)
+            timestamps = start_ns + row_ids * period_ns
+            if gap_every and gap_ns:
+                timestamps = timestamps + (row_ids // gap_every) * gap_ns
+
+            block = {'timestamp': timestamps}
+            t = row_ids * (period_ns / 1e9)
+            for i, kind in enumerate(channel_types):
+                name = f"ch{i:03d}"
+                if kind == 'category':
+                    block[name] = labels[(row_ids // 5000 + i) % len(labels)]
+                    continue
+                signal = np.sin(2 * np.pi * 0.5 * t + phases[i]) + rng.normal(0, 0.1, n)
+                if kind == 'int':
+                    block[name] = np.round(signal * 1000).astype(np.int64)
+                elif kind == 'float32':
+                    block[name] = signal.astype(np.float32)
+                else:
+                    block[name] = signal
+
+            pd.DataFrame(block).to_csv(fh, header=(block_start == 0), index=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic sensor CSV for benchmarking.")
+    parser.add_argument("output")
+    parser.add_argument("--rows", type=float, default=1e6, help="Number of rows (e.g. 1e7)")
+    parser.add_argument("--columns", type=int, default=8)
+    parser.add_argument("--dtypes", default="float64", help=f"Comma-separated, cycled over the channels: {', '.join(DTYPES)}")
+    parser.add_argument("--period-ns", type=int, default=1_000_000, help="Sample period in nanoseconds")
+    parser.add_argument("--gap-every", type=int, default=0, help="Insert a timestamp gap every N rows")
+    parser.add_argument("--gap-ns", type=int, default=0, help="Length of each gap in nanoseconds")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    generate_sensor_csv(args.output, int(args.rows), columns=args.columns, dtypes=tuple(args.dtypes.split(',')),
+                        period_ns=args.period_ns, gap_every=args.gap_every, gap_ns=args.gap_ns, seed=args.seed)
+
+
+if __name__ == "__main__":
+    main()
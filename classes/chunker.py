@@ -0,0 +1,231 @@
+import concurrent.futures
+import copy
+import multiprocessing
+import os
+import queue
+import threading
+
+import numpy as np
+import pandas as pd
+
+from classes.export_writer import open_block_writer, write_rows
+from classes.profiler import profiler
+
+
+def read_regions(file_path):
+    """Reads marker-defined regions from a CSV with 'start' and 'end' timestamp columns."""
+    regions = pd.read_csv(file_path)
+    missing = {'start', 'end'} - set(regions.columns)
+    if missing:
+        raise ValueError(f"Regions file is missing column(s): {', '.join(sorted(missing))}")
+    return list(zip(regions['start'].tolist(), regions['end'].tolist()))
+
+
+def window_bounds(index, window, stride, unit='rows', regions=None):
+    """Returns an (n, 2) int array of [lo, hi) positions, in the index's sorted order, for every window.
+
+    With unit='rows', `window` and `stride` count rows; with unit='time' they are in timestamp
+    units and windows are half-open [t, t + window). `regions` restricts windows to a list of
+    (start_ts, end_ts) pairs; by default the whole file is one region. Overlap is stride < window.
+    """
+    if window <= 0 or stride <= 0:
+        raise ValueError("Window length and stride must be positive.")
+
+    n_valid = index.n_valid
+    if n_valid == 0:
+        return np.empty((0, 2), dtype=np.int64)
+    values = index.sorted_values[:n_valid]
+
+    if regions is None:
+        regions = [(values[0], values[-1])]
+
+    bounds = []
+    for start_ts, end_ts in regions:
+        if unit == 'rows':
+            lo, hi = index.bounds(start_ts, end_ts)
+            hi = min(hi, n_valid)
+            starts = np.arange(lo, hi - window + 1, stride, dtype=np.int64)
+            bounds.append(np.column_stack((starts, starts + window)))
+        elif unit == 'time':
+            start_ts = max(start_ts, values[0])
+            end_ts = min(end_ts, values[-1])
+            span = end_ts - start_ts
+            if span < window:
+                continue
+            # Only windows that fit entirely inside the region: start + window <= end
+            starts = start_ts + stride * np.arange(int((span - window) // stride) + 1)
+            lo = np.searchsorted(values, starts, side='left')
+            hi = np.searchsorted(values, starts + window, side='left')
+            bounds.append(np.column_stack((lo, hi)).astype(np.int64))
+        else:
+            raise ValueError(f"Unknown window unit: {unit!r} (expected 'rows' or 'time').")
+
+    if not bounds:
+        return np.empty((0, 2), dtype=np.int64)
+    bounds = np.concatenate(bounds)
+    return bounds[bounds[:, 1] > bounds[:, 0]] # Gaps in the recording can leave time windows empty
+
+
+# --- Worker-process state. Set once per process by _init_worker so the DataFrame is not
+# --- pickled with every task (with the 'fork' start method it is inherited copy-on-write).
+# --- Only pool processes set it; in-process writers get the state passed to _write_task.
+_worker_state = None
+
+
+def _init_worker(df, order, options):
+    global _worker_state
+    _worker_state = (df, order, options)
+
+
+def _rows_for(order, lo, hi):
+    if order is None:
+        return slice(int(lo), int(hi))
+    return np.sort(order[lo:hi])
+
+
+def _window(df, rows, transform):
+    window = df.iloc[rows]
+    return window if transform is None else transform.apply(window) # Every window starts from a fresh state
+
+
+def _write_task(task, state=None):
+    """Writes one task: either a list of windows to separate files, or one shard of windows.
+    `state` is the (df, order, options) of an in-process writer; pool processes use _worker_state."""
+    df, order, options = state if state is not None else _worker_state
+    kind, payload = task
+
+    if kind == 'files':
+        for chunk_id, lo, hi in payload:
+            stem = options['names'][chunk_id] if options['names'] else f"{options['prefix']}_{chunk_id:06d}"
+            file_path = os.path.join(options['out_dir'], stem + options['suffix'])
+            write_rows(df, _rows_for(order, lo, hi), file_path, float_format=options['float_format'],
+                       transform=options['transform'])
+        return len(payload)
+
+    shard_id, windows = payload
+    file_path = os.path.join(options['out_dir'], f"{options['prefix']}_shard_{shard_id:05d}{options['suffix']}")
+    # Each window is small, so tagging it with its chunk id only ever copies one window at a time
+    transform = options['transform']
+    blocks = (_window(df, _rows_for(order, lo, hi), transform).assign(chunk_id=chunk_id) for chunk_id, lo, hi in windows)
+    _write_shard(blocks, file_path, options['float_format'])
+    return len(windows)
+
+
+def _write_shard(blocks, file_path, float_format):
+    tmp_path = f"{file_path}.part"
+    try:
+        with open_block_writer(tmp_path, file_path, float_format) as writer:
+            for block in blocks:
+                writer.write(block)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+@profiler.traced("chunk")
+def chunk_file(df, index, bounds, out_dir, prefix="chunk", suffix=".csv", workers=None,
+               shard_size=None, float_format=None, transform=None, names=None, tasks_per_worker=8, progress=None, cancel_event=None):
+    """Writes every window in `bounds` (from window_bounds) under `out_dir` in parallel.
+
+    Each window becomes `<prefix>_<id>.csv`, or with `shard_size` every `shard_size` windows are
+    written into one `<prefix>_shard_<n>.csv` with an extra 'chunk_id' column. `suffix` may end
+    in .gz/.zst for compressed output. `transform` (a transforms.Pipeline) is applied to each
+    window on its own, as if it were a separate recording. `names` (a file name stem per window,
+    e.g. from RangeSet.windows) replaces the numbered names when not sharding. Windows are handed
+    to a pool in contiguous batches, so each worker reads the data sequentially: forked processes
+    when the caller is single-threaded, threads otherwise (forking a threaded process is unsafe).
+    Returns the number of chunks written.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    windows = [(i, int(lo), int(hi)) for i, (lo, hi) in enumerate(bounds)]
+    if not windows:
+        return 0
+
+    workers = workers or os.cpu_count() or 1
+    if shard_size:
+        tasks = [('shard', (n, windows[i:i + shard_size])) for n, i in enumerate(range(0, len(windows), shard_size))]
+    else:
+        batch = max(1, -(-len(windows) // (workers * tasks_per_worker)))
+        tasks = [('files', windows[i:i + batch]) for i in range(0, len(windows), batch)]
+
+    options = {'out_dir': out_dir, 'prefix': prefix, 'suffix': suffix, 'float_format': float_format, 'transform': transform,
+               'names': names}
+    state = (df, index.order, options)
+    written = 0
+
+    if workers == 1 or len(tasks) == 1:
+        for task in tasks:
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            written += _write_task(task, state)
+            if progress is not None:
+                progress(written, len(windows))
+        return written
+
+    if threading.active_count() == 1 and 'fork' in multiprocessing.get_all_start_methods():
+        # Single-threaded caller (the CLI): forked workers inherit the DataFrame copy-on-write
+        pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork'),
+                                                      initializer=_init_worker, initargs=state)
+        submit = lambda task: pool.submit(_write_task, task)
+    else:
+        # Forking a process with other threads running (the GUI runs this on a worker thread) can
+        # deadlock, and any other start method pickles the whole DataFrame into every worker.
+        # Transforms keep per-stream state, so every task gets its own copy of the pipeline
+        pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+        submit = lambda task: pool.submit(_write_task, task, (df, index.order, dict(options, transform=copy.deepcopy(transform))))
+    with pool:
+        futures = [submit(task) for task in tasks]
+        for future in concurrent.futures.as_completed(futures):
+            written += future.result()
+            if progress is not None:
+                progress(written, len(windows))
+            if cancel_event is not None and cancel_event.is_set():
+                for pending in futures:
+                    pending.cancel()
+                break
+    return written
+
+
+class ChunkExportJob:
+    """Runs chunk_file on a worker thread with the same queue protocol as ExportWriter:
+        ("progress", (chunks_written, total_chunks)), ("done", out_dir), ("cancelled", None), ("error", Exception)
+    """
+
+    def __init__(self, df, index, bounds, out_dir, **chunk_options):
+        self.df = df
+        self.index = index
+        self.bounds = bounds
+        self.out_dir = out_dir
+        self.chunk_options = chunk_options
+        self.queue = queue.Queue()
+        self._cancel_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Starts the worker thread. Returns immediately."""
+        self._thread = threading.Thread(target=self._run, name="ChunkExportJob", daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        """Stops handing out new batches; batches already running in the pool still finish."""
+        self._cancel_event.set()
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        try:
+            chunk_file(
+                self.df, self.index, self.bounds, self.out_dir,
+                progress=lambda done, total: self.queue.put(("progress", (done, total))),
+                cancel_event=self._cancel_event,
+                **self.chunk_options,
+            )
+            if self._cancel_event.is_set():
+                self.queue.put(("cancelled", None))
+            else:
+                self.queue.put(("done", self.out_dir))
+        except Exception as e:
+            self.queue.put(("error", e))
@@ -0,0 +1,221 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import zlib
+
+import numpy as np
+import pandas as pd
+
+CACHE_VERSION = 2
+CHECKSUM_SAMPLE_BYTES = 1 << 20 # Bytes hashed from each end of the source file
+
+
+def default_cache_dir():
+    return os.environ.get("CSV_EDITOR_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "csv_editor"))
+
+
+def source_checksum(file_path, size):
+    """CRC32 over the first and last CHECKSUM_SAMPLE_BYTES of the file plus its size.
+    Cheap enough to run on every open, and catches in-place rewrites that keep size and mtime."""
+    crc = zlib.crc32(str(size).encode())
+    with open(file_path, 'rb') as fh:
+        crc = zlib.crc32(fh.read(CHECKSUM_SAMPLE_BYTES), crc)
+        if size > CHECKSUM_SAMPLE_BYTES:
+            fh.seek(max(size - CHECKSUM_SAMPLE_BYTES, CHECKSUM_SAMPLE_BYTES))
+            crc = zlib.crc32(fh.read(), crc)
+    return crc
+
+
+class ColumnCache:
+    """Binary sidecar cache of parsed CSV files.
+
+    Each cached file gets a directory holding one contiguous .npy array per column plus a
+    meta.json describing the source (path, size, mtime, checksum). Entries may hold only some
+    of the file's columns; storing more columns merges them into the entry. Hits are loaded
+    with memory mapping, so only the pages of columns that are actually used get read.
+    Entries are evicted least-recently-used first once the cache grows past `max_bytes`.
+    Data derived from a file (e.g. level-of-detail pyramids) can be kept in its entry with
+    store_derived, and is dropped together with the entry when the source changes.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=8 << 30):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_bytes = max_bytes
+
+    def _entry_dir(self, file_path):
+        key = hashlib.sha1(os.path.abspath(file_path).encode()).hexdigest()
+        return os.path.join(self.cache_dir, key)
+
+    def _source_key(self, file_path):
+        st = os.stat(file_path)
+        return {
+            "path": os.path.abspath(file_path),
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+        }
+
+    def _read_meta(self, file_path):
+        """Returns the entry's meta dict if it is current for `file_path`; drops stale entries."""
+        meta_path = os.path.join(self._entry_dir(file_path), "meta.json")
+        try:
+            with open(meta_path) as fh:
+                meta = json.load(fh)
+        except (OSError, ValueError):
+            return None
+
+        key = self._source_key(file_path)
+        if (meta.get("version") != CACHE_VERSION
+                or meta.get("source") != key
+                or meta.get("checksum") != source_checksum(file_path, key["size"])):
+            self.invalidate(file_path)
+            return None
+        return meta
+
+    def lookup(self, file_path, columns=None):
+        """Returns a memory-mapped DataFrame with the cached subset of `columns` (default: every
+        cached column), or None on a miss or stale entry. Check the result for missing columns."""
+        try:
+            meta = self._read_meta(file_path)
+        except OSError:
+            return None
+        if meta is None:
+            return None
+
+        entry_dir = self._entry_dir(file_path)
+        wanted = [c for c in meta["columns"] if columns is None or c["name"] in columns]
+        try:
+            data = {}
+            for col in wanted:
+                values = np.load(os.path.join(entry_dir, col["file"]), mmap_mode='r')
+                if col["kind"] == "categorical":
+                    categories = np.load(os.path.join(entry_dir, col["categories"]), allow_pickle=False)
+                    values = pd.Categorical.from_codes(np.asarray(values), categories=categories)
+                data[col["name"]] = values
+        except (OSError, ValueError, KeyError):
+            self.invalidate(file_path)
+            return None
+
+        os.utime(os.path.join(entry_dir, "meta.json")) # Mark as recently used for LRU eviction
+        # copy=False keeps one block per column backed by its mmap, so nothing is paged in yet
+        df = pd.DataFrame(data, columns=[c["name"] for c in wanted], copy=False)
+        if not wanted:
+            df = pd.DataFrame(index=pd.RangeIndex(meta["n_rows"]))
+        return df
+
+    def store(self, file_path, df):
+        """Adds the columns of `df` to the cache entry for `file_path` (creating it if needed),
+        then evicts old entries if the cache is over its size bound."""
+        key = self._source_key(file_path)
+        checksum = source_checksum(file_path, key["size"])
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entry_dir = self._entry_dir(file_path)
+        existing = self._read_meta(file_path)
+        if existing is not None and existing.get("n_rows") != len(df):
+            existing = None
+
+        # Build the entry in a temp dir and rename it in place, so readers never see half an entry
+        tmp_dir = tempfile.mkdtemp(dir=self.cache_dir, prefix=".tmp-")
+        try:
+            columns = []
+            if existing is not None:
+                # Keep previously cached columns; hard links make this free on the same filesystem
+                for col in existing["columns"]:
+                    if col["name"] in df.columns:
+                        continue
+                    for file_name in (col["file"], col.get("categories")):
+                        if file_name:
+                            _link_or_copy(os.path.join(entry_dir, file_name), os.path.join(tmp_dir, file_name))
+                    columns.append(col)
+                for entry in os.scandir(entry_dir):
+                    if entry.name.startswith("derived_"):
+                        _link_or_copy(entry.path, os.path.join(tmp_dir, entry.name))
+
+            for name in df.columns:
+                series = df[name]
+                stem = hashlib.sha1(str(name).encode()).hexdigest()[:16]
+                col = {"name": str(name), "file": f"col_{stem}.npy"}
+                if pd.api.types.is_numeric_dtype(series) or pd.api.types.is_datetime64_any_dtype(series):
+                    col["kind"] = "array"
+                    values = series.to_numpy()
+                    if values.dtype == object: # nullable extension dtypes
+                        values = series.to_numpy(dtype=float, na_value=np.nan)
+                    np.save(os.path.join(tmp_dir, col["file"]), np.ascontiguousarray(values))
+                else:
+                    # Strings are stored as integer codes into a categories array
+                    col["kind"] = "categorical"
+                    col["categories"] = f"cat_{stem}.npy"
+                    categorical = pd.Categorical(series.astype("string").to_numpy(dtype=object, na_value=None))
+                    np.save(os.path.join(tmp_dir, col["file"]), categorical.codes)
+                    np.save(os.path.join(tmp_dir, col["categories"]), np.asarray(categorical.categories, dtype=str))
+                columns.append(col)
+
+            meta = {"version": CACHE_VERSION, "source": key, "checksum": checksum, "n_rows": len(df), "columns": columns}
+            with open(os.path.join(tmp_dir, "meta.json"), 'w') as fh:
+                json.dump(meta, fh)
+
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            os.replace(tmp_dir, entry_dir)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        self.evict()
+
+    def _derived_path(self, file_path, name):
+        stem = hashlib.sha1(str(name).encode()).hexdigest()[:16]
+        return os.path.join(self._entry_dir(file_path), f"derived_{stem}.npz")
+
+    def lookup_derived(self, file_path, name):
+        """Returns the {name: array} dict saved by store_derived, or None if missing or stale."""
+        try:
+            if self._read_meta(file_path) is None:
+                return None
+            with np.load(self._derived_path(file_path, name), allow_pickle=False) as data:
+                return {key: data[key] for key in data.files}
+        except (OSError, ValueError):
+            return None
+
+    def store_derived(self, file_path, name, arrays):
+        """Saves a dict of arrays under `name` in the (already existing) entry for `file_path`.
+        Does nothing if the file has no current entry."""
+        if self._read_meta(file_path) is None:
+            return
+        path = self._derived_path(file_path, name)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    def invalidate(self, file_path):
+        shutil.rmtree(self._entry_dir(file_path), ignore_errors=True)
+
+    def evict(self):
+        """Deletes least-recently-used entries until the cache fits in `max_bytes`."""
+        entries = []
+        total = 0
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return
+        for name in names:
+            entry_dir = os.path.join(self.cache_dir, name)
+            meta_path = os.path.join(entry_dir, "meta.json")
+            if name.startswith(".") or not os.path.isfile(meta_path):
+                continue
+            size = sum(e.stat().st_size for e in os.scandir(entry_dir) if e.is_file())
+            entries.append((os.path.getmtime(meta_path), size, entry_dir))
+            total += size
+
+        for _, size, entry_dir in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
+
+
+def _link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
@@ -0,0 +1,339 @@
+import os
+import queue
+import threading
+
+import numpy as np
+import pandas as pd
+
+from classes.formats import is_columnar, read_columns
+from classes.profiler import profiler
+
+BLOCK_ROWS = 65_536 # Rows per partial aggregate; range stats only rescan the two edge blocks
+GAP_FACTOR = 2.0 # A timestamp step this many times the typical step counts as a gap
+AGGREGATES = ("count", "min", "max", "mean", "m2")
+
+
+def block_aggregates(values, block_rows=BLOCK_ROWS):
+    """Per-block count, min, max, mean and M2 (sum of squared deviations) of the non-NaN values,
+    for consecutive blocks of `block_rows` rows (the last one may be shorter)."""
+    values = np.asarray(values, dtype=float)
+    n_blocks = -(-len(values) // block_rows)
+    padded = np.full(n_blocks * block_rows, np.nan)
+    padded[:len(values)] = values
+    padded = padded.reshape(n_blocks, block_rows)
+
+    valid = ~np.isnan(padded)
+    count = valid.sum(axis=1)
+    filled = np.where(valid, padded, 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = filled.sum(axis=1) / count
+    m2 = np.where(valid, (padded - mean[:, None]) ** 2, 0.0).sum(axis=1)
+    empty = count == 0
+    return {
+        "count": count,
+        "min": np.where(empty, np.nan, np.where(valid, padded, np.inf).min(axis=1)),
+        "max": np.where(empty, np.nan, np.where(valid, padded, -np.inf).max(axis=1)),
+        "mean": np.where(empty, 0.0, mean),
+        "m2": m2,
+    }
+
+
+def combine(aggregates):
+    """Merges block aggregates (dict of equal-length arrays) into one (count, min, max, mean, m2) tuple,
+    using the parallel variance formula so no block has to be revisited."""
+    count = aggregates["count"]
+    total = int(count.sum())
+    if total == 0:
+        return 0, np.nan, np.nan, np.nan, 0.0
+    mean = float((count * aggregates["mean"]).sum() / total)
+    m2 = float(aggregates["m2"].sum() + (count * (aggregates["mean"] - mean) ** 2).sum())
+    return total, float(np.nanmin(aggregates["min"])), float(np.nanmax(aggregates["max"])), mean, m2
+
+
+def _concat(parts):
+    return {key: np.concatenate([p[key] for p in parts]) for key in parts[0]}
+
+
+def _summary(rows, count, min_value, max_value, mean, m2):
+    return {
+        "count": count,
+        "nan_count": rows - count,
+        "min": min_value,
+        "max": max_value,
+        "mean": mean if count else np.nan,
+        "std": float(np.sqrt(m2 / count)) if count else np.nan,
+    }
+
+
+def summarize(values):
+    """count, nan_count, min, max, mean and std of an array, computed directly."""
+    values = np.asarray(values, dtype=float)
+    return _summary(len(values), *combine(block_aggregates(values, max(len(values), 1))))
+
+
+def merged_summaries(stats_list):
+    """{name: summary} of columns spread over several ColumnStats (e.g. the files of a session),
+    combined from their block aggregates as if the files were one."""
+    n_rows = sum(stats.n_rows for stats in stats_list)
+    names = dict.fromkeys(name for stats in stats_list for name in stats.blocks)
+    return {name: _summary(n_rows, *combine(_concat([stats.blocks[name] for stats in stats_list if name in stats.blocks])))
+            for name in names}
+
+
+class ColumnStats:
+    """Summary statistics of every numeric column of a file, kept as block-level partial aggregates.
+
+    Whole-file summaries and the stats of any contiguous row range are combined from the blocks;
+    only the two partially covered edge blocks of a range are recomputed from the data.
+    """
+
+    def __init__(self, n_rows, blocks, sampling=None, block_rows=BLOCK_ROWS):
+        self.n_rows = n_rows
+        self.blocks = blocks # {name: {aggregate: per-block array}}
+        self.sampling = sampling or {} # Timestamp step statistics, see sampling_stats
+        self.block_rows = block_rows
+
+    def summary(self, name):
+        """count, nan_count, min, max, mean and std of a column, or None if it was not analysed."""
+        if name not in self.blocks:
+            return None
+        return _summary(self.n_rows, *combine(self.blocks[name]))
+
+    def set_rate(self, seconds_per_unit):
+        """Fills in the sampling rate from the median step, if it was computed without a known unit."""
+        if "median_step" in self.sampling and self.sampling.get("rate_hz") is None:
+            self.sampling["rate_hz"] = _rate(self.sampling["median_step"], seconds_per_unit)
+
+    def range_summary(self, name, rows, values):
+        """Summary of `values[rows]` (`values` being the full column). A slice is combined from the
+        block aggregates plus its edge blocks; row-number arrays (unsorted files) are computed directly."""
+        if name not in self.blocks or not isinstance(rows, slice):
+            return summarize(np.asarray(values)[rows])
+
+        start, stop, _ = rows.indices(self.n_rows)
+        stop = max(start, stop)
+        first_full = -(-start // self.block_rows)
+        last_full = stop // self.block_rows
+        if first_full >= last_full:
+            return summarize(values[start:stop]) # Within one or two blocks: cheaper to just compute it
+
+        parts = [{key: array[first_full:last_full] for key, array in self.blocks[name].items()}]
+        for lo, hi in ((start, first_full * self.block_rows), (last_full * self.block_rows, stop)):
+            if hi > lo:
+                parts.append(block_aggregates(values[lo:hi], hi - lo))
+        return _summary(stop - start, *combine(_concat(parts)))
+
+    def to_arrays(self):
+        """Flat {name: array} form for np.savez; see from_arrays."""
+        names = list(self.blocks)
+        arrays = {
+            "shape": np.array([self.n_rows, self.block_rows]),
+            "names": np.array(names, dtype=str),
+            "sampling_keys": np.array(list(self.sampling), dtype=str),
+            "sampling_values": np.array([np.nan if v is None else v for v in self.sampling.values()], dtype=float),
+        }
+        for i, name in enumerate(names):
+            for key in AGGREGATES:
+                arrays[f"{key}_{i}"] = self.blocks[name][key]
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        n_rows, block_rows = (int(v) for v in arrays["shape"])
+        blocks = {str(name): {key: arrays[f"{key}_{i}"] for key in AGGREGATES} for i, name in enumerate(arrays["names"])}
+        sampling = {str(k): (None if np.isnan(v) else float(v)) for k, v in zip(arrays["sampling_keys"], arrays["sampling_values"])}
+        return cls(n_rows, blocks, sampling=sampling, block_rows=block_rows)
+
+
+def _rate(median_step, seconds_per_unit):
+    return 1.0 / (median_step * seconds_per_unit) if seconds_per_unit and median_step > 0 else None
+
+
+class _SamplingAccumulator:
+    """Timestamp step statistics gathered chunk by chunk (the first-to-last step of each chunk included)."""
+
+    def __init__(self):
+        self.last = None
+        self.medians = []
+        self.weights = []
+        self.n_gaps = 0
+        self.max_step = None
+        self.monotonic = True
+
+    def add(self, timestamps):
+        values = np.asarray(timestamps)
+        if np.issubdtype(values.dtype, np.datetime64):
+            values = values.astype('datetime64[ns]').view(np.int64)
+        elif not np.issubdtype(values.dtype, np.integer):
+            values = values.astype(float) # Integers stay exact; epoch nanoseconds do not fit a float
+            values = values[~np.isnan(values)]
+        if self.last is not None:
+            values = np.concatenate((np.array([self.last], dtype=values.dtype), values))
+        if len(values) < 2:
+            if len(values):
+                self.last = values[-1]
+            return
+        self.last = values[-1]
+        steps = np.diff(values).astype(float)
+        if (steps < 0).any():
+            self.monotonic = False
+        median = float(np.median(steps))
+        self.medians.append(median)
+        self.weights.append(len(steps))
+        self.n_gaps += int(np.count_nonzero(steps > GAP_FACTOR * median)) if median > 0 else 0
+        step_max = float(steps.max())
+        self.max_step = step_max if self.max_step is None else max(self.max_step, step_max)
+
+    def result(self, seconds_per_unit=None):
+        if not self.medians or not self.monotonic:
+            return {"monotonic": float(self.monotonic)}
+        median = float(np.average(self.medians, weights=self.weights)) # Chunk medians, weighted by steps
+        return {"monotonic": 1.0, "median_step": median, "rate_hz": _rate(median, seconds_per_unit), "n_gaps": float(self.n_gaps), "max_gap": self.max_step}
+
+
+def sampling_stats(timestamps, seconds_per_unit=None):
+    """Typical step, sampling rate (if the unit is known), gap count and largest gap of a timestamp
+    column, for data already in memory. Steps are only meaningful for sorted timestamps."""
+    accumulator = _SamplingAccumulator()
+    accumulator.add(timestamps)
+    return accumulator.result(seconds_per_unit)
+
+
+@profiler.traced("stats")
+def compute_stats(file_path, columns, timestamp_column=None, seconds_per_unit=None, chunksize=4 * BLOCK_ROWS,
+                  progress=None, cancel_event=None):
+    """One chunked, vectorized pass over `columns` (and the timestamp column) of a file.
+    Chunks are multiples of BLOCK_ROWS so blocks line up with file rows. `progress(rows, bytes_read,
+    total_bytes)` is called per chunk. Returns a ColumnStats, or None if cancelled."""
+    if chunksize % BLOCK_ROWS:
+        raise ValueError("chunksize must be a multiple of BLOCK_ROWS.")
+    usecols = list(dict.fromkeys(([timestamp_column] if timestamp_column else []) + list(columns)))
+    total_bytes = os.path.getsize(file_path)
+    parts = {name: [] for name in columns}
+    sampling = _SamplingAccumulator()
+    n_rows = 0
+
+    def add_chunk(chunk, bytes_read):
+        nonlocal n_rows
+        for name in columns:
+            values = pd.to_numeric(chunk[name], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+            parts[name].append(block_aggregates(values))
+        if timestamp_column:
+            sampling.add(chunk[timestamp_column].to_numpy())
+        n_rows += len(chunk)
+        if progress is not None:
+            progress(n_rows, bytes_read, total_bytes)
+
+    if is_columnar(file_path):
+        df = read_columns(file_path, usecols)
+        for i in range(0, max(len(df), 1), chunksize):
+            if cancel_event is not None and cancel_event.is_set():
+                return None
+            add_chunk(df.iloc[i:i + chunksize], total_bytes if i + chunksize >= len(df) else 0)
+    else:
+        with open(file_path, 'rb') as fh:
+            reader = pd.read_csv(fh, chunksize=chunksize, usecols=usecols)
+            for chunk in reader:
+                if cancel_event is not None and cancel_event.is_set():
+                    reader.close()
+                    return None
+                add_chunk(chunk, min(fh.tell(), total_bytes))
+
+    blocks = {name: _concat(chunks) for name, chunks in parts.items() if chunks}
+    return ColumnStats(n_rows, blocks, sampling=sampling.result(seconds_per_unit))
+
+
+def file_stats(file_path, columns, cache=None, cancel_event=None, **options):
+    """compute_stats, reusing the ColumnStats kept in the file's ColumnCache entry (derived data
+    "stats", shared with DataEngine.set_stats) and storing freshly computed ones there."""
+    if cache is not None:
+        arrays = cache.lookup_derived(file_path, "stats")
+        if arrays is not None:
+            stats = ColumnStats.from_arrays(arrays)
+            if all(name in stats.blocks for name in columns):
+                return stats
+    stats = compute_stats(file_path, columns, cancel_event=cancel_event, **options)
+    if stats is not None and cache is not None:
+        try:
+            cache.store_derived(file_path, "stats", stats.to_arrays())
+        except OSError:
+            pass # Persisting is an optimisation only
+    return stats
+
+
+class StatsJob:
+    """Runs compute_stats on a worker thread. Messages put on `self.queue`:
+        ("progress", (rows, bytes_read, total_bytes)), ("done", ColumnStats), ("cancelled", None), ("error", Exception)
+    """
+
+    def __init__(self, file_path, columns, timestamp_column=None, seconds_per_unit=None):
+        self.file_path = file_path
+        self.columns = columns
+        self.timestamp_column = timestamp_column
+        self.seconds_per_unit = seconds_per_unit
+        self.queue = queue.Queue()
+        self._cancel_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Starts the worker thread. Returns immediately."""
+        self._thread = threading.Thread(target=self._run, name="StatsJob", daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        try:
+            stats = compute_stats(
+                self.file_path, self.columns, timestamp_column=self.timestamp_column,
+                seconds_per_unit=self.seconds_per_unit,
+                progress=lambda *p: self.queue.put(("progress", p)),
+                cancel_event=self._cancel_event,
+            )
+            self.queue.put(("cancelled", None) if stats is None else ("done", stats))
+        except Exception as e:
+            self.queue.put(("error", e))
+
+
+class SessionStatsJob:
+    """Runs file_stats over several files (e.g. those of a session) on a worker thread. Messages put on `self.queue`:
+        ("progress", (files_done, total_files)), ("done", {file_path: ColumnStats}), ("cancelled", None), ("error", Exception)
+    """
+
+    def __init__(self, file_paths, columns, cache=None, **options):
+        self.file_paths = file_paths
+        self.columns = columns
+        self.cache = cache
+        self.options = options
+        self.queue = queue.Queue()
+        self._cancel_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Starts the worker thread. Returns immediately."""
+        self._thread = threading.Thread(target=self._run, name="SessionStatsJob", daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        try:
+            results = {}
+            for file_path in self.file_paths:
+                stats = file_stats(file_path, self.columns, cache=self.cache, cancel_event=self._cancel_event, **self.options)
+                if stats is None:
+                    self.queue.put(("cancelled", None))
+                    return
+                results[file_path] = stats
+                self.queue.put(("progress", (len(results), len(self.file_paths))))
+            self.queue.put(("done", results))
+        except Exception as e:
+            self.queue.put(("error", e))
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+SNIFF_ROWS = 10_000 # Rows read by sniff_columns to guess column types
+
+
+def column_kind(series):
+    """Returns 'datetime', 'numeric' or 'text' for a column."""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return 'datetime'
+    if pd.api.types.is_numeric_dtype(series):
+        return 'numeric'
+    return 'text'
+
+
+def sniff_columns(file_path, sample_rows=SNIFF_ROWS):
+    """Reads the header plus the first `sample_rows` rows.
+
+    Returns (header, sampled) where `sampled` maps each column name to a dict with the
+    sampled pandas dtype and its kind. Cheap enough to run before any real parsing, so the
+    column pickers can be filled in right away.
+    """
+    sample = pd.read_csv(file_path, nrows=sample_rows)
+    sampled = {name: {'dtype': str(sample[name].dtype), 'kind': column_kind(sample[name])} for name in sample.columns}
+    return sample.columns.tolist(), sampled
+
+
+def compact_column(series):
+    """Returns `series` in the smallest dtype that holds it losslessly.
+
+    float64 becomes float32 when every value round-trips exactly, integers are downcast to
+    the narrowest integer type that fits, and strings become categoricals.
+    """
+    if pd.api.types.is_float_dtype(series) and series.dtype == np.float64:
+        values = series.to_numpy()
+        as_float32 = values.astype(np.float32)
+        if np.array_equal(as_float32.astype(np.float64), values, equal_nan=True):
+            return pd.Series(as_float32, index=series.index, name=series.name)
+        return series
+    if pd.api.types.is_integer_dtype(series) and not pd.api.types.is_extension_array_dtype(series):
+        return pd.to_numeric(series, downcast='integer')
+    if pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+        return series.astype('category')
+    return series
+
+
+def frame_from_columns(columns, index=None):
+    """Builds a DataFrame from a {name: Series} dict without copying the column data,
+    so memory-mapped columns stay lazily paged."""
+    data = {}
+    for name, series in columns.items():
+        if isinstance(series.dtype, pd.api.extensions.ExtensionDtype):
+            data[name] = series.array
+        else:
+            data[name] = series.to_numpy(copy=False)
+    return pd.DataFrame(data, columns=list(columns), index=index, copy=False)
@@ -0,0 +1,248 @@
+import io
+import os
+import queue
+import threading
+import time
+
+import pandas as pd
+
+from classes.column_types import compact_column, frame_from_columns, sniff_columns
+from classes.formats import is_columnar, read_columns, read_schema
+from classes.profiler import span
+from classes.timestamp_index import TimestampIndex
+
+TAIL_BYTES = 64 * 1024 # Read size when looking backwards for the last newline
+
+
+class _BoundedRaw(io.RawIOBase):
+    """The first `limit` bytes of an open binary file, so a file that is still being written is
+    parsed up to the size it had when the load started."""
+
+    def __init__(self, fh, limit):
+        self.fh = fh
+        self.remaining = limit
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.fh.read(min(len(buffer), self.remaining))
+        buffer[:len(data)] = data
+        self.remaining -= len(data)
+        return len(data)
+
+
+def complete_extent(file_path, limit):
+    """(complete_bytes, partial): the offset just past the last newline among the first `limit`
+    bytes of a file, and whether text follows it (an unterminated last line, e.g. one a logger
+    is still writing). A file without any newline counts as complete."""
+    with open(file_path, 'rb') as fh:
+        end = limit
+        while end > 0:
+            start = max(0, end - TAIL_BYTES)
+            fh.seek(start)
+            block = fh.read(end - start)
+            position = block.rfind(b'\n')
+            if position >= 0:
+                complete = start + position + 1
+                fh.seek(complete)
+                return complete, bool(fh.read(limit - complete).strip())
+            end = start
+    return limit, False
+
+
+class CSVLoader:
+    """Reads a CSV file in chunks on a worker thread and streams progress back through a queue.
+
+    Only the columns in `usecols` are parsed (default: all); each is compacted to the smallest
+    lossless dtype (float32, narrow ints, categoricals). Columns already in the ColumnCache are
+    memory-mapped instead of parsed, and newly parsed ones are added to it. Parquet, Feather and
+    NPZ files (by extension) are read directly with column pruning and bypass the cache.
+
+    Messages put on `self.queue` are (kind, payload) tuples:
+        ("header", [column names])                         -- as soon as the header is parsed
+        ("column_types", {name: {"dtype", "kind"}})        -- types sniffed from the first rows
+        ("progress", (rows_read, bytes_read, total_bytes, eta_seconds))
+        ("cached", None)                                   -- every requested column came from the cache
+        ("index", TimestampIndex)                          -- only if `index_column` was loaded
+        ("done", DataFrame)                                -- holds only the requested columns
+        ("cancelled", None)
+        ("error", Exception)
+
+    CSV files are parsed up to `end_bytes` (default: their size when the load starts), so rows
+    appended meanwhile are left out. Before "done", `extent` is set to (parsed_bytes,
+    complete_bytes, complete_rows): the bytes parsed, and how many of those bytes and of the
+    rows end in a newline. Follow mode resumes from there (see DataEngine.start_follow).
+    """
+
+    def __init__(self, file_path, chunksize=250_000, cache=None, index_column=None, usecols=None, compact=True, end_bytes=None):
+        self.file_path = file_path
+        self.chunksize = chunksize
+        self.cache = cache # Optional ColumnCache; hits skip text parsing entirely
+        self.index_column = index_column # Column to build a TimestampIndex over, off the Tk thread
+        self.usecols = usecols # Columns to load; names not in the file are ignored
+        self.compact = compact
+        self.end_bytes = end_bytes
+        self.extent = None
+        self.queue = queue.Queue()
+        self._cancel_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Starts the worker thread. Returns immediately."""
+        self._thread = threading.Thread(target=self._run, name="CSVLoader", daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        """Asks the worker to stop after the chunk it is currently parsing."""
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        with span("load", file=os.path.basename(self.file_path)):
+            self._load()
+
+    def _load(self):
+        try:
+            file_bytes = os.path.getsize(self.file_path)
+            total_bytes = file_bytes if self.end_bytes is None else min(self.end_bytes, file_bytes)
+
+            columnar = is_columnar(self.file_path)
+            # Header plus a small sample first, so the column widgets can be filled in right away
+            with span("load.sniff"):
+                header, column_types = read_schema(self.file_path) if columnar else sniff_columns(self.file_path)
+            self.queue.put(("header", header))
+            self.queue.put(("column_types", column_types))
+
+            if self.usecols is None:
+                usecols = header
+            else:
+                # Something has to be read to learn the row count; fall back to the first column
+                usecols = [c for c in header if c in self.usecols] or header[:1]
+
+            if columnar:
+                # Binary formats need no text parsing and no cache; only the wanted columns are read
+                with span("load.read", columns=len(usecols)):
+                    df = read_columns(self.file_path, usecols)
+                if self._cancel_event.is_set():
+                    self.queue.put(("cancelled", None))
+                    return
+                self.queue.put(("progress", (len(df), total_bytes, total_bytes, 0.0)))
+                if self.compact:
+                    with span("load.coerce", columns=len(usecols)):
+                        df = frame_from_columns({c: compact_column(df[c]) for c in usecols})
+                self._finish(df)
+                return
+
+            columns = {}
+            if self.cache is not None and total_bytes == file_bytes: # The cache describes the whole file
+                with span("load.cache_lookup"):
+                    cached = self.cache.lookup(self.file_path, usecols)
+                if cached is not None:
+                    columns = {name: cached[name] for name in cached.columns}
+            missing = [c for c in usecols if c not in columns]
+
+            if not missing:
+                self.queue.put(("cached", None))
+                self._finish(frame_from_columns({c: columns[c] for c in usecols}), total_bytes)
+                return
+
+            chunks = []
+            rows_read = 0
+            start_time = time.monotonic()
+            with open(self.file_path, 'rb') as fh, span("load.parse", columns=len(missing)) as parse_span:
+                reader = pd.read_csv(io.BufferedReader(_BoundedRaw(fh, total_bytes)), chunksize=self.chunksize, usecols=missing)
+                for chunk in reader:
+                    if self._cancel_event.is_set():
+                        reader.close()
+                        self.queue.put(("cancelled", None))
+                        return
+
+                    chunks.append(chunk)
+                    rows_read += len(chunk)
+                    # fh.tell() runs slightly ahead of the parser because of read buffering,
+                    # which is close enough for a progress readout.
+                    bytes_read = min(fh.tell(), total_bytes)
+                    elapsed = time.monotonic() - start_time
+                    if bytes_read > 0:
+                        eta = elapsed / bytes_read * (total_bytes - bytes_read)
+                    else:
+                        eta = None
+                    self.queue.put(("progress", (rows_read, bytes_read, total_bytes, eta)))
+                parse_span.set(rows=rows_read)
+
+            if self._cancel_event.is_set():
+                self.queue.put(("cancelled", None))
+                return
+
+            if chunks:
+                parsed = pd.concat(chunks, ignore_index=True)
+            else:
+                parsed = pd.DataFrame(columns=missing)
+            del chunks
+            if self.compact:
+                with span("load.coerce", columns=len(missing)):
+                    parsed = frame_from_columns({c: compact_column(parsed[c]) for c in missing})
+
+            # Rows of a file that grew while it was parsed must not be cached as the whole file
+            if self.cache is not None and os.path.getsize(self.file_path) == total_bytes:
+                try:
+                    with span("load.cache_store"):
+                        self.cache.store(self.file_path, parsed)
+                except Exception:
+                    pass # A cache that cannot be written must never fail the load itself
+
+            columns.update({c: parsed[c] for c in missing})
+            self._finish(frame_from_columns({c: columns[c] for c in usecols}), total_bytes)
+        except Exception as e:
+            self.queue.put(("error", e))
+
+    def _finish(self, df, parsed_bytes=None):
+        if parsed_bytes is not None:
+            complete_bytes, partial = complete_extent(self.file_path, parsed_bytes)
+            self.extent = (parsed_bytes, complete_bytes, len(df) - int(partial and len(df) > 0))
+        if self.index_column is not None and self.index_column in df.columns:
+            with span("load.index"):
+                index = TimestampIndex(df[self.index_column])
+            self.queue.put(("index", index))
+        self.queue.put(("done", df))
+
+
+def load_csv(file_path, cache=None, index_column=None, progress=None, usecols=None):
+    """Blocking load on the calling thread, for scripts and the CLI.
+
+    Returns (df, index, column_types): the loaded columns, a TimestampIndex or None, and the
+    sniffed {name: {"dtype", "kind"}} of every column in the file (in header order).
+    `progress`, if given, is called with the same tuple as the loader's "progress" messages.
+    Raises on failure.
+    """
+    return read_loader(CSVLoader(file_path, cache=cache, index_column=index_column, usecols=usecols), progress)
+
+
+def read_loader(loader, progress=None):
+    """Runs `loader` on the calling thread and returns (df, index, column_types) as load_csv does.
+    The loader is left for its `extent`."""
+    loader._run()
+
+    df = None
+    index = None
+    column_types = {}
+    while not loader.queue.empty():
+        kind, payload = loader.queue.get_nowait()
+        if kind == "progress" and progress is not None:
+            progress(*payload)
+        elif kind == "column_types":
+            column_types = payload
+        elif kind == "index":
+            index = payload
+        elif kind == "done":
+            df = payload
+        elif kind == "error":
+            raise payload
+    return df, index, column_types
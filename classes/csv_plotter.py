@@ -1,18 +1,52 @@
+import os
+import queue
+
+import numpy as np
 import tkinter as tk
-from tkinter import filedialog, messagebox, Listbox, Scrollbar, MULTIPLE
-import pandas as pd
+from tkinter import filedialog, messagebox, simpledialog, Listbox, Scrollbar, MULTIPLE
+import matplotlib.dates as mdates
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from classes.pointer_manager import PointerManager
+from classes.column_cache import ColumnCache
+from classes.data_engine import DataEngine
+from classes.decimator import LineDecimator
+from classes.timestamp_index import parse_timestamp
+from classes.export_writer import FAST_FLOAT_FORMAT
+from classes.formats import FILE_TYPES
+from classes.profiler import profiler
+from classes.range_set import RangeSet
+from classes.transforms import STAGES, needs_stats
+
+SESSION_WINDOW_ROWS = 20_000_000 # Rows loaded from a folder session when it is first opened
+FOLLOW_INTERVAL_MS = 1000 # How often a followed file is checked for new rows
+FOLLOW_WINDOW_ROWS = 100_000 # Rows kept in view while the plot scrolls along with a followed file
+PROFILE_OVERLAY_MS = 500 # Refresh interval of the profiling readout
+PROFILE_OVERLAY_SPANS = ("canvas.draw", "pointer.render", "decimate", "plot", "load")
 
 class CSVPlotterApp:
     def __init__(self, master):
         self.master = master
         master.title("CSV Column Plotter")
 
-        self.df = None
+        # All data handling lives in the GUI-independent engine; this class is the Tk front end
+        self.engine = DataEngine(cache=ColumnCache(), timestamp_column='timestamp')
         self.fig = None
         self.canvas = None
+        self.loader = None # Background CSVLoader (or FileSetScan / WindowLoader for sessions) while reading
+        self.export_writer = None # Background ExportWriter while a subsequence is being written
+        self.decimator = None # LineDecimator feeding the plotted lines
+        self.pyramid_job = None # Background PyramidJob building LOD pyramids of plotted lines
+        self.stats_job = None # Background StatsJob (SessionStatsJob for sessions) computing per-column statistics
+        self.y_axis_columns = [] # Column names behind the Y-axis listbox rows (rows also show stats)
+        self.plotted_y_cols = [] # Columns of the current plot, for selection statistics
+        self.plot_x_col = None # X column of the current plot; replots against it only swap lines
+        self.plot_lines = {} # Y column -> its Line2D in the current plot
+        self.range_set = RangeSet() # Named ranges of the loaded recording, mirrored in its sidecar file
+        self.ranges_path = None # Sidecar file range_set was read from and is saved to
+        self.active_range = None # Range the pointers edit: picked in the list or by clicking it on the plot
+        self.range_patches = [] # Shading of the ranges on the plot
+        self._last_range_label = "event"
 
         # --- Configure master grid to allow expansion ---
         master.grid_columnconfigure(0, weight=1)
@@ -26,9 +60,20 @@ class CSVPlotterApp:
         self.control_frame.grid_columnconfigure(1, weight=1)
         self.control_frame.grid_rowconfigure(2, weight=1) # Row for Y-axis listbox
 
-        # Select File Button
-        self.select_file_button = tk.Button(self.control_frame, text="Select CSV File", command=self.select_csv_file)
-        self.select_file_button.grid(row=0, column=0, columnspan=2, pady=5)
+        # Select File / Folder Buttons
+        self.file_buttons_frame = tk.Frame(self.control_frame)
+        self.file_buttons_frame.grid(row=0, column=0, columnspan=2, pady=5)
+        self.select_file_button = tk.Button(self.file_buttons_frame, text="Select CSV File", command=self.select_csv_file)
+        self.select_file_button.pack(side=tk.LEFT, padx=5)
+        # A folder of rotated logs opens as one session; only a time window of it is loaded at a time
+        self.select_folder_button = tk.Button(self.file_buttons_frame, text="Open Folder...", command=self.select_csv_folder)
+        self.select_folder_button.pack(side=tk.LEFT, padx=5)
+        self.session_window_button = tk.Button(self.file_buttons_frame, text="Session Window...", command=self.choose_session_window, state=tk.DISABLED)
+        self.session_window_button.pack(side=tk.LEFT, padx=5)
+        # Tail a file the logger is still writing: only the appended bytes are parsed on each check
+        self.follow_var = tk.BooleanVar(master, value=False)
+        tk.Checkbutton(self.file_buttons_frame, text="Follow File", variable=self.follow_var, command=self.toggle_follow).pack(side=tk.LEFT, padx=5)
+        self._follow_after = None
 
         # X-axis selection
         tk.Label(self.control_frame, text="X-axis Column:").grid(row=1, column=0, sticky="w", padx=5)
@@ -49,7 +94,7 @@ class CSVPlotterApp:
         self.y_axis_listbox_frame.grid_columnconfigure(0, weight=1)
 
         # The Listbox itself (with increased height/width for visibility debug)
-        self.y_axis_listbox = Listbox(self.y_axis_listbox_frame, selectmode=MULTIPLE, height=10, width=40)
+        self.y_axis_listbox = Listbox(self.y_axis_listbox_frame, selectmode=MULTIPLE, height=10, width=80)
         self.y_axis_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=2, pady=2)
 
         # The Scrollbar
@@ -58,6 +103,17 @@ class CSVPlotterApp:
         self.y_axis_listbox.config(yscrollcommand=self.y_axis_scrollbar.set)
         self.y_axis_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
 
+        # --- Load Progress (filled in while a CSVLoader is running) ---
+        self.load_status_frame = tk.Frame(self.control_frame)
+        self.load_status_frame.grid(row=3, column=0, columnspan=2, sticky="ew", padx=5)
+        self.load_status_frame.grid_columnconfigure(0, weight=1)
+
+        self.load_status_var = tk.StringVar(master)
+        tk.Label(self.load_status_frame, textvariable=self.load_status_var, anchor="w").grid(row=0, column=0, sticky="ew")
+
+        self.cancel_load_button = tk.Button(self.load_status_frame, text="Cancel", command=self.cancel_load, state=tk.DISABLED)
+        self.cancel_load_button.grid(row=0, column=1, padx=5)
+
         # In your CSVPlotterApp's __init__ method, find the Generate Plot Button section.
         # We'll add the new elements just below it, or in a new section.
 
@@ -85,9 +141,65 @@ class CSVPlotterApp:
         self.end_timestamp_display = tk.Entry(self.control_frame, textvariable=self.end_timestamp_var, width=30, state='readonly')
         self.end_timestamp_display.grid(row=8, column=1, padx=5, sticky="ew")
 
+        # Number of samples between the pointers (inclusive), updated live while dragging
+        tk.Label(self.control_frame, text="Selected Rows:").grid(row=9, column=0, sticky="w", padx=5)
+        self.selected_rows_var = tk.StringVar(master)
+        tk.Label(self.control_frame, textvariable=self.selected_rows_var, anchor="w").grid(row=9, column=1, padx=5, sticky="ew")
+
         # Export Subsequence Button
         self.export_subsequence_button = tk.Button(self.control_frame, text="Export Subsequence", command=self.export_subsequence)
-        self.export_subsequence_button.grid(row=9, column=0, columnspan=2, pady=10)
+        self.export_subsequence_button.grid(row=10, column=0, columnspan=2, pady=10)
+
+        # Export options and progress
+        self.fast_float_var = tk.BooleanVar(master, value=False)
+        tk.Checkbutton(self.control_frame, text=f"Fast float formatting ({FAST_FLOAT_FORMAT}, six decimals)", variable=self.fast_float_var).grid(row=11, column=0, columnspan=2, sticky="w", padx=5)
+
+        # Post-processing applied to every exported block, e.g. "interpolate,resample=1000000,rolling=5,zscore"
+        tk.Label(self.control_frame, text="Export Transforms:").grid(row=12, column=0, sticky="w", padx=5)
+        self.transform_var = tk.StringVar(master)
+        self.transform_entry = tk.Entry(self.control_frame, textvariable=self.transform_var)
+        self.transform_entry.grid(row=12, column=1, padx=5, sticky="ew")
+
+        self.export_status_frame = tk.Frame(self.control_frame)
+        self.export_status_frame.grid(row=13, column=0, columnspan=2, sticky="ew", padx=5)
+        self.export_status_frame.grid_columnconfigure(0, weight=1)
+
+        self.export_status_var = tk.StringVar(master)
+        tk.Label(self.export_status_frame, textvariable=self.export_status_var, anchor="w").grid(row=0, column=0, sticky="ew")
+
+        self.cancel_export_button = tk.Button(self.export_status_frame, text="Cancel", command=self.cancel_export, state=tk.DISABLED)
+        self.cancel_export_button.grid(row=0, column=1, padx=5)
+
+        # Batch "chunk for ML" export: many fixed-size windows in one pass
+        self.batch_chunk_button = tk.Button(self.control_frame, text="Batch Chunk Export...", command=self.batch_chunk_export)
+        self.batch_chunk_button.grid(row=14, column=0, columnspan=2, pady=5)
+
+        # Named ranges: many labelled events per recording, kept in a sidecar file and exported in one batch
+        tk.Label(self.control_frame, text="Ranges:").grid(row=15, column=0, sticky="nw", padx=5)
+        self.ranges_frame = tk.Frame(self.control_frame)
+        self.ranges_frame.grid(row=15, column=1, padx=5, sticky="ew")
+        self.ranges_frame.grid_columnconfigure(0, weight=1)
+        self.range_listbox = Listbox(self.ranges_frame, height=5, exportselection=False)
+        self.range_listbox.grid(row=0, column=0, sticky="ew")
+        self.range_scrollbar = Scrollbar(self.ranges_frame, orient="vertical", command=self.range_listbox.yview)
+        self.range_scrollbar.grid(row=0, column=1, sticky="ns")
+        self.range_listbox.config(yscrollcommand=self.range_scrollbar.set)
+        self.range_listbox.bind("<<ListboxSelect>>", self._on_range_list_select)
+        self.range_buttons_frame = tk.Frame(self.ranges_frame)
+        self.range_buttons_frame.grid(row=1, column=0, columnspan=2, pady=2)
+        self.add_range_button = tk.Button(self.range_buttons_frame, text="Add Range", command=self.add_range)
+        self.add_range_button.pack(side=tk.LEFT, padx=2)
+        self.rename_range_button = tk.Button(self.range_buttons_frame, text="Rename", command=self.rename_range)
+        self.rename_range_button.pack(side=tk.LEFT, padx=2)
+        self.remove_range_button = tk.Button(self.range_buttons_frame, text="Remove", command=self.remove_range)
+        self.remove_range_button.pack(side=tk.LEFT, padx=2)
+        self.export_ranges_button = tk.Button(self.range_buttons_frame, text="Export All Ranges...", command=self.export_ranges)
+        self.export_ranges_button.pack(side=tk.LEFT, padx=2)
+
+        # Statistics of the plotted channels between the pointers, refreshed when a pointer is released
+        tk.Label(self.control_frame, text="Selection Stats:").grid(row=16, column=0, sticky="nw", padx=5)
+        self.range_stats_var = tk.StringVar(master)
+        tk.Label(self.control_frame, textvariable=self.range_stats_var, anchor="w", justify=tk.LEFT, font="TkFixedFont").grid(row=16, column=1, padx=5, sticky="ew")
 
         # Variables to hold Matplotlib Line2D objects and the PointerManager instance
         self.start_pointer_line = None
@@ -116,9 +228,24 @@ class CSVPlotterApp:
         self.plot_frame = tk.Frame(master, bg="lightgray")
         self.plot_frame.grid(row=1, column=0, padx=10, pady=10, sticky="nsew")
 
+        # Live FPS / latency readout, only when profiling is on (CSV_EDITOR_PROFILE or main.py --profile)
+        self.profile_var = tk.StringVar(master)
+        if profiler.enabled:
+            tk.Label(master, textvariable=self.profile_var, anchor="w", font="TkFixedFont").grid(row=2, column=0, padx=10, sticky="ew")
+            self.master.after(PROFILE_OVERLAY_MS, self._update_profile_overlay)
+
         # Initial state of controls
         self.disable_plotting_controls()
 
+    def _update_profile_overlay(self):
+        stats = profiler.stats()
+        parts = [f"FPS {profiler.fps():5.1f}"]
+        for name in PROFILE_OVERLAY_SPANS:
+            if name in stats:
+                parts.append(f"{name} {stats[name]['last_ms']:.1f} ms (max {stats[name]['max_ms']:.1f})")
+        self.profile_var.set("  |  ".join(parts))
+        self.master.after(PROFILE_OVERLAY_MS, self._update_profile_overlay)
+
     def disable_plotting_controls(self):
         self.x_axis_dropdown.config(state=tk.DISABLED)
         self.y_axis_listbox.config(state=tk.DISABLED)
@@ -130,6 +257,9 @@ class CSVPlotterApp:
         self.start_timestamp_display.config(state=tk.DISABLED) # Make display non-interactive
         self.end_timestamp_display.config(state=tk.DISABLED)   # Make display non-interactive
         self.export_subsequence_button.config(state=tk.DISABLED)
+        self.batch_chunk_button.config(state=tk.DISABLED)
+        for button in (self.add_range_button, self.rename_range_button, self.remove_range_button, self.export_ranges_button):
+            button.config(state=tk.DISABLED)
 
         # Disconnect pointers if they exist (important for cleanup)
         if self.pointer_manager:
@@ -156,16 +286,15 @@ class CSVPlotterApp:
         self.start_timestamp_display.config(state=tk.NORMAL) # Set to NORMAL to allow value updates
         self.end_timestamp_display.config(state=tk.NORMAL)   # Set to NORMAL to allow value updates
         self.export_subsequence_button.config(state=tk.NORMAL)
-
-    def update_column_options(self):
-        print("DEBUG: update_column_options called.")
-        if self.df is not None:
-            columns = self.df.columns.tolist()
-            print(f"DEBUG: Columns retrieved for update (before Listbox insert): {columns}")
-            print(f"DEBUG: Type of self.y_axis_listbox: {type(self.y_axis_listbox)}")
-            print(f"DEBUG: ID of self.y_axis_listbox: {id(self.y_axis_listbox)}")
-
-
+        self.batch_chunk_button.config(state=tk.NORMAL)
+        for button in (self.add_range_button, self.rename_range_button, self.remove_range_button, self.export_ranges_button):
+            button.config(state=tk.NORMAL)
+
+    @profiler.traced("ui.columns")
+    def update_column_options(self, columns=None):
+        if columns is None and self.engine.loaded:
+            columns = self.engine.columns
+        if columns is not None:
             # Update X-axis dropdown
             self.x_axis_dropdown['menu'].delete(0, 'end')
             for col in columns:
@@ -179,131 +308,559 @@ class CSVPlotterApp:
 
             # Update Y-axis listbox
             self.y_axis_listbox.delete(0, tk.END) # Clear existing items
+            self.y_axis_columns = list(columns)
             for col in (columns):
-                self.y_axis_listbox.insert(tk.END, col) # THIS IS WHERE IT SHOULD INSERT
-                print(f"DEBUG: Inserted '{col}'. Current size: {self.y_axis_listbox.size()}") # Print size after each insert
-
-
-            print(f"DEBUG: Y-axis listbox populated with {self.y_axis_listbox.size()} items (after insert loop).")
-            print(f"DEBUG: Y-axis listbox state AFTER population: {self.y_axis_listbox.cget('state')}")
+                self.y_axis_listbox.insert(tk.END, self._column_label(col))
 
-            self.enable_plotting_controls()
-            print(f"DEBUG: Y-axis listbox state AFTER enable_plotting_controls: {self.y_axis_listbox.cget('state')}")
+            if self.engine.loaded:
+                self.enable_plotting_controls()
+            else:
+                # Header only (file still loading): let the user pick columns, but keep plot/export off
+                self.x_axis_dropdown.config(state=tk.NORMAL)
         else:
-            print("DEBUG: DataFrame is None, disabling controls.")
             self.x_axis_var.set("No file loaded")
             self.x_axis_dropdown['menu'].delete(0, 'end')
             self.y_axis_listbox.delete(0, tk.END)
+            self.y_axis_columns = []
             self.disable_plotting_controls()
 
+    def _column_label(self, name):
+        """Listbox text for a column: its name plus summary statistics once they are known."""
+        summary = self.engine.column_summary(name)
+        if summary is None:
+            return name
+        if summary["count"] == 0:
+            return f"{name}   EMPTY ({summary['nan_count']:,} NaN)"
+        flag = "   CONSTANT" if summary["min"] == summary["max"] else ""
+        nan = f", {summary['nan_count']:,} NaN" if summary["nan_count"] else ""
+        return (f"{name}   [{summary['min']:.4g} .. {summary['max']:.4g}]  mean {summary['mean']:.4g}  "
+                f"std {summary['std']:.4g}  n={summary['count']:,}{nan}{flag}")
+
+    def _refresh_column_labels(self):
+        selected = self.y_axis_listbox.curselection()
+        state = self.y_axis_listbox.cget('state')
+        self.y_axis_listbox.config(state=tk.NORMAL)
+        self.y_axis_listbox.delete(0, tk.END)
+        for col in self.y_axis_columns:
+            self.y_axis_listbox.insert(tk.END, self._column_label(col))
+        for i in selected:
+            self.y_axis_listbox.selection_set(i)
+        self.y_axis_listbox.config(state=state)
+
+    def _start_stats(self):
+        """Shows cached column statistics, or computes them in one background pass over the file."""
+        self._cancel_stats()
+        if self.engine.file_set is not None:
+            return # Sessions are never scanned as a whole
+        if self.engine.cached_stats() is None:
+            self.stats_job = self.engine.start_stats_job()
+            self.master.after(100, self._poll_stats, self.stats_job)
+        else:
+            self._refresh_column_labels()
+
+    def _cancel_stats(self):
+        if self.stats_job is not None:
+            self.stats_job.cancel()
+            self.stats_job = None
+
+    def _poll_stats(self, job):
+        """Drains the background StatsJob. Runs on the Tk thread via master.after."""
+        if job is not self.stats_job:
+            return
+        while True:
+            try:
+                kind, payload = job.queue.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "progress":
+                continue
+            self.stats_job = None
+            if kind == "done":
+                self.engine.set_stats(payload)
+                self._refresh_column_labels()
+                sampling = payload.sampling
+                if "median_step" in sampling:
+                    rate = f", {sampling['rate_hz']:.4g} Hz" if sampling.get('rate_hz') else ""
+                    self.load_status_var.set(f"{self.load_status_var.get()}  Step {sampling['median_step']:.6g}{rate}, "
+                                             f"{int(sampling['n_gaps']):,} gaps (largest {sampling['max_gap']:.6g}).")
+            elif kind == "error":
+                self.load_status_var.set(f"{self.load_status_var.get()}  (Column statistics failed: {payload})")
+            return
+        self.master.after(200, self._poll_stats, job)
+
+    @profiler.traced("selection.stats")
+    def _update_range_stats(self):
+        """Called by the PointerManager when the selection settles."""
+        if self.pointer_manager is None or not self.plotted_y_cols:
+            self.range_stats_var.set("")
+            return
+        rows = self.pointer_manager.selected_rows()
+        if rows is None:
+            self.range_stats_var.set("")
+            return
+        lines = []
+        for name, summary in self.engine.range_stats(rows, self.plotted_y_cols).items():
+            if summary["count"] == 0:
+                lines.append(f"{name}: no values")
+            else:
+                lines.append(f"{name}: [{summary['min']:.4g} .. {summary['max']:.4g}]  mean {summary['mean']:.4g}  std {summary['std']:.4g}")
+        self.range_stats_var.set("\n".join(lines))
+
     def select_csv_file(self):
         file_path = filedialog.askopenfilename(
-            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
+            filetypes=[("Data files", " ".join(pattern for _, pattern in FILE_TYPES))] + FILE_TYPES + [("All files", "*.*")]
         )
         if file_path:
+            # Only one load at a time: drop whatever was being read before
+            if self.loader is not None:
+                self.loader.cancel()
+                self.loader = None
+
+            self._cancel_stats()
+            self.engine.clear()
+            self._clear_ranges()
+            self.session_window_button.config(state=tk.DISABLED)
+            self.update_column_options() # Disables controls until the new header arrives
+            self.clear_plot() # Clear previous plot if any
+
+            self.loader = self.engine.start_load(file_path)
+            self.load_status_var.set(f"Loading {file_path} ...")
+            self.cancel_load_button.config(state=tk.NORMAL)
+            self.master.after(100, self._poll_loader, self.loader)
+
+    def select_csv_folder(self):
+        folder = filedialog.askdirectory(title="Folder of CSV Files", mustexist=True)
+        if folder:
+            if self.loader is not None:
+                self.loader.cancel()
+                self.loader = None
+
+            self._cancel_stats()
+            self._clear_ranges()
+            self.session_window_button.config(state=tk.DISABLED)
+            self.loader = self.engine.start_session_scan(folder)
+            self.update_column_options()
+            self.clear_plot()
+            self.load_status_var.set(f"Indexing {folder} ...")
+            self.cancel_load_button.config(state=tk.NORMAL)
+            self.master.after(100, self._poll_scan, self.loader)
+
+    def _poll_scan(self, scan):
+        """Drains progress messages from the background FileSetScan, then loads the first window."""
+        if scan is not self.loader:
+            return
+
+        while True:
             try:
-                self.df = pd.read_csv(file_path)
-                
-                # --- Crucial: Convert 'timestamp' column to datetime here ---
-                # if 'timestamp' in self.df.columns:
-                    # self.df['timestamp'] = pd.to_datetime(self.df['timestamp'], unit='ns', errors='coerce')
-                    # Optionally, drop rows where timestamp conversion failed.
-                    # This might remove valid data if only a few timestamps are bad.
-                    # self.df.dropna(subset=['timestamp'], inplace=True)
-                    # messagebox.showinfo("Timestamp Conversion", "Attempted to convert 'timestamp' column to datetime format.")
-                # else:
-                    # messagebox.showwarning("No Timestamp Column", "CSV does not have a 'timestamp' column. Subsequence extraction by pointers might not work as expected.")
-                # --- End Crucial Addition ---
-
-                # Your existing debug prints (optional to keep)
-                # print(f"DEBUG: CSV file loaded. DataFrame head:\n{self.df.head()}")
-                # print(f"DEBUG: Columns found: {self.df.columns.tolist()}")
-                # print(f"DEBUG: Before update_column_options call. ID of Listbox: {id(self.y_axis_listbox)}")
-                
-                # messagebox.showinfo("File Loaded", f"Successfully loaded: {file_path}")
-                self.update_column_options() # This will now enable listbox/checkboxes AND the pointer display fields
-                
-                # print(f"DEBUG: After update_column_options call. ID of Listbox: {id(self.y_axis_listbox)}")
-                self.clear_plot() # Clear previous plot if any
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to read CSV: {e}")
-                # print(f"DEBUG: Error loading CSV: {e}") # Optional debug
-                self.df = None
-                # print(f"DEBUG: Error path: Before update_column_options call. ID of Listbox: {id(self.y_axis_listbox)}") # Optional debug
-                self.update_column_options() # This will disable controls if df is None
-                # print(f"DEBUG: Error path: After update_column_options call. ID of Listbox: {id(self.y_axis_listbox)}") # Optional debug
-                self.clear_plot()
+                kind, payload = scan.queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if kind == "progress":
+                done, total = payload
+                self.load_status_var.set(f"Indexed {done:,} / {total:,} files")
+            elif kind == "done":
+                self.loader = None
+                self.engine.set_file_set(payload)
+                self.update_column_options(self.engine.columns)
+                self.session_window_button.config(state=tk.NORMAL)
+                self._load_session_window(*payload.default_window(SESSION_WINDOW_ROWS))
+                return
+            else:
+                if kind == "error":
+                    messagebox.showerror("Error", f"Failed to open folder: {payload}")
+                self._finish_load(None)
+                self.load_status_var.set("Indexing cancelled." if kind == "cancelled" else "")
+                return
+
+        self.master.after(100, self._poll_scan, scan)
+
+    def _load_session_window(self, start, end):
+        file_set = self.engine.file_set
+        if start is None:
+            messagebox.showwarning("No Data", "No file in the folder has valid timestamps.")
+            return
+        n_files = len(file_set.overlapping(start, end))
+        self.loader = self.engine.start_window_load(start, end)
+        self.load_status_var.set(f"Loading {start} .. {end} from {n_files} of {len(file_set.files)} files ...")
+        self.cancel_load_button.config(state=tk.NORMAL)
+        self.master.after(100, self._poll_loader, self.loader)
+
+    def choose_session_window(self):
+        file_set = self.engine.file_set
+        if file_set is None:
+            return
+        if self.loader is not None:
+            messagebox.showwarning("Loading", "Please wait for the current load to finish or cancel it.")
+            return
+
+        first, last = file_set.time_range()
+        current_start, current_end = self.engine.window or (first, last)
+        start = simpledialog.askstring("Session Window", f"Window start ({self.engine.timestamp_column}, session spans {first} .. {last}):",
+                                       initialvalue=str(current_start), parent=self.master)
+        if start is None:
+            return
+        end = simpledialog.askstring("Session Window", f"Window end ({self.engine.timestamp_column}):",
+                                     initialvalue=str(current_end), parent=self.master)
+        if end is None:
+            return
+        try:
+            start, end = parse_timestamp(start), parse_timestamp(end)
+        except ValueError:
+            messagebox.showwarning("Invalid Window", "Window start and end must be numeric timestamps.")
+            return
+        if end < start:
+            messagebox.showwarning("Invalid Window", "Window end must not be before its start.")
+            return
+
+        self.clear_plot()
+        self._load_session_window(start, end)
+
+    def cancel_load(self):
+        if self.loader is not None:
+            self.loader.cancel()
+            self.load_status_var.set("Cancelling...")
+
+    def _poll_loader(self, loader, then=None, index=None):
+        """Drains progress messages from the background CSVLoader. Runs on the Tk thread via master.after.
+
+        `then` is None for the initial load of a file; for on-demand column loads it is called
+        once the new columns have been merged into the engine."""
+        if loader is not self.loader:
+            return # A newer load (or a cancel) replaced this one
+
+        while True:
+            try:
+                kind, payload = loader.queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if kind == "header":
+                if then is None:
+                    self.update_column_options(payload)
+            elif kind == "column_types":
+                if then is None:
+                    self.engine.set_columns(payload)
+            elif kind == "progress":
+                rows_read, bytes_read, total_bytes, eta = payload
+                percent = 100.0 * bytes_read / total_bytes if total_bytes else 100.0
+                eta_text = f", ETA {eta:.0f}s" if eta is not None else ""
+                self.load_status_var.set(
+                    f"Loaded {rows_read:,} rows ({bytes_read / 1e6:.1f} / {total_bytes / 1e6:.1f} MB, {percent:.0f}%{eta_text})"
+                )
+            elif kind == "cached":
+                self.load_status_var.set("Opening from column cache...")
+            elif kind == "index":
+                index = payload
+            elif kind == "done":
+                if then is None:
+                    self._finish_load(payload, index, loader.file_path, getattr(loader, 'extent', None))
+                else:
+                    self._finish_column_load(payload, then)
+                return
+            elif kind == "cancelled":
+                if then is None:
+                    self._finish_load(None)
+                else:
+                    self._finish_column_load(None, None)
+                self.load_status_var.set("Load cancelled.")
+                return
+            elif kind == "error":
+                messagebox.showerror("Error", f"Failed to read CSV: {payload}")
+                if then is None:
+                    self._finish_load(None)
+                else:
+                    self._finish_column_load(None, None)
+                self.load_status_var.set("")
+                return
+
+        self.master.after(100, self._poll_loader, loader, then, index)
+
+    def _finish_load(self, df, index=None, file_path=None, extent=None):
+        self.loader = None
+        self.cancel_load_button.config(state=tk.DISABLED)
+        self.engine.set_data(df, index, file_path, extent)
+
+        if df is not None and self.engine.file_set is not None:
+            file_set = self.engine.file_set
+            self.load_status_var.set(f"Loaded {len(df):,} rows from {len(file_set.overlapping(*self.engine.window))} of {len(file_set.files)} files "
+                                     f"({file_set.n_rows:,} rows in the session).")
+        elif df is not None:
+            self.load_status_var.set(f"Loaded {len(df):,} rows.")
+
+        if df is not None and self.y_axis_columns == self.engine.columns:
+            # Widgets were already filled from the header; keep whatever the user picked meanwhile
+            self.enable_plotting_controls()
+        else:
+            self.update_column_options() # Enables plotting controls if df loaded, disables them otherwise
+        self.clear_plot()
+        if df is not None:
+            self._start_stats()
+            self._load_ranges()
+
+    def toggle_follow(self):
+        if self._follow_after is not None:
+            self.master.after_cancel(self._follow_after)
+            self._follow_after = None
+        if not self.follow_var.get():
+            self.engine.stop_follow()
+            return
+        if not self.engine.loaded or self.engine.file_set is not None:
+            self.follow_var.set(False)
+            messagebox.showwarning("Follow File", "Please load a single CSV file first.")
+            return
+        try:
+            self.engine.start_follow()
+        except (OSError, ValueError) as e:
+            self.follow_var.set(False)
+            messagebox.showerror("Follow File", f"Cannot follow the file: {e}")
+            return
+        self.load_status_var.set(f"Following {self.engine.file_path} ({len(self.engine.df):,} rows).")
+        self._follow_after = self.master.after(FOLLOW_INTERVAL_MS, self._follow_tick)
+
+    def _follow_tick(self):
+        """Appends the rows written since the last check. Runs on the Tk thread via master.after."""
+        self._follow_after = None
+        if self.engine.follower is None: # Another file was loaded meanwhile
+            self.follow_var.set(False)
+            return
+        if self.loader is not None:
+            # A column load parses up to the follower's offset; let it finish before moving on
+            self._follow_after = self.master.after(FOLLOW_INTERVAL_MS, self._follow_tick)
+            return
+        try:
+            added = self.engine.follow_poll()
+        except (OSError, ValueError) as e:
+            self.engine.stop_follow()
+            self.follow_var.set(False)
+            messagebox.showerror("Follow File", f"Stopped following: {e}")
+            return
+        if added:
+            self._append_to_plot()
+            self.load_status_var.set(f"Following {self.engine.file_path}: {len(self.engine.df):,} rows (+{added:,}).")
+        self._follow_after = self.master.after(FOLLOW_INTERVAL_MS, self._follow_tick)
+
+    @profiler.traced("follow.plot")
+    def _append_to_plot(self):
+        """Feeds the rows appended since the last tick to the plotted lines. While the view shows the
+        newest rows it scrolls to the last FOLLOW_WINDOW_ROWS rows, so a redraw stays bounded."""
+        if self.decimator is None or not self.plot_lines:
+            return
+        n_old = len(self.decimator.x) # Rows an earlier tick could not plot are picked up here
+        rows = slice(n_old, None)
+        names = {line: name for name, line in self.plot_lines.items()}
+        try:
+            x_new = self.engine.x_values(self.plot_x_col, rows)
+            y_new = [self.engine.y_values(names[line], rows) for line, _, _ in self.decimator.lines]
+        except ValueError:
+            return # e.g. only NaNs in the new rows so far; retried on the next tick
+        ax = self.decimator.ax
+        at_tail = n_old > 0 and ax.get_xlim()[1] >= self.decimator.x[n_old - 1]
+        self.decimator.append(x_new, y_new)
+        x = self.decimator.x
+
+        if at_tail and self.decimator.x_is_sorted:
+            ax.set_xlim(x[max(0, len(x) - FOLLOW_WINDOW_ROWS)], x[-1]) # Re-decimates through xlim_changed
+            ax.relim(visible_only=True)
+            ax.autoscale_view(scalex=False)
+        else:
+            self.decimator.refresh()
+
+        if self.pointer_manager is not None:
+            self.pointer_manager.extend_samples(
+                self.engine.axis_index(self.plot_x_col, x, previous=self.pointer_manager.sample_index), float(np.nanmax(x[n_old:]))
+            )
+        self.canvas.draw_idle()
+
+    def _load_columns(self, names, then):
+        """Loads the not-yet-loaded columns among `names` in the background, then calls `then()`.
+        Returns False (and does nothing) if everything is loaded already."""
+        missing = self.engine.missing_columns(names)
+        if not missing:
+            return False
+        if self.loader is not None:
+            messagebox.showwarning("Loading", "Please wait for the current load to finish or cancel it.")
+            return True
+        self.loader = self.engine.start_column_load(missing)
+        self.load_status_var.set(f"Loading {len(missing)} column(s): {', '.join(missing[:5])}{' ...' if len(missing) > 5 else ''}")
+        self.cancel_load_button.config(state=tk.NORMAL)
+        self.master.after(100, self._poll_loader, self.loader, then)
+        return True
+
+    def _finish_column_load(self, df, then):
+        self.loader = None
+        self.cancel_load_button.config(state=tk.DISABLED)
+        if df is None:
+            return
+        self.engine.add_columns(df)
+        self.load_status_var.set(f"Loaded {len(self.engine.df.columns)} of {len(self.engine.columns)} columns.")
+        then()
 
     def clear_plot(self):
+        """Tears the plot down completely; used when different data is loaded."""
+        self.plotted_y_cols = []
+        self.plot_x_col = None
+        self.plot_lines = {}
+        self.range_patches = []
+        self.range_stats_var.set("")
+        self._drop_pointers()
+        self._cancel_pyramids()
+        if self.decimator:
+            self.decimator.disconnect()
+            self.decimator = None
         if self.canvas:
             self.canvas.get_tk_widget().destroy()
             plt.close(self.fig)
             self.canvas = None
             self.fig = None
 
+    def _drop_pointers(self):
+        """Disconnects the PointerManager. Its sample positions belong to the frame it was made for,
+        so no export or range may use them once another frame (e.g. session window) is loaded."""
+        if self.pointer_manager is not None:
+            self.pointer_manager.disconnect()
+            self.pointer_manager = None
+        self.start_pointer_line = None
+        self.end_pointer_line = None
+        self.start_timestamp_var.set("")
+        self.end_timestamp_var.set("")
+
+    def _reset_axes(self):
+        """Empties the axes for a plot against another X column, keeping the figure and its Tk canvas."""
+        self._drop_pointers()
+        self._cancel_pyramids()
+        if self.decimator:
+            self.decimator.disconnect()
+            self.decimator = None
+        self.plot_lines = {}
+        self.range_patches = []
+        self.fig.axes[0].clear()
+
+    def _y_data(self, y_cols):
+        """{name: float array} of the channels that can be plotted; warns about the others."""
+        y_data = {}
+        for y_col in y_cols:
+            try:
+                y_data[y_col] = self.engine.y_values(y_col)
+            except ValueError as e:
+                messagebox.showwarning("Invalid Y-axis Data", str(e))
+        return y_data
+
+    def _add_plot_line(self, y_col, y):
+        # Zoom and pan read a min/max pyramid instead of re-scanning the rows. One not built yet is
+        # built in the background (_start_pyramids); until then the rows are decimated directly
+        pyramid = self.engine.cached_pyramid(y_col) if self.decimator.wants_pyramid(len(y)) else None
+        self.plot_lines[y_col] = self.decimator.add_line(y, pyramid=pyramid, label=y_col)
+
+    def _start_pyramids(self):
+        """Builds the pyramids the plotted lines are still missing on a worker thread."""
+        self._cancel_pyramids()
+        names = {line: y_col for y_col, line in self.plot_lines.items()}
+        values = {names[line]: y for line, y in self.decimator.pending_pyramids() if line in names}
+        if values:
+            self.pyramid_job = self.engine.start_pyramid_job(values)
+            self.master.after(100, self._poll_pyramids, self.pyramid_job)
+
+    def _cancel_pyramids(self):
+        if self.pyramid_job is not None:
+            self.pyramid_job.cancel()
+            self.pyramid_job = None
+
+    def _poll_pyramids(self, job):
+        """Hands finished pyramids to the engine and the plotted lines. Runs on the Tk thread via master.after."""
+        if job is not self.pyramid_job:
+            return
+        try:
+            kind, payload = job.queue.get_nowait()
+        except queue.Empty:
+            self.master.after(100, self._poll_pyramids, job)
+            return
+        self.pyramid_job = None
+        if kind == "done":
+            self.engine.add_pyramids(payload)
+            for y_col, pyramid in payload.items():
+                if y_col in self.plot_lines and self.decimator is not None:
+                    self.decimator.set_pyramid(self.plot_lines[y_col], pyramid)
+
+    def _label_axes(self, ax, x_col, y_cols):
+        ax.set_title(f"Plot of {', '.join(y_cols)} vs {x_col}")
+        ax.set_xlabel(x_col)
+        ax.set_ylabel("Value")
+        ax.legend(handles=[self.plot_lines[c] for c in y_cols]) # Not the pointer lines
+        ax.grid(True)
+
+    @profiler.traced("plot")
     def plot_columns(self):
-        if self.df is None:
+        if not self.engine.loaded:
             messagebox.showwarning("No Data", "Please load a CSV file first.")
             return
 
         x_col = self.x_axis_var.get()
         selected_y_indices = self.y_axis_listbox.curselection() # Use .curselection() for Listbox
-        y_cols = [self.y_axis_listbox.get(i) for i in selected_y_indices]
+        y_cols = [self.y_axis_columns[i] for i in selected_y_indices]
         # If using Checkbuttons:
         # y_cols = [col_name for col_name, var in self.y_axis_checkboxes.items() if var.get()]
 
-        if not x_col or x_col == "No file loaded" or x_col not in self.df.columns:
+        if not x_col or x_col == "No file loaded" or x_col not in self.engine.columns:
             messagebox.showwarning("Invalid Selection", "Please select a valid X-axis column.")
             return
 
         if not y_cols:
             messagebox.showwarning("No Selection", "Please select at least one Y-axis column.")
             return
-        
+
+        # Only the X column and the selected channels are ever parsed; fetch any not loaded yet
+        if self._load_columns([x_col] + y_cols, then=self.plot_columns):
+            return
+
+        # Same X column as the current plot: keep the figure, the prepared X array and the
+        # pointers, and only add or remove the Line2D artists of channels that changed
+        if self.decimator is not None and x_col == self.plot_x_col and len(self.decimator.x) == len(self.engine.df):
+            self._update_plot_lines(x_col, y_cols)
+            return
+
         # Ensure X-axis data is suitable for plotting and pointer interaction
-        x_data_for_plot = self.df[x_col]
-        is_datetime_x = pd.api.types.is_datetime64_any_dtype(x_data_for_plot)
+        try:
+            x_data_for_plot = self.engine.x_values(x_col)
+        except ValueError as e:
+            messagebox.showwarning("Invalid X-axis Data", str(e))
+            return
 
-        if not is_datetime_x: # If X-axis is not datetime, convert to numeric for plotting
-            x_data_for_plot = pd.to_numeric(x_data_for_plot, errors='coerce')
-            if x_data_for_plot.isnull().all():
-                messagebox.showwarning("Invalid X-axis Data", f"X-axis column '{x_col}' contains no valid numeric or datetime data for plotting.")
-                return
-            
         # Ensure Y-axis data is numeric
-        for y_col in y_cols:
-            if not pd.api.types.is_numeric_dtype(self.df[y_col]):
-                messagebox.showwarning("Invalid Y-axis Data", f"Y-axis column '{y_col}' is not numeric and cannot be plotted.")
-                y_cols.remove(y_col) # Remove non-numeric columns from list to plot
+        y_data_for_plot = self._y_data(y_cols)
+        y_cols = list(y_data_for_plot) # Non-numeric columns are dropped from the plot
         if not y_cols: # If all y_cols were removed due to non-numeric data
             messagebox.showwarning("No Plottable Y-axis Data", "All selected Y-axis columns contain no valid numeric data for plotting.")
             return
 
-        self.clear_plot() # Clear previous plot
-
-        self.fig, ax = plt.subplots(figsize=(10, 7))
+        # The figure and its canvas widget are created once and reused for every later plot
+        new_canvas = self.fig is None
+        self._drop_pointers() # Pointers of an earlier frame must not select rows of this one
+        if new_canvas:
+            self.fig, ax = plt.subplots(figsize=(10, 7))
+        else:
+            self._reset_axes()
+            ax = self.fig.axes[0]
 
-        plotted_any = False
+        # Lines are drawn from a min/max envelope sized to the axis width, not from every row
+        self.decimator = LineDecimator(ax, x_data_for_plot)
+        self.plot_lines = {}
         for y_col in y_cols:
-            # We already converted Y-axis to numeric or removed non-numeric above
-            ax.plot(x_data_for_plot, self.df[y_col], label=y_col)
-            plotted_any = True
-
-        if not plotted_any:
-            messagebox.showwarning("No Plottable Data", "No valid numeric Y-axis columns found to plot against the selected X-axis.")
-            self.clear_plot()
-            return
+            self._add_plot_line(y_col, y_data_for_plot[y_col])
 
-        ax.set_title(f"Plot of {', '.join(y_cols)} vs {x_col}")
-        ax.set_xlabel(x_col)
-        ax.set_ylabel("Value")
-        ax.legend()
-        ax.grid(True)
+        self._label_axes(ax, x_col, y_cols)
         self.fig.tight_layout()
 
-        self.canvas = FigureCanvasTkAgg(self.fig, master=self.plot_frame)
+        if new_canvas:
+            self.canvas = FigureCanvasTkAgg(self.fig, master=self.plot_frame)
+            if profiler.enabled:
+                # Full redraws (draw_idle ends up here too) are timed and counted as frames
+                self.canvas.draw = profiler.traced("canvas.draw")(self.canvas.draw)
+                self.canvas.mpl_connect('draw_event', lambda event: profiler.frame())
+            self.canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+        self.decimator.connect(self.canvas) # Re-decimate the visible window on zoom/pan/resize
         self.canvas.draw()
-        self.canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+        self.plot_x_col = x_col
 
         # --- Initialize Pointers ---
         # Get the X-axis limits of the plot for initial pointer positions and clamping
@@ -328,7 +885,13 @@ class CSVPlotterApp:
             x_data_range_mpl=(min_x_plot, max_x_plot),
             start_var=self.start_timestamp_var,
             end_var=self.end_timestamp_var,
-            app_instance=self # --- MODIFICATION: Pass 'self' here ---
+            app_instance=self, # --- MODIFICATION: Pass 'self' here ---
+            # Pointers snap to real samples of the plotted X column (O(log n) per motion event)
+            sample_index=self.engine.axis_index(x_col, self.decimator.x),
+            count_var=self.selected_rows_var,
+            on_selection_changed=self._on_selection_changed,
+            on_click=self._on_plot_click, # Picks the named range under the click
+            format_value=(lambda v: mdates.num2date(v).strftime('%Y-%m-%d %H:%M:%S.%f')) if self.decimator.is_datetime_x else None,
         )
         
         # Explicitly set the readonly state of the display entries after initial plot, 
@@ -336,54 +899,425 @@ class CSVPlotterApp:
         self.start_timestamp_display.config(state='readonly')
         self.end_timestamp_display.config(state='readonly')
 
+        self.plotted_y_cols = y_cols
+        self._update_range_stats()
+        self._draw_ranges()
+        self._start_pyramids()
+
         self.canvas.draw_idle() # Request final redraw to show pointers
 
-    def export_subsequence(self):
-        if self.df is None:
-            messagebox.showwarning("No Data", "Please load a CSV file first.")
+    def _update_plot_lines(self, x_col, y_cols):
+        """Brings the current plot to the channels `y_cols`: removed channels lose their line, new
+        ones get one. X limits and the pointers (and so the selection) stay where they are."""
+        y_data = self._y_data([c for c in y_cols if c not in self.plot_lines])
+        y_cols = [c for c in y_cols if c in self.plot_lines or c in y_data]
+        if not y_cols:
+            messagebox.showwarning("No Plottable Y-axis Data", "All selected Y-axis columns contain no valid numeric data for plotting.")
             return
 
-        start_ts_str = self.start_timestamp_var.get().strip()
-        end_ts_str = self.end_timestamp_var.get().strip()
+        for name in [c for c in self.plot_lines if c not in y_cols]:
+            self.decimator.remove_line(self.plot_lines.pop(name))
+        for name, y in y_data.items():
+            self._add_plot_line(name, y)
+
+        ax = self.decimator.ax
+        self._label_axes(ax, x_col, y_cols)
+        # Fit Y to the channels now shown, leaving the X range (zoom) alone
+        ax.relim(visible_only=True)
+        ax.autoscale_view(scalex=False)
+
+        self.plotted_y_cols = y_cols
+        self._update_range_stats()
+        self._start_pyramids()
+        self.canvas.draw_idle()
+
+    # --- Named ranges ---
+
+    def _clear_ranges(self):
+        self.range_set = RangeSet()
+        self.ranges_path = None
+        self.active_range = None
+        self._refresh_range_list()
+
+    def _load_ranges(self):
+        """Reads the sidecar of the loaded recording, once per recording (not per session window)."""
+        path = self.engine.ranges_path()
+        if path == self.ranges_path:
+            return
+        self._clear_ranges()
+        self.ranges_path = path
+        if os.path.exists(path):
+            try:
+                self.range_set = RangeSet.load(path)
+            except (OSError, ValueError) as e:
+                messagebox.showwarning("Ranges", f"Could not read the ranges in {path}: {e}")
+        self._refresh_range_list()
 
-        if not start_ts_str or not end_ts_str:
-            messagebox.showwarning("Input Error", "Please move the pointers to define the start and end timestamps.")
+    def _save_ranges(self):
+        try:
+            self.range_set.save(self.ranges_path)
+        except OSError as e:
+            messagebox.showerror("Ranges", f"Could not save the ranges to {self.ranges_path}: {e}")
+
+    def _range_axis(self):
+        """(timestamp -> x, x -> timestamp) converters between range bounds and the plot's X axis, or
+        None unless the timestamp column is plotted as X (ranges are then only listed, not drawn)."""
+        if self.decimator is None or self.plot_x_col != self.engine.timestamp_column:
+            return None
+        if self.decimator.is_datetime_x: # Ranges hold int64 nanoseconds, like the index
+            return (lambda t: mdates.date2num(np.datetime64(int(t), 'ns')),
+                    lambda x: int(np.datetime64(mdates.num2date(x).replace(tzinfo=None), 'ns').astype(np.int64)))
+        return float, float
+
+    def _refresh_range_list(self):
+        self.range_listbox.delete(0, tk.END)
+        for r in self.range_set.ranges:
+            self.range_listbox.insert(tk.END, f"{r['label']}: {r['start']} .. {r['end']}")
+        position = self.range_set.position(self.active_range) if self.active_range is not None else None
+        if position is not None:
+            self.range_listbox.selection_set(position)
+            self.range_listbox.see(position)
+        self._draw_ranges()
+
+    def _draw_ranges(self):
+        """Shades the ranges on the plot, the active one darker. The shading is part of the static
+        background, so pointer drags still only blit the pointers."""
+        for patch in self.range_patches:
+            patch.remove()
+        self.range_patches = []
+        axis = self._range_axis()
+        if axis is None:
             return
-        
-        if 'timestamp' not in self.df.columns:
-            messagebox.showerror("Error", "The 'timestamp' column is not available or not in datetime format. Please load a CSV with valid timestamps.")
+        to_x, _ = axis
+        ax = self.decimator.ax
+        xlim = ax.get_xlim()
+        for r in self.range_set.ranges:
+            active = r is self.active_range
+            self.range_patches.append(ax.axvspan(to_x(r['start']), to_x(r['end']), color='orange' if active else 'gray',
+                                                 alpha=0.3 if active else 0.15, zorder=0))
+        if ax.get_xlim() != xlim:
+            ax.set_xlim(xlim) # Shading must not widen the view
+        self.canvas.draw_idle()
+
+    def _activate_range(self, range_):
+        """Makes `range_` (or None) the range the pointers edit, and moves the pointers onto it."""
+        self.active_range = range_
+        axis = self._range_axis()
+        if range_ is not None and axis is not None and self.pointer_manager is not None:
+            to_x, _ = axis
+            self.pointer_manager.select(to_x(range_['start']), to_x(range_['end']))
+            self._update_range_stats()
+        self._refresh_range_list()
+
+    def _on_range_list_select(self, event):
+        selection = self.range_listbox.curselection()
+        if selection:
+            self._activate_range(self.range_set.ranges[selection[0]])
+
+    def _on_plot_click(self, x):
+        """A click on the plot away from the pointers picks the range under it (the innermost of
+        nested ones) via the range set's interval tree; a click outside every range drops the pick."""
+        axis = self._range_axis()
+        if axis is None:
+            return
+        hits = self.range_set.at(axis[1](x))
+        if hits or self.active_range is not None:
+            self._activate_range(hits[0] if hits else None)
+
+    def _on_selection_changed(self):
+        """After a pointer drag: refresh the selection statistics and move the active range along."""
+        self._update_range_stats()
+        rows = self.pointer_manager.selected_rows() if self.pointer_manager is not None else None
+        if self.active_range is None or rows is None or self._range_axis() is None:
+            return
+        start, end = self.engine.timestamp_bounds(rows)
+        if (start, end) != (self.active_range['start'], self.active_range['end']):
+            self.range_set.update(self.active_range, start=start, end=end)
+            self._save_ranges()
+            self._refresh_range_list()
+
+    def add_range(self):
+        rows = self.pointer_manager.selected_rows() if self.pointer_manager is not None else None
+        if rows is None or self.engine.index is None:
+            messagebox.showwarning("Add Range", "Please plot the data and move the pointers around the event first.")
+            return
+        label = simpledialog.askstring("Add Range", "Label:", initialvalue=self._last_range_label, parent=self.master)
+        if label is None:
+            return
+        label = label.strip() or "range"
+        start, end = self.engine.timestamp_bounds(rows)
+        self.range_set.add(label, start, end)
+        self._last_range_label = label
+        # The new range is not picked, so the pointers can move straight on to the next event
+        self.active_range = None
+        self._save_ranges()
+        self._refresh_range_list()
+
+    def rename_range(self):
+        if self.active_range is None:
+            messagebox.showwarning("Rename Range", "Please pick a range in the list or on the plot first.")
+            return
+        label = simpledialog.askstring("Rename Range", "Label:", initialvalue=self.active_range['label'], parent=self.master)
+        if label is None or not label.strip():
             return
+        self.range_set.update(self.active_range, label=label.strip())
+        self._save_ranges()
+        self._refresh_range_list()
 
-        try:
-            # --- MODIFICATION: Add the 'format' argument to pd.to_datetime ---
-            # '%f' here correctly handles microseconds (up to 6 digits)
+    def remove_range(self):
+        if self.active_range is None:
+            messagebox.showwarning("Remove Range", "Please pick a range in the list or on the plot first.")
+            return
+        self.range_set.remove(self.active_range)
+        self.active_range = None
+        self._save_ranges()
+        self._refresh_range_list()
+
+    def export_ranges(self):
+        if self.engine.index is None:
+            messagebox.showwarning("No Data", "Please load a CSV file with a 'timestamp' column first.")
+            return
+
+        if not len(self.range_set):
+            messagebox.showwarning("Export Ranges", "There are no ranges yet. Select an event with the pointers and press \"Add Range\".")
+            return
 
-            start_dt = int(float(start_ts_str))
-            end_dt = int(float(end_ts_str))
-            # --- END MODIFICATION ---
-        except Exception as e:
-            messagebox.showerror("Timestamp Parse Error", f"Could not parse timestamps from pointer positions. Error: {e}\nEnsure CSV 'timestamp' format is compatible.")
+        if self.export_writer is not None:
+            messagebox.showwarning("Export Running", "Please wait for the current export to finish or cancel it.")
             return
 
-        # Filter the DataFrame based on the datetime range
-        sub_df = self.df[(self.df['timestamp'] >= start_dt) & (self.df['timestamp'] <= end_dt)].copy()
+        if self._load_columns(self.engine.columns, then=self.export_ranges):
+            return
+        if self._gather_session_stats(then=self.export_ranges):
+            return
+
+        # Every range is cut out of the data already loaded, through the same index, in one parallel batch
+        bounds, names = self.engine.range_windows(self.range_set)
+        if len(bounds) == 0:
+            messagebox.showwarning("No Data Found", "None of the ranges has rows in the loaded data.")
+            return
+        skipped = len(self.range_set) - len(bounds)
+        if skipped and not messagebox.askyesno("Export Ranges", f"{skipped} of {len(self.range_set)} ranges have no rows in the loaded data "
+                                                                 "and will be skipped. Continue?"):
+            return
 
-        if sub_df.empty:
-            messagebox.showwarning("No Data Found", "No data points found within the specified timestamp range.")
+        out_dir = filedialog.askdirectory(title="Folder for Range Files", mustexist=False)
+        if not out_dir:
+            return
+
+        transform = self._export_transform()
+        if transform is False:
+            return
+
+        self.export_writer = self.engine.chunk_job(
+            bounds, out_dir,
+            names=names,
+            float_format=FAST_FLOAT_FORMAT if self.fast_float_var.get() else None,
+            transform=transform,
+        )
+        self.export_status_var.set(f"Exporting {len(bounds):,} ranges...")
+        self.export_subsequence_button.config(state=tk.DISABLED)
+        self.batch_chunk_button.config(state=tk.DISABLED)
+        self.export_ranges_button.config(state=tk.DISABLED)
+        self.cancel_export_button.config(state=tk.NORMAL)
+        self.master.after(100, self._poll_export, self.export_writer, "ranges")
+
+    def export_subsequence(self):
+        if not self.engine.loaded:
+            messagebox.showwarning("No Data", "Please load a CSV file first.")
+            return
+
+        if self.pointer_manager is None or self.pointer_manager.sample_index is None:
+            messagebox.showwarning("Input Error", "Please plot the data and move the pointers to define the start and end of the subsequence.")
+            return
+
+        # The pointers sit on real samples, so their row range is exported as-is (no re-scan, no float round-trip)
+        rows = self.pointer_manager.selected_rows()
+        row_count = self.pointer_manager.selected_row_count()
+
+        if row_count == 0:
+            messagebox.showwarning("No Data Found", "No data points found within the specified range.")
+            return
+
+        if self.export_writer is not None:
+            messagebox.showwarning("Export Running", "Please wait for the current export to finish or cancel it.")
+            return
+
+        # Exports carry every column, so load the ones that were never plotted first
+        if self._load_columns(self.engine.columns, then=self.export_subsequence):
+            return
+        if self._gather_session_stats(then=self.export_subsequence):
             return
 
         # Prompt user for save location
         output_file_path = filedialog.asksaveasfilename(
             defaultextension=".csv",
-            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
+            filetypes=FILE_TYPES[:1] + [("Gzipped CSV", "*.csv.gz"), ("Zstandard CSV", "*.csv.zst")] + FILE_TYPES[1:] + [("All files", "*.*")],
             title="Save Subsequence As"
         )
 
         if output_file_path:
-            try:
-                sub_df.to_csv(output_file_path, index=False)
-                messagebox.showinfo("Export Successful", f"Subsequence exported to:\n{output_file_path}")
-            except Exception as e:
-                messagebox.showerror("Export Error", f"Failed to export subsequence: {e}")
+            transform = self._export_transform()
+            if transform is False:
+                return
+            # Rows are written in blocks on a worker thread; the selected range is never copied as a whole
+            self.export_writer = self.engine.export_rows_job(
+                rows, output_file_path,
+                float_format=FAST_FLOAT_FORMAT if self.fast_float_var.get() else None,
+                transform=transform,
+            )
+            self.export_status_var.set(f"Exporting {row_count:,} rows...")
+            self.export_subsequence_button.config(state=tk.DISABLED)
+            self.batch_chunk_button.config(state=tk.DISABLED)
+            self.export_ranges_button.config(state=tk.DISABLED)
+            self.cancel_export_button.config(state=tk.NORMAL)
+            self.master.after(100, self._poll_export, self.export_writer, "rows")
         else:
-            messagebox.showinfo("Export Cancelled", "Subsequence export was cancelled.")
\ No newline at end of file
+            messagebox.showinfo("Export Cancelled", "Subsequence export was cancelled.")
+
+    def _export_transform(self):
+        """The Pipeline for the "Export Transforms" field, None if it is empty, or False (after telling
+        the user) if it is invalid or needs column statistics that are not ready yet."""
+        spec = self.transform_var.get().strip()
+        if not spec:
+            return None
+        if needs_stats(spec) and self.engine.file_set is None and self.engine.stats is None:
+            messagebox.showwarning("Statistics Not Ready", "Normalization uses the file's column statistics, which are still being computed. Please try again in a moment.")
+            return False
+        try:
+            # Sessions normalize with the statistics of the files under the loaded window (gathered beforehand)
+            return self.engine.transform(spec, *(self.engine.window or (None, None)))
+        except ValueError as e:
+            messagebox.showerror("Export Transforms", f"Invalid transform: {e}\n\nAvailable stages: {STAGES}")
+            return False
+
+    def _gather_session_stats(self, then):
+        """For a session whose export transforms normalize, gathers the statistics of the files under the
+        loaded window in the background, then calls `then()`. Returns False (and does nothing) if they
+        are all known already."""
+        if self.engine.file_set is None or not needs_stats(self.transform_var.get()):
+            return False
+        window = self.engine.window or (None, None)
+        if not self.engine.missing_file_stats(*window):
+            return False
+        if self.stats_job is not None:
+            messagebox.showwarning("Statistics Running", "Please wait for the normalization statistics to finish.")
+            return True
+        self.stats_job = self.engine.start_session_stats_job(*window)
+        self.export_status_var.set("Computing normalization statistics...")
+        self.master.after(100, self._poll_session_stats, self.stats_job, then)
+        return True
+
+    def _poll_session_stats(self, job, then):
+        """Drains the background SessionStatsJob. Runs on the Tk thread via master.after."""
+        if job is not self.stats_job:
+            return
+        while True:
+            try:
+                kind, payload = job.queue.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "progress":
+                done, total = payload
+                self.export_status_var.set(f"Computing normalization statistics: {done:,} / {total:,} files")
+                continue
+            self.stats_job = None
+            self.export_status_var.set("")
+            if kind == "done":
+                self.engine.add_file_stats(payload)
+                then()
+            elif kind == "error":
+                messagebox.showerror("Export Transforms", f"Failed to compute normalization statistics: {payload}")
+            return
+        self.master.after(200, self._poll_session_stats, job, then)
+
+    def cancel_export(self):
+        if self.export_writer is not None:
+            self.export_writer.cancel()
+            self.export_status_var.set("Cancelling export...")
+
+    def _poll_export(self, writer, unit):
+        """Drains progress messages from the background ExportWriter. Runs on the Tk thread via master.after."""
+        while True:
+            try:
+                kind, payload = writer.queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if kind == "progress":
+                written, total = payload
+                percent = 100.0 * written / total if total else 100.0
+                self.export_status_var.set(f"Exported {written:,} / {total:,} {unit} ({percent:.0f}%)")
+            else:
+                self.export_writer = None
+                self.cancel_export_button.config(state=tk.DISABLED)
+                if self.engine.loaded:
+                    self.export_subsequence_button.config(state=tk.NORMAL)
+                    self.batch_chunk_button.config(state=tk.NORMAL)
+                    self.export_ranges_button.config(state=tk.NORMAL)
+                if kind == "done":
+                    self.export_status_var.set("")
+                    messagebox.showinfo("Export Successful", f"Exported to:\n{payload}")
+                elif kind == "cancelled":
+                    self.export_status_var.set("Export cancelled.")
+                elif kind == "error":
+                    self.export_status_var.set("")
+                    messagebox.showerror("Export Error", f"Failed to export subsequence: {payload}")
+                return
+
+        self.master.after(100, self._poll_export, writer, unit)
+
+    def batch_chunk_export(self):
+        if self.engine.index is None:
+            messagebox.showwarning("No Data", "Please load a CSV file with a 'timestamp' column first.")
+            return
+
+        if self.export_writer is not None:
+            messagebox.showwarning("Export Running", "Please wait for the current export to finish or cancel it.")
+            return
+
+        if self._load_columns(self.engine.columns, then=self.batch_chunk_export):
+            return
+        if self._gather_session_stats(then=self.batch_chunk_export):
+            return
+
+        window = simpledialog.askinteger("Batch Chunk Export", "Window length (rows):", minvalue=1, parent=self.master)
+        if not window:
+            return
+        stride = simpledialog.askinteger("Batch Chunk Export", "Stride between window starts (rows, smaller than the window for overlap):",
+                                         minvalue=1, initialvalue=window, parent=self.master)
+        if not stride:
+            return
+
+        # Optionally restrict the windows to the region between the start and end pointers. Regions
+        # are timestamps, so they come from the selected rows, not from X-axis values
+        regions = None
+        rows = self.pointer_manager.selected_rows() if self.pointer_manager is not None else None
+        if rows is not None:
+            if messagebox.askyesno("Batch Chunk Export", "Only cut windows between the start and end pointers?"):
+                regions = [self.engine.timestamp_bounds(rows)]
+
+        bounds = self.engine.chunk_bounds(window, stride, regions=regions)
+        if len(bounds) == 0:
+            messagebox.showwarning("No Data Found", "The selected range is shorter than one window.")
+            return
+
+        out_dir = filedialog.askdirectory(title="Folder for Chunk Files", mustexist=False)
+        if not out_dir:
+            return
+
+        transform = self._export_transform()
+        if transform is False:
+            return
+
+        self.export_writer = self.engine.chunk_job(
+            bounds, out_dir,
+            float_format=FAST_FLOAT_FORMAT if self.fast_float_var.get() else None,
+            transform=transform,
+        )
+        self.export_status_var.set(f"Exporting {len(bounds):,} chunks...")
+        self.export_subsequence_button.config(state=tk.DISABLED)
+        self.batch_chunk_button.config(state=tk.DISABLED)
+        self.export_ranges_button.config(state=tk.DISABLED)
+        self.cancel_export_button.config(state=tk.NORMAL)
+        self.master.after(100, self._poll_export, self.export_writer, "chunks")
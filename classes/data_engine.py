@@ -0,0 +1,525 @@
+import numpy as np
+import pandas as pd
+
+from classes.chunker import ChunkExportJob, chunk_file, window_bounds
+from classes.column_stats import ColumnStats, SessionStatsJob, StatsJob, compute_stats, file_stats, merged_summaries, summarize
+from classes.column_types import column_kind, frame_from_columns
+from classes.csv_loader import CSVLoader, read_loader
+from classes.export_writer import ExportWriter, write_rows
+from classes.file_follower import FileFollower, GrowingFrame
+from classes.file_set import FileSet, FileSetScan, WindowLoader, load_window
+from classes.formats import is_columnar
+from classes.lod_pyramid import LodPyramid, PyramidJob
+from classes.profiler import profiler
+from classes.range_set import sidecar_path
+from classes.timestamp_index import TimestampIndex, epoch_seconds_per_unit
+from classes.transforms import needs_stats, parse_pipeline
+
+
+class DataEngine:
+    """GUI-independent core of the editor: loading, column typing, timestamp range selection and export.
+
+    CSVPlotterApp is a Tk front end over one of these; cli.py and scripts use it directly.
+    Long-running steps come in two flavours: a blocking call (load, export, chunk) for scripts
+    and worker processes, and a *_job/start_* variant that returns a background worker
+    with a progress queue for the GUI.
+
+    Columns are loaded on demand: `columns` lists everything in the file (from a cheap header
+    sniff), while `df` only holds the columns loaded so far. Blocking accessors load what they
+    need; the GUI loads missing columns in the background first (see missing_columns).
+
+    A session (open_session) is a FileSet of rotated logs instead of one file. Only a time
+    window of it is loaded at a time (focus); `df` and `index` then describe that window, and
+    session-wide counts and exports go through `file_set`, which only opens overlapping files.
+    """
+
+    def __init__(self, cache=None, timestamp_column='timestamp', timestamp_unit=None):
+        self.cache = cache # Optional ColumnCache
+        self.timestamp_column = timestamp_column
+        self.timestamp_unit = timestamp_unit # Seconds per timestamp unit; None infers it (see seconds_per_unit)
+        self.clear()
+
+    def clear(self):
+        self.file_path = None
+        self.df = None
+        self.index = None # TimestampIndex over timestamp_column, if the file has one
+        self.column_types = {} # Sniffed {name: {"dtype", "kind"}} for every column in the file
+        self.file_set = None # FileSet when a directory/glob of files is open
+        self.window = None # (start, end) timestamps of the session window held in df
+        self.pyramids = {} # Column name -> LodPyramid over the rows of df
+        self.stats = None # ColumnStats of the file's numeric columns, once computed
+        self.file_stats = {} # Session file path -> ColumnStats, for normalizing exports
+        self.extent = None # CSVLoader.extent of the loaded CSV: (parsed_bytes, complete_bytes, complete_rows)
+        self.follower = None # FileFollower while rows appended to the file are being followed
+        self._growing = None # GrowingFrame behind df in follow mode
+
+    @property
+    def loaded(self):
+        return self.df is not None
+
+    # --- Loading ---
+
+    def load(self, file_path, columns=None, progress=None):
+        """Blocking load of `columns` (default: all) plus the timestamp column.
+        `progress(rows_read, bytes_read, total_bytes, eta)` is called per chunk."""
+        usecols = None if columns is None else [self.timestamp_column] + list(columns)
+        loader = CSVLoader(file_path, cache=self.cache, index_column=self.timestamp_column, usecols=usecols)
+        df, index, column_types = read_loader(loader, progress)
+        self.set_columns(column_types)
+        self.set_data(df, index, file_path, loader.extent)
+        return self
+
+    def start_load(self, file_path):
+        """Starts a background CSVLoader for the timestamp column only. The caller drains its
+        queue and hands the "column_types", "index" and "done" payloads (and its extent) to set_columns and set_data."""
+        self.clear()
+        loader = CSVLoader(file_path, cache=self.cache, index_column=self.timestamp_column, usecols=[self.timestamp_column])
+        loader.start()
+        return loader
+
+    def open_session(self, source, workers=None, progress=None):
+        """Blocking scan of a directory or glob of CSVs into a FileSet; loads no data yet (see focus).
+        `progress(files_done, total_files)` is called as files are indexed."""
+        self.clear()
+        self.set_file_set(FileSet.scan(source, timestamp_column=self.timestamp_column, cache=self.cache,
+                                       workers=workers, progress=progress))
+        return self
+
+    def start_session_scan(self, source, workers=None):
+        """Starts a background FileSetScan; hand its "done" payload to set_file_set."""
+        self.clear()
+        scan = FileSetScan(source, timestamp_column=self.timestamp_column, cache=self.cache, workers=workers)
+        scan.start()
+        return scan
+
+    def set_file_set(self, file_set):
+        self.file_set = file_set
+        self.file_stats = {}
+        self.set_columns(file_set.column_types)
+
+    def focus(self, start, end, columns=None, workers=None, progress=None):
+        """Blocking load of the session rows with start <= timestamp <= end into `df`.
+        Loads `columns` plus the timestamp column (default: the columns loaded now)."""
+        if columns is None:
+            columns = self.df.columns.tolist() if self.df is not None else []
+        df, index = load_window(self.file_set, start, end, columns, workers=workers, progress=progress)
+        self.window = (start, end)
+        self.set_data(df, index, self.file_set.source)
+        return self
+
+    def start_window_load(self, start, end, workers=None):
+        """Starts a background WindowLoader for a session window, keeping the columns loaded now.
+        Its messages are handled like start_load's."""
+        columns = self.df.columns.tolist() if self.df is not None else [self.timestamp_column]
+        self.window = (start, end)
+        loader = WindowLoader(self.file_set, start, end, columns, workers=workers)
+        loader.start()
+        return loader
+
+    def set_columns(self, column_types):
+        self.column_types = dict(column_types)
+
+    def set_data(self, df, index=None, file_path=None, extent=None):
+        self.stop_follow()
+        self.extent = extent if df is not None else None
+        self.pyramids = {}
+        self.stats = None
+        self.df = df
+        self.index = index if df is not None else None
+        self.file_path = file_path if df is not None else None
+
+    # --- Columns ---
+
+    @property
+    def columns(self):
+        """Every column in the file, loaded or not."""
+        if self.column_types:
+            return list(self.column_types)
+        return self.df.columns.tolist() if self.df is not None else []
+
+    def missing_columns(self, names):
+        """The subset of `names` that exists in the file but has not been loaded yet."""
+        loaded = set(self.df.columns) if self.df is not None else set()
+        return [name for name in dict.fromkeys(names) if name in self.columns and name not in loaded]
+
+    def ensure_columns(self, names, progress=None):
+        """Blocking: loads whichever of `names` are not loaded yet."""
+        missing = self.missing_columns(names)
+        if not missing:
+            return
+        if self.file_set is not None:
+            df, _ = load_window(self.file_set, *self.window, missing, progress=progress)
+            df = df[missing]
+        else:
+            df, _, _ = read_loader(self._column_loader(missing), progress)
+        self.add_columns(df)
+
+    def start_column_load(self, names):
+        """Starts a background CSVLoader for the missing columns among `names`; hand its
+        "done" payload to add_columns."""
+        if self.file_set is not None:
+            loader = WindowLoader(self.file_set, *self.window, self.missing_columns(names))
+        else:
+            loader = self._column_loader(self.missing_columns(names))
+        loader.start()
+        return loader
+
+    def _column_loader(self, names):
+        """A CSVLoader for more columns of the loaded CSV, parsing exactly the bytes behind the rows
+        of df (the file may have grown since), so the new columns line up with the loaded ones."""
+        end_bytes = self.follower.offset if self.follower is not None else (self.extent[0] if self.extent else None)
+        return CSVLoader(self.file_path, cache=self.cache, usecols=names, end_bytes=end_bytes)
+
+    def add_columns(self, df):
+        """Merges newly loaded columns into `df` without copying the ones already there."""
+        if self.follower is not None:
+            # The file has grown since df was filled; the newer rows arrive with the next follow_poll
+            df = df.iloc[:len(self.df)]
+            for name in df.columns:
+                if name not in self._growing.columns:
+                    self._growing.add_column(name, df[name].to_numpy())
+        merged = {name: self.df[name] for name in self.df.columns}
+        merged.update({name: df[name] for name in df.columns if name not in merged})
+        order = [name for name in self.columns if name in merged]
+        self.df = frame_from_columns({name: merged[name] for name in order})
+
+    def column_info(self):
+        """Returns one dict per column: name, dtype, kind ('numeric', 'datetime' or 'text') and
+        whether it is loaded. Unloaded columns report the dtype sniffed from the first rows."""
+        info = []
+        loaded = set(self.df.columns) if self.df is not None else set()
+        for name in self.columns:
+            if name in loaded:
+                series = self.df[name]
+                info.append({'name': name, 'dtype': str(series.dtype), 'kind': column_kind(series), 'loaded': True})
+            else:
+                sniffed = self.column_types.get(name, {})
+                info.append({'name': name, 'dtype': sniffed.get('dtype', '?'), 'kind': sniffed.get('kind', 'text'), 'loaded': False})
+        return info
+
+    def x_values(self, x_col, rows=None):
+        """Returns `x_col` (only `rows`, a slice, if given) as a datetime64 or float array suitable
+        for plotting. Raises ValueError if the column has no usable numeric or datetime data."""
+        if self.df is None or x_col not in self.columns:
+            raise ValueError(f"'{x_col}' is not a column of the loaded file.")
+        self.ensure_columns([x_col])
+        series = self.df[x_col] if rows is None else self.df[x_col].iloc[rows]
+        if pd.api.types.is_datetime64_any_dtype(series):
+            return series.to_numpy()
+        values = pd.to_numeric(series, errors='coerce')
+        if values.isnull().all():
+            raise ValueError(f"X-axis column '{x_col}' contains no valid numeric or datetime data for plotting.")
+        return values.to_numpy(dtype=float, na_value=np.nan)
+
+    def y_values(self, y_col, rows=None):
+        """Returns `y_col` (only `rows`, a slice, if given) as a float array.
+        Raises ValueError if the column is not numeric."""
+        if self.df is None or y_col not in self.columns:
+            raise ValueError(f"'{y_col}' is not a column of the loaded file.")
+        self.ensure_columns([y_col])
+        series = self.df[y_col] if rows is None else self.df[y_col].iloc[rows]
+        if not pd.api.types.is_numeric_dtype(series):
+            raise ValueError(f"Y-axis column '{y_col}' is not numeric and cannot be plotted.")
+        return series.to_numpy(dtype=float, na_value=np.nan)
+
+    @profiler.traced("pyramid")
+    def pyramid(self, y_col):
+        """Returns the LodPyramid of `y_col` for zoomable plotting, building it on first use (blocking).
+        For single files it is persisted in the column cache next to the column itself."""
+        pyramid = self.cached_pyramid(y_col)
+        if pyramid is None:
+            pyramid = LodPyramid.build(self.y_values(y_col))
+            store = self._pyramid_store()
+            if store is not None:
+                store(y_col, pyramid)
+            self.pyramids[y_col] = pyramid
+        return pyramid
+
+    def cached_pyramid(self, y_col):
+        """The LodPyramid of `y_col` if it was built before (in memory or in the column cache), else None."""
+        if y_col not in self.pyramids and self.cache is not None and self.file_set is None:
+            arrays = self.cache.lookup_derived(self.file_path, f"lod:{y_col}")
+            if arrays is not None:
+                pyramid = LodPyramid.from_arrays(arrays)
+                if pyramid.n_rows == len(self.df):
+                    self.pyramids[y_col] = pyramid
+        return self.pyramids.get(y_col)
+
+    def _pyramid_store(self):
+        """store(y_col, pyramid) persisting pyramids of the current file, or None for sessions."""
+        if self.cache is None or self.file_set is not None:
+            return None
+        cache, file_path = self.cache, self.file_path
+
+        def store(y_col, pyramid):
+            try:
+                cache.store_derived(file_path, f"lod:{y_col}", pyramid.to_arrays())
+            except OSError:
+                pass # Persisting is an optimisation only
+        return store
+
+    def start_pyramid_job(self, values):
+        """Returns a started PyramidJob building the pyramids of {y_col: y values} (persisted as in
+        pyramid()); hand its "done" payload to add_pyramids."""
+        job = PyramidJob(values, store=self._pyramid_store())
+        job.start()
+        return job
+
+    def add_pyramids(self, pyramids):
+        """Keeps the pyramids that still match the loaded rows (rows may have been appended meanwhile)."""
+        n_rows = len(self.df) if self.df is not None else -1
+        self.pyramids.update({y_col: p for y_col, p in pyramids.items() if p.n_rows == n_rows})
+
+    # --- Column statistics ---
+
+    def _stats_args(self):
+        numeric = [c['name'] for c in self.column_info() if c['kind'] == 'numeric' and c['name'] != self.timestamp_column]
+        return numeric, {'timestamp_column': self.timestamp_column if self.timestamp_column in self.columns else None,
+                         'seconds_per_unit': self.seconds_per_unit()}
+
+    def seconds_per_unit(self):
+        """Seconds per timestamp unit, for sampling rates: `timestamp_unit` if set, 1e-9 for datetime
+        columns (held as epoch ns), else inferred from the magnitude of numeric epoch timestamps
+        (s, ms, us or ns). None when the unit is unknown, e.g. for a sample counter."""
+        if self.timestamp_unit is not None:
+            return self.timestamp_unit
+        if self.column_types.get(self.timestamp_column, {}).get('kind') == 'datetime':
+            return 1e-9
+        if self.index is not None and self.index.n_valid:
+            return epoch_seconds_per_unit(self.index.sorted_values[0])
+        return None
+
+    def cached_stats(self):
+        """Loads the file's statistics from the column cache into `stats`. Returns them, or None."""
+        if self.stats is None and self.cache is not None and self.file_set is None and self.file_path:
+            arrays = self.cache.lookup_derived(self.file_path, "stats")
+            if arrays is not None:
+                stats = ColumnStats.from_arrays(arrays)
+                if stats.n_rows == len(self.df):
+                    stats.set_rate(self.seconds_per_unit()) # Saved before the unit was known
+                    self.stats = stats
+        return self.stats
+
+    def compute_stats(self, progress=None):
+        """Blocking: one chunked pass computing the statistics of every numeric column (cached)."""
+        if self.cached_stats() is None:
+            numeric, options = self._stats_args()
+            self.set_stats(compute_stats(self.file_path, numeric, progress=progress, **options))
+        return self.stats
+
+    def start_stats_job(self):
+        """Returns a started StatsJob over the file's numeric columns; hand its "done" payload to set_stats.
+        Sessions are not supported (their files are analysed window by window instead)."""
+        numeric, options = self._stats_args()
+        job = StatsJob(self.file_path, numeric, **options)
+        job.start()
+        return job
+
+    def set_stats(self, stats):
+        self.stats = stats
+        if self.cache is not None and self.file_set is None:
+            try:
+                self.cache.store_derived(self.file_path, "stats", stats.to_arrays())
+            except OSError:
+                pass # Persisting is an optimisation only
+
+    def column_summary(self, name):
+        """count, nan_count, min, max, mean and std of a numeric column, or None if not computed yet."""
+        return self.stats.summary(name) if self.stats is not None else None
+
+    def range_stats(self, rows, names):
+        """{name: summary} of the loaded columns `names` over `rows` (a slice or row numbers).
+        Contiguous ranges are combined from the block aggregates in `stats` plus two edge blocks."""
+        result = {}
+        for name in names:
+            if self.df is None or name not in self.df.columns or not pd.api.types.is_numeric_dtype(self.df[name]):
+                continue
+            values = self.df[name].to_numpy()
+            if self.stats is not None and self.stats.n_rows == len(values):
+                result[name] = self.stats.range_summary(name, rows, values)
+            else:
+                result[name] = summarize(values[rows])
+        return result
+
+    def axis_index(self, x_col, axis_values, previous=None):
+        """Returns a TimestampIndex over the plotted x values (in axis units) for snapping pointers
+        to real samples. Reuses the load-time index when the X column is the timestamp column.
+        `previous`, an index over the leading part of `axis_values` (before rows were appended),
+        is extended rather than rebuilt."""
+        if (x_col == self.timestamp_column and self.index is not None
+                and not pd.api.types.is_datetime64_any_dtype(self.df[x_col])):
+            return self.index
+        if previous is not None:
+            return previous.extend(axis_values)
+        return TimestampIndex(axis_values)
+
+    # --- Follow mode ---
+
+    def start_follow(self):
+        """Starts following a file that is still being written: follow_poll() then appends the rows
+        added since, to the loaded columns. Resumes after the last complete line the load parsed
+        (the loader's extent); a row parsed from an unterminated last line is dropped here and read
+        again once it is complete. Every poll costs in proportion to the new data only."""
+        if self.df is None or self.file_set is not None or is_columnar(self.file_path) or self.extent is None:
+            raise ValueError("Follow mode needs a single loaded CSV file.")
+        _, complete_bytes, complete_rows = self.extent
+        if complete_rows < len(self.df):
+            self.df = self.df.iloc[:complete_rows]
+            if self.index is not None:
+                self.index = self.index.truncate(complete_rows)
+            self.pyramids = {}
+        self.follower = FileFollower(self.file_path, self.columns, complete_bytes)
+        self._growing = GrowingFrame(self.df)
+        self.df = self._growing.frame()
+
+    def stop_follow(self):
+        if self.follower is not None:
+            # Later column loads parse up to where following stopped
+            self.extent = (self.follower.offset, self.follower.offset, len(self.df))
+        self.follower = None
+        self._growing = None
+
+    def follow_poll(self):
+        """Appends the complete rows written to the file since the last poll. Returns how many.
+        Column statistics keep describing the rows present when they were computed."""
+        new = self.follower.poll(self.df.columns.tolist())
+        if new is None or not len(new):
+            return 0
+        self.df = self._growing.append(new)
+        if self.index is not None:
+            self.index = self.index.extend(self.df[self.timestamp_column].to_numpy())
+        self.pyramids = {} # Built for fewer rows; rebuilt on demand
+        return len(new)
+
+    # --- Timestamp ranges ---
+
+    def _require_index(self):
+        if self.index is None:
+            raise ValueError(f"The '{self.timestamp_column}' column is not available. Please load a CSV with valid timestamps.")
+        return self.index
+
+    def time_range(self):
+        """Returns (first, last) timestamp of the file, ignoring NaNs."""
+        index = self._require_index()
+        if index.n_valid == 0:
+            return None, None
+        return index.sorted_values[0], index.sorted_values[index.n_valid - 1]
+
+    def rows_between(self, start, end):
+        """Rows with start <= timestamp <= end: a slice for sorted files, else an array of row numbers."""
+        return self._require_index().rows(start, end)
+
+    def count_between(self, start, end):
+        return self._require_index().count(start, end)
+
+    def slice(self, start, end):
+        """Returns the rows with start <= timestamp <= end as a DataFrame (a view for sorted files)."""
+        self.ensure_columns(self.columns)
+        return self.df.iloc[self.rows_between(start, end)]
+
+    # --- Export ---
+
+    def normalization_stats(self, start=None, end=None):
+        """{name: summary} of the numeric columns over the whole file, computing them first if needed
+        (blocking). For a session: over the files overlapping start..end (default: all files), from
+        per-file statistics gathered once (see start_session_stats_job)."""
+        if self.file_set is None:
+            stats = self.compute_stats()
+            return {name: stats.summary(name) for name in stats.blocks}
+        numeric, options = self._stats_args()
+        for file_path in self.missing_file_stats(start, end):
+            self.file_stats[file_path] = file_stats(file_path, numeric, cache=self.cache, **options)
+        return merged_summaries([self.file_stats[path] for path in self._session_paths(start, end)])
+
+    def _session_paths(self, start, end):
+        files = self.file_set.files if start is None else self.file_set.overlapping(start, end)
+        return [f['path'] for f in files]
+
+    def missing_file_stats(self, start=None, end=None):
+        """Session files overlapping start..end whose statistics have not been gathered yet."""
+        return [path for path in self._session_paths(start, end) if path not in self.file_stats]
+
+    def start_session_stats_job(self, start=None, end=None):
+        """Returns a started SessionStatsJob over the session files still missing from `file_stats`
+        (per-file statistics already in the column cache are reused); hand its "done" payload to
+        add_file_stats. After that, normalization_stats for start..end no longer blocks."""
+        numeric, options = self._stats_args()
+        job = SessionStatsJob(self.missing_file_stats(start, end), numeric, cache=self.cache, **options)
+        job.start()
+        return job
+
+    def add_file_stats(self, stats):
+        self.file_stats.update(stats)
+
+    def transform(self, spec, start=None, end=None):
+        """Builds the export transform Pipeline for `spec` (see transforms.parse_pipeline), or None if
+        the spec is empty. Normalization stages get their statistics from normalization_stats."""
+        stats = self.normalization_stats(start, end) if needs_stats(spec) else None
+        return parse_pipeline(spec, timestamp_column=self.timestamp_column, stats=stats)
+
+    def export(self, start, end, file_path, **options):
+        """Blocking export of a timestamp range. Options are passed to write_rows. Returns the row count."""
+        self.ensure_columns(self.columns)
+        write_rows(self.df, self.rows_between(start, end), file_path, **options)
+        return self.count_between(start, end)
+
+    def export_job(self, start, end, file_path, **options):
+        """Returns a started ExportWriter for a timestamp range."""
+        return self.export_rows_job(self.rows_between(start, end), file_path, **options)
+
+    def export_rows_job(self, rows, file_path, **options):
+        """Returns a started ExportWriter for rows already resolved (a slice or row numbers).
+        Exports the loaded columns; load the rest first (missing_columns) for a full export."""
+        writer = ExportWriter(self.df, rows, file_path, **options)
+        writer.start()
+        return writer
+
+    def chunk_bounds(self, window, stride, unit='rows', regions=None):
+        return window_bounds(self._require_index(), window, stride, unit=unit, regions=regions)
+
+    def chunk(self, bounds, out_dir, **options):
+        """Blocking batch export of chunk windows. Options are passed to chunk_file."""
+        self.ensure_columns(self.columns)
+        return chunk_file(self.df, self._require_index(), bounds, out_dir, **options)
+
+    def chunk_job(self, bounds, out_dir, **options):
+        """Returns a started ChunkExportJob for chunk windows over the loaded columns."""
+        job = ChunkExportJob(self.df, self._require_index(), bounds, out_dir, **options)
+        job.start()
+        return job
+
+    # --- Named ranges ---
+
+    def ranges_path(self):
+        """Sidecar file holding the named ranges of the loaded file or session."""
+        return sidecar_path(self.file_set.source if self.file_set is not None else self.file_path)
+
+    def timestamp_bounds(self, rows):
+        """(first, last) timestamp, in the units of the index, of the file rows `rows` (a slice or row numbers)."""
+        self._require_index()
+        values = self.df[self.timestamp_column].iloc[rows].to_numpy()
+        if np.issubdtype(values.dtype, np.datetime64):
+            values = values.astype('datetime64[ns]').view(np.int64)
+        return np.nanmin(values).item(), np.nanmax(values).item()
+
+    def range_windows(self, range_set, prefix="range", positions=None):
+        """(bounds, names) for exporting every range of `range_set` with rows in the loaded data to
+        its own file via chunk / chunk_job(..., names=names): one load and one index serve them all.
+        `positions` limits it to those places in `range_set.ranges` (see range_groups)."""
+        return range_set.windows(self._require_index(), prefix=prefix, positions=positions)
+
+    def range_groups(self, range_set):
+        """For a session: [(start, end, positions)] splitting the ranges (positions in start order)
+        into groups that share files, so each group is loaded with one focus(start, end) and no load
+        spans the files between distant ranges. Ranges outside every file are left out."""
+        groups = []
+        for i, r in enumerate(range_set.ranges):
+            paths = {f['path'] for f in self.file_set.overlapping(r['start'], r['end'])}
+            if not paths:
+                continue
+            if groups and groups[-1][3] & paths:
+                start, end, positions, group_paths = groups[-1]
+                groups[-1] = (start, max(end, r['end']), positions + [i], group_paths | paths)
+            else:
+                groups.append((r['start'], r['end'], [i], paths))
+        return [(start, end, set(positions)) for start, end, positions, _ in groups]
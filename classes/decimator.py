@@ -0,0 +1,183 @@
+import numpy as np
+import matplotlib.dates as mdates
+
+from classes.file_follower import GrowingArray
+from classes.profiler import span
+
+PYRAMID_MIN_ROWS = 100_000 # Shorter lines are cheap enough to decimate from the raw rows
+
+
+def minmax_decimate(y, n_buckets):
+    """Returns the sorted row indices of a min/max envelope of `y` with at most `n_buckets` buckets.
+
+    Every bucket keeps the rows holding its smallest and largest value, so spikes survive
+    the reduction. The first and last rows are always kept so the plotted extent is unchanged.
+    """
+    n = len(y)
+    n_buckets = max(int(n_buckets), 1)
+    if n <= 2 * n_buckets:
+        return np.arange(n)
+
+    bucket_size = -(-n // n_buckets) # ceil division
+    n_buckets = -(-n // bucket_size)
+    padded = n_buckets * bucket_size
+
+    # NaNs (and the padding) must never win argmin/argmax unless the whole bucket is empty
+    y_for_min = np.full(padded, np.inf)
+    y_for_max = np.full(padded, -np.inf)
+    y_for_min[:n] = y
+    y_for_max[:n] = y
+    nan_mask = np.isnan(y_for_min[:n])
+    y_for_min[:n][nan_mask] = np.inf
+    y_for_max[:n][nan_mask] = -np.inf
+
+    base = np.arange(n_buckets) * bucket_size
+    min_idx = base + np.argmin(y_for_min.reshape(n_buckets, bucket_size), axis=1)
+    max_idx = base + np.argmax(y_for_max.reshape(n_buckets, bucket_size), axis=1)
+
+    indices = np.concatenate(([0, n - 1], min_idx, max_idx))
+    indices = np.minimum(indices, n - 1)
+    return np.unique(indices) # unique() also sorts, keeping min/max in x order
+
+
+class LineDecimator:
+    """Keeps the full-resolution data behind the lines of an axis and plots a min/max envelope
+    sized to the axis width in pixels. Recomputes the visible window on zoom, pan and resize.
+
+    Long lines over a sorted x are drawn from a LodPyramid, so a redraw reads O(pixels) bucket
+    extremes instead of every visible row.
+    """
+
+    def __init__(self, ax, x_values):
+        self.ax = ax
+        self.is_datetime_x = np.issubdtype(np.asarray(x_values).dtype, np.datetime64)
+        self.x = self._axis_units(x_values)
+
+        # searchsorted only works on a sorted, NaN-free x; anything else falls back to a mask
+        self.x_is_sorted = len(self.x) < 2 or bool(np.all(self.x[1:] >= self.x[:-1]))
+
+        self.lines = [] # (Line2D, full-resolution y array, LodPyramid or None)
+        self._growing = None # GrowingArrays behind x and the lines, once rows are appended
+        self.canvas = None
+        self._cid_xlim = None
+        self._cid_resize = None
+
+    def add_line(self, y_values, pyramid=None, **plot_kwargs):
+        """Plots `y_values` against the shared x data. Returns the Line2D artist.
+        `pyramid` is a prebuilt LodPyramid of `y_values`; without one the line is decimated from
+        its raw rows until set_pyramid supplies one (see pending_pyramids)."""
+        y = np.asarray(y_values, dtype=float)
+        if pyramid is not None and (not self.wants_pyramid(len(y)) or pyramid.n_rows != len(y)):
+            pyramid = None
+        # A line added to a plot already on screen starts out at the current zoom
+        window = self._visible_window(*sorted(self.ax.get_xlim())) if self.canvas is not None else (0, len(self.x), None)
+        x_visible, y_visible = self._decimated(y, pyramid, *window)
+        line, = self.ax.plot(x_visible, y_visible, **plot_kwargs)
+        self.lines.append((line, y, pyramid))
+        if self._growing is not None:
+            self._growing[line] = GrowingArray(y)
+        if self.is_datetime_x and len(self.lines) == 1:
+            self.ax.xaxis_date()
+        return line
+
+    def wants_pyramid(self, n_rows):
+        """Whether a line of `n_rows` rows is drawn from a LodPyramid. The pyramid indexes rows, which
+        only map to x ranges when x is sorted, and short lines are cheap to decimate directly."""
+        return self.x_is_sorted and n_rows >= PYRAMID_MIN_ROWS
+
+    def pending_pyramids(self):
+        """(Line2D, y) of the lines that would be drawn from a pyramid but have none yet."""
+        return [(line, y) for line, y, pyramid in self.lines if pyramid is None and self.wants_pyramid(len(y))]
+
+    def set_pyramid(self, line, pyramid):
+        """Draws `line` from `pyramid` from now on, if it still matches the line's rows. Does not redraw."""
+        self.lines = [(l, y, pyramid if l is line and pyramid.n_rows == len(y) and self.wants_pyramid(len(y)) else p)
+                      for l, y, p in self.lines]
+
+    def _axis_units(self, x_values):
+        if self.is_datetime_x:
+            return mdates.date2num(np.asarray(x_values))
+        return np.asarray(x_values, dtype=float)
+
+    def append(self, x_values, y_values):
+        """Appends rows to the shared x data and to each line (`y_values` in the order of `lines`),
+        as when following a growing file. Costs O(appended rows) amortised; lines then drop their
+        pyramids and are decimated from the raw rows of the visible window. Does not redraw."""
+        x_new = self._axis_units(x_values)
+        if self._growing is None:
+            self._growing = {None: GrowingArray(self.x)}
+            self._growing.update({line: GrowingArray(y) for line, y, _ in self.lines})
+        if self.x_is_sorted and len(x_new):
+            self.x_is_sorted = (not len(self.x) or x_new[0] >= self.x[-1]) and bool(np.all(x_new[1:] >= x_new[:-1]))
+        self.x = self._growing[None].append(x_new)
+        self.lines = [(line, self._growing[line].append(np.asarray(y, dtype=float)), None)
+                      for (line, _, _), y in zip(self.lines, y_values)]
+
+    def remove_line(self, line):
+        """Removes a line added with add_line from the axis and from the decimator."""
+        self.lines = [entry for entry in self.lines if entry[0] is not line]
+        if self._growing is not None:
+            self._growing.pop(line, None)
+        line.remove()
+
+    def connect(self, canvas):
+        """Starts following the axis limits and canvas size. Call once the figure has a canvas."""
+        self.canvas = canvas
+        self._cid_xlim = self.ax.callbacks.connect('xlim_changed', self._on_xlim_changed)
+        self._cid_resize = canvas.mpl_connect('resize_event', self._on_resize)
+        self.refresh()
+
+    def disconnect(self):
+        if self._cid_xlim is not None:
+            self.ax.callbacks.disconnect(self._cid_xlim)
+            self._cid_xlim = None
+        if self.canvas is not None and self._cid_resize is not None:
+            self.canvas.mpl_disconnect(self._cid_resize)
+            self._cid_resize = None
+        self.canvas = None
+
+    def refresh(self):
+        """Re-decimates every line for the current x-limits and axis width."""
+        if not self.lines:
+            return
+        with span("decimate", lines=len(self.lines)):
+            x_min, x_max = sorted(self.ax.get_xlim())
+            start, stop, mask = self._visible_window(x_min, x_max)
+            for line, y, pyramid in self.lines:
+                line.set_data(*self._decimated(y, pyramid, start, stop, mask))
+
+    def _visible_window(self, x_min, x_max):
+        """Returns (start, stop, mask) describing the rows inside [x_min, x_max].
+        One sample of margin on each side keeps the line running to the axis edges."""
+        if self.x_is_sorted:
+            start = max(int(np.searchsorted(self.x, x_min, side='left')) - 1, 0)
+            stop = min(int(np.searchsorted(self.x, x_max, side='right')) + 1, len(self.x))
+            return start, stop, None
+        return 0, len(self.x), (self.x >= x_min) & (self.x <= x_max)
+
+    def _decimated(self, y, pyramid, start, stop, mask):
+        if pyramid is not None and mask is None:
+            indices = pyramid.window_indices(y, start, stop, self._pixel_width())
+            if indices is not None:
+                return self.x[indices], y[indices]
+        x = self.x[start:stop]
+        y = y[start:stop]
+        if mask is not None:
+            x = x[mask]
+            y = y[mask]
+        indices = minmax_decimate(y, self._pixel_width())
+        return x[indices], y[indices]
+
+    def _pixel_width(self):
+        width = self.ax.bbox.width
+        if not np.isfinite(width) or width < 1:
+            return 1000 # Axis not laid out yet; a sensible screen-sized default
+        return int(width)
+
+    def _on_xlim_changed(self, ax):
+        self.refresh()
+        if self.canvas is not None:
+            self.canvas.draw_idle()
+
+    def _on_resize(self, event):
+        self.refresh()
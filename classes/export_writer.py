@@ -0,0 +1,320 @@
+import gzip
+import os
+import re
+import queue
+import threading
+
+import numpy as np
+import pandas as pd
+
+try:
+    import zstandard
+except ImportError: # Optional: only needed for .zst output
+    zstandard = None
+
+from classes.formats import format_for, pyarrow, require_pyarrow
+from classes.profiler import span
+
+FAST_FLOAT_FORMAT = '%.6f' # Six decimal places; '%.<n>f' formats are applied in one vectorized pass
+
+
+def compression_for(file_path):
+    """Returns 'gzip', 'zstd' or None depending on the file extension."""
+    if file_path.endswith('.gz'):
+        return 'gzip'
+    if file_path.endswith('.zst'):
+        return 'zstd'
+    return None
+
+
+def open_output(file_path, compression=None):
+    """Opens `file_path` for text writing, optionally gzip- or zstd-compressed."""
+    if compression == 'gzip':
+        return gzip.open(file_path, 'wt', newline='', compresslevel=6)
+    if compression == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("zstd output needs the 'zstandard' package (pip install zstandard).")
+        raw = open(file_path, 'wb')
+        writer = zstandard.ZstdCompressor().stream_writer(raw, closefd=True)
+        return _TextStream(writer)
+    return open(file_path, 'w', newline='')
+
+
+class _TextStream:
+    """Minimal text wrapper around a binary zstd stream writer (io.TextIOWrapper wants readable/seekable)."""
+
+    def __init__(self, raw):
+        self.raw = raw
+
+    def write(self, text):
+        return self.raw.write(text.encode('utf-8'))
+
+    def close(self):
+        self.raw.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _BlockWriter:
+    """Writes a table as a sequence of DataFrame blocks. Use open_block_writer to get one."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _CSVBlockWriter(_BlockWriter):
+    def __init__(self, path, compression, float_format):
+        self.fh = open_output(path, compression)
+        self.float_format = float_format
+        self.header = True
+
+    def write(self, block):
+        decimals = _fixed_decimals(self.float_format)
+        if decimals is None:
+            block.to_csv(self.fh, header=self.header, index=False, float_format=self.float_format)
+        elif all(isinstance(dtype, np.dtype) and dtype.kind in 'biuf' for dtype in block.dtypes):
+            # Plain numeric blocks need no quoting, so whole lines are assembled with vectorized
+            # string operations and to_csv only writes the header
+            if self.header:
+                block.iloc[:0].to_csv(self.fh, index=False)
+            if len(block):
+                line = None
+                for name in block.columns:
+                    values = block[name].to_numpy()
+                    text = _format_fixed(values, decimals, self.float_format) if values.dtype.kind == 'f' else values.astype(_TEXT)
+                    line = text if line is None else np.strings.add(np.strings.add(line, ','), text)
+                self.fh.write(os.linesep.join(line.tolist()) + os.linesep)
+        else:
+            floats = [i for i, dtype in enumerate(block.dtypes) if dtype.kind == 'f']
+            block = block.copy(deep=False)
+            for i in floats:
+                block.isetitem(i, _format_fixed(block.iloc[:, i].to_numpy(dtype=float, na_value=np.nan), decimals, self.float_format).astype(object))
+            block.to_csv(self.fh, header=self.header, index=False)
+        self.header = False
+
+    def close(self):
+        self.fh.close()
+
+
+_TEXT = np.dtypes.StringDType()
+
+
+def _fixed_decimals(float_format):
+    """n for a '%.<n>f' format (which _format_fixed vectorizes), else None."""
+    match = re.fullmatch(r'%\.(\d)f', float_format or '')
+    return int(match.group(1)) if match else None
+
+
+def _format_fixed(values, decimals, float_format):
+    """Float array as text with `decimals` decimal places, like `float_format` % value, built from
+    integer arithmetic instead of per-value formatting. NaN becomes an empty field, as to_csv writes
+    it. values * 10**decimals is itself rounded, so values whose scaled fraction lies within that
+    error of .5 (and values too large to keep a fraction, and inf) go through `float_format`."""
+    values = np.asarray(values, dtype=float)
+    scale = 10 ** decimals
+    product = np.where(np.isfinite(values), values, 0.0) * scale
+    error = np.abs(product) * 2.0 ** -51 # Twice the rounding error of the product
+    exact = (np.abs(product) < 2.0 ** 51) & (np.abs(product - np.floor(product) - 0.5) > error) & np.isfinite(values)
+    magnitude = np.abs(np.round(np.where(exact, product, 0.0))).astype(np.int64)
+    text = (magnitude // scale).astype(_TEXT)
+    if decimals:
+        fraction = np.strings.zfill((magnitude % scale).astype(_TEXT), decimals)
+        text = np.strings.add(np.strings.add(text, '.'), fraction)
+    negative = np.signbit(values) # Like '%f', keeps the sign of values that round to zero
+    text[negative] = np.strings.add('-', text[negative])
+    nan = np.isnan(values)
+    rest = ~exact & ~nan
+    if rest.any():
+        text[rest] = np.char.mod(float_format, values[rest])
+    text[nan] = ""
+    return text
+
+
+class _ArrowBlockWriter(_BlockWriter):
+    """Parquet (one zstd-compressed row group per block, so later reads can skip groups by
+    timestamp) or uncompressed Feather/Arrow IPC (memory-mappable on reopen)."""
+
+    def __init__(self, path, fmt):
+        self.path = path
+        self.fmt = fmt
+        self.schema = None
+        self.writer = None
+
+    def write(self, block):
+        table = pyarrow.Table.from_pandas(block, preserve_index=False, schema=self.schema)
+        if self.writer is None:
+            self.schema = table.schema
+            if self.fmt == 'parquet':
+                self.writer = pyarrow.parquet.ParquetWriter(self.path, self.schema, compression='zstd')
+            else:
+                self.writer = pyarrow.ipc.new_file(self.path, self.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+class _NpzBlockWriter(_BlockWriter):
+    """One array per column. The .npz format cannot be appended to, so every block is kept in
+    memory until close, which then saves them at once: memory grows with the rows written, unlike
+    the other formats. Text columns are stored as fixed-width strings (no pickling)."""
+
+    def __init__(self, path):
+        self.path = path
+        self.blocks = []
+
+    def write(self, block):
+        self.blocks.append(block)
+
+    def close(self):
+        if not self.blocks:
+            return # Nothing was written: an error or a cancel ended the export first
+        df = pd.concat(self.blocks, ignore_index=True) if len(self.blocks) > 1 else self.blocks[0]
+        self.blocks = []
+        arrays = {}
+        for name in df.columns:
+            values = df[name].to_numpy()
+            if values.dtype == object or isinstance(df[name].dtype, pd.CategoricalDtype):
+                values = df[name].astype(str).to_numpy(dtype=str)
+            arrays[str(name)] = values
+        with open(self.path, 'wb') as fh: # A file object keeps np.savez from appending ".npz"
+            np.savez(fh, **arrays)
+
+
+def open_block_writer(path, file_path=None, float_format=None):
+    """Opens a block writer on `path` for the format of `file_path` (default: `path`),
+    so a temp file can be written in the format of its final name."""
+    file_path = file_path or path
+    fmt = format_for(file_path)
+    if fmt == 'npz':
+        return _NpzBlockWriter(path)
+    if fmt in ('parquet', 'feather'):
+        require_pyarrow(file_path)
+        return _ArrowBlockWriter(path, fmt)
+    return _CSVBlockWriter(path, compression_for(file_path), float_format)
+
+
+def transform_blocks(blocks, transform):
+    """Runs the blocks through a transforms.Pipeline from a fresh state, followed by the rows it
+    held back. Blocks the pipeline emptied are skipped; if every block was, one empty block is
+    still yielded so the output gets its header."""
+    transform.reset()
+    empty = None
+    for block in blocks:
+        block = transform.process(block)
+        if len(block):
+            empty = False
+            yield block
+        elif empty is None:
+            empty = block
+    tail = transform.flush()
+    if tail is not None and len(tail):
+        yield tail
+    elif empty is not False and empty is not None:
+        yield empty
+
+
+def write_rows(df, rows, file_path, block_rows=100_000, float_format=None, cancel_event=None, progress=None,
+               transform=None):
+    """Writes `df.iloc[rows]` to `file_path` in blocks of `block_rows` rows.
+
+    `rows` is a slice or an array of row numbers. Only one block is formatted at a time, so
+    peak memory does not depend on the size of the selected range, except for NPZ, which holds
+    every block until the end. The output format follows the extension (CSV, .csv.gz/.zst,
+    Parquet, Feather/Arrow, NPZ). `transform` (a
+    transforms.Pipeline) is applied to each block on its way to disk. Output goes to a temp file
+    that is renamed into place when complete. Returns False if cancelled, True otherwise.
+    """
+    if isinstance(rows, slice):
+        start, stop, _ = rows.indices(len(df))
+        total_rows = max(stop - start, 0)
+        block_rows_at = lambda i: slice(start + i, start + min(i + block_rows, total_rows))
+    else:
+        rows = np.asarray(rows)
+        total_rows = len(rows)
+        block_rows_at = lambda i: rows[i:i + block_rows]
+
+    tmp_path = f"{file_path}.part"
+    try:
+        with open_block_writer(tmp_path, file_path, float_format) as writer, \
+                span("export", file=os.path.basename(file_path), rows=total_rows):
+            blocks = (df.iloc[block_rows_at(i)] for i in range(0, max(total_rows, 1), block_rows))
+            if transform is not None:
+                blocks = transform_blocks(blocks, transform)
+            done = 0
+            for block in blocks:
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                with span("export.block"):
+                    writer.write(block)
+                done = min(done + block_rows, total_rows)
+                if progress is not None:
+                    progress(done, total_rows)
+        if cancel_event is not None and cancel_event.is_set():
+            os.remove(tmp_path)
+            return False
+        os.replace(tmp_path, file_path)
+        return True
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class ExportWriter:
+    """Runs write_rows on a worker thread and streams progress back through a queue.
+
+    Messages put on `self.queue` are (kind, payload) tuples:
+        ("progress", (rows_written, total_rows))
+        ("done", file_path)
+        ("cancelled", None)
+        ("error", Exception)
+    """
+
+    def __init__(self, df, rows, file_path, block_rows=100_000, float_format=None, transform=None):
+        self.df = df
+        self.rows = rows
+        self.file_path = file_path
+        self.block_rows = block_rows
+        self.float_format = float_format
+        self.transform = transform
+        self.queue = queue.Queue()
+        self._cancel_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Starts the worker thread. Returns immediately."""
+        self._thread = threading.Thread(target=self._run, name="ExportWriter", daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        """Asks the worker to stop after the block it is currently writing."""
+        self._cancel_event.set()
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        try:
+            finished = write_rows(
+                self.df, self.rows, self.file_path,
+                block_rows=self.block_rows,
+                float_format=self.float_format,
+                transform=self.transform,
+                cancel_event=self._cancel_event,
+                progress=lambda done, total: self.queue.put(("progress", (done, total))),
+            )
+            if finished:
+                self.queue.put(("done", self.file_path))
+            else:
+                self.queue.put(("cancelled", None))
+        except Exception as e:
+            self.queue.put(("error", e))
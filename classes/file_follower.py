@@ -0,0 +1,107 @@
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+from classes.column_types import frame_from_columns
+
+GROWTH = 1.5 # Spare capacity factor of growing columns, so appends cost O(appended) amortised
+
+
+def _fitting_dtype(dtype, values):
+    """The dtype that holds data of `dtype` plus `values` losslessly (usually `dtype` itself,
+    so compacted columns stay compact while they grow)."""
+    if dtype == object or values.dtype == object:
+        return np.dtype(object)
+    if not len(values) or values.dtype == dtype:
+        return dtype
+    if dtype.kind in 'iu' and values.dtype.kind in 'iu':
+        info = np.iinfo(dtype)
+        if values.min() >= info.min and values.max() <= info.max:
+            return dtype
+    elif dtype == np.float32 and values.dtype.kind in 'iuf':
+        back = values.astype(np.float32).astype(values.dtype)
+        if np.array_equal(back, values, equal_nan=values.dtype.kind == 'f'):
+            return dtype
+    return np.result_type(dtype, values.dtype)
+
+
+class GrowingArray:
+    """A 1-D array with spare capacity at the end, for columns of a file that is still being written.
+    `values` is a view of the filled part; views handed out earlier stay valid after a reallocation."""
+
+    def __init__(self, values):
+        values = np.asarray(values)
+        self._buffer = np.empty(max(16, int(len(values) * GROWTH)), dtype=values.dtype)
+        self._buffer[:len(values)] = values
+        self.n = len(values)
+
+    @property
+    def values(self):
+        return self._buffer[:self.n]
+
+    def append(self, values):
+        """Appends `values` (widening the dtype if they would not fit). Returns the new `values` view."""
+        values = np.asarray(values)
+        dtype = _fitting_dtype(self._buffer.dtype, values)
+        needed = self.n + len(values)
+        if dtype != self._buffer.dtype or needed > len(self._buffer):
+            buffer = np.empty(max(needed, int(needed * GROWTH)), dtype=dtype)
+            buffer[:self.n] = self._buffer[:self.n]
+            self._buffer = buffer
+        self._buffer[self.n:needed] = values
+        self.n = needed
+        return self.values
+
+
+class GrowingFrame:
+    """The loaded columns of a DataFrame as GrowingArrays. Text and categorical columns are kept as
+    object arrays, since rows appended later may bring new categories."""
+
+    def __init__(self, df):
+        self.columns = {name: GrowingArray(df[name].to_numpy()) for name in df.columns}
+
+    def add_column(self, name, values):
+        self.columns[name] = GrowingArray(values)
+
+    def append(self, df):
+        """Appends the rows of `df` (which must have every column). Returns the grown DataFrame."""
+        for name, column in self.columns.items():
+            column.append(df[name].to_numpy())
+        return self.frame()
+
+    def frame(self):
+        return frame_from_columns({name: pd.Series(column.values, name=name, copy=False) for name, column in self.columns.items()})
+
+
+class FileFollower:
+    """Parses the rows appended to a CSV file since the last poll (like `tail -f`).
+
+    Remembers the byte offset up to which rows were parsed and on each poll reads only the
+    bytes added since, up to the last complete line; a line still being written is left for
+    the next poll. The cost of a poll depends on the new data only, not on the file size.
+    """
+
+    def __init__(self, file_path, header, offset):
+        self.file_path = file_path
+        self.header = list(header)
+        self.offset = offset
+
+    def poll(self, columns=None):
+        """Returns a DataFrame of the complete rows appended since the last poll (only `columns`,
+        default all), or None if there are none. Raises ValueError if the file shrank, as it does
+        when a logger truncates or replaces it."""
+        size = os.path.getsize(self.file_path)
+        if size < self.offset:
+            raise ValueError(f"{self.file_path} got shorter ({size:,} < {self.offset:,} bytes); it was truncated or replaced.")
+        if size == self.offset:
+            return None
+        with open(self.file_path, 'rb') as fh:
+            fh.seek(self.offset)
+            data = fh.read(size - self.offset)
+        end = data.rfind(b'\n')
+        if end < 0:
+            return None # Only part of a line so far
+        self.offset += end + 1
+        return pd.read_csv(io.BytesIO(data[:end + 1]), header=None, names=self.header, usecols=columns)
@@ -0,0 +1,372 @@
+import concurrent.futures
+import glob
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from classes.column_types import compact_column
+from classes.csv_loader import load_csv
+from classes.export_writer import open_block_writer, transform_blocks
+from classes.formats import FORMATS, is_columnar, read_columns
+from classes.profiler import profiler
+from classes.timestamp_index import TimestampIndex
+
+
+def expand_sources(source):
+    """Returns the sorted data file paths named by `source`: a directory (every CSV, Parquet,
+    Feather or NPZ file in it), a glob pattern, or a single file."""
+    if os.path.isdir(source):
+        paths = [p for ext in (".csv",) + tuple(FORMATS) for p in glob.glob(os.path.join(source, "*" + ext))]
+    elif glob.has_magic(source):
+        paths = glob.glob(source)
+    else:
+        paths = [source]
+    return sorted(p for p in paths if os.path.isfile(p))
+
+
+def _pool_context():
+    """'fork' for a single-threaded caller (the CLI); forking while other threads run (the GUI
+    scans and loads on worker threads) can deadlock, so then workers come from a forkserver."""
+    methods = multiprocessing.get_all_start_methods()
+    if 'fork' in methods and threading.active_count() == 1:
+        return multiprocessing.get_context('fork')
+    if 'forkserver' in methods:
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload(['numpy', 'pandas', __name__]) # Imported once by the server, not per worker
+        return context
+    return multiprocessing.get_context('spawn')
+
+
+def _scan_one(file_path, timestamp_column, cache):
+    """Worker: parses only the timestamp column of one file and returns its index entry."""
+    df, index, column_types = load_csv(file_path, cache=cache, index_column=timestamp_column, usecols=[timestamp_column])
+    if index is None:
+        raise ValueError(f"{file_path} has no '{timestamp_column}' column.")
+    info = {
+        'path': file_path,
+        'size': os.path.getsize(file_path),
+        'n_rows': len(df),
+        'n_valid': index.n_valid, # Rows with a timestamp
+        't_min': None,
+        't_max': None,
+        'column_types': column_types,
+    }
+    if index.n_valid:
+        info['t_min'] = index.value_at(0).item()
+        info['t_max'] = index.value_at(index.n_valid - 1).item()
+    return info
+
+
+def _load_one(file_path, timestamp_column, cache, columns, start, end):
+    """Worker: loads `columns` of one file and keeps only the rows with start <= timestamp <= end."""
+    if is_columnar(file_path):
+        # Pushed down into the reader: Parquet row groups outside the range are never decoded
+        df = read_columns(file_path, columns, time_range=(start, end), timestamp_column=timestamp_column)
+        return df.reindex(columns=columns)
+    df, index, _ = load_csv(file_path, cache=cache, index_column=timestamp_column,
+                            usecols=[timestamp_column] + [c for c in columns if c != timestamp_column])
+    df = df.reindex(columns=columns) # A column missing from this file comes back as NaN
+    rows = index.rows(start, end)
+    if isinstance(rows, slice) and rows.start == 0 and rows.stop >= len(df):
+        return df
+    return df.iloc[rows].reset_index(drop=True)
+
+
+def _run_pool(function, calls, workers, cancel_event=None, on_result=None):
+    """Runs `function(*args)` for every args tuple in `calls` and returns the results in call order.
+    Uses a process pool unless there is only one call or one worker. Returns None if cancelled."""
+    workers = min(workers or os.cpu_count() or 1, len(calls))
+    results = [None] * len(calls)
+
+    if workers <= 1:
+        for i, args in enumerate(calls):
+            if cancel_event is not None and cancel_event.is_set():
+                return None
+            results[i] = function(*args)
+            if on_result is not None:
+                on_result(i, results[i])
+        return results
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context()) as pool:
+        futures = {pool.submit(function, *args): i for i, args in enumerate(calls)}
+        for future in concurrent.futures.as_completed(futures):
+            if cancel_event is not None and cancel_event.is_set():
+                for pending in futures:
+                    pending.cancel()
+                return None
+            i = futures[future]
+            results[i] = future.result()
+            if on_result is not None:
+                on_result(i, results[i])
+    return results
+
+
+class FileSet:
+    """A directory or glob of rotated CSV logs, treated as one time-ordered dataset.
+
+    Keeps a small index of every file's row count and timestamp min/max (built by scan(),
+    which parses only the timestamp column of each file, in parallel). Range operations
+    open only the files whose [t_min, t_max] overlaps the range, so the set as a whole is
+    never loaded or concatenated.
+    """
+
+    def __init__(self, files, timestamp_column='timestamp', cache=None, source=None):
+        # Time order; files without any valid timestamp go last
+        self.files = sorted(files, key=lambda f: (f['t_min'] is None, f['t_min'] or 0, f['path']))
+        self.timestamp_column = timestamp_column
+        self.cache = cache # Optional ColumnCache, shared by every file in the set
+        self.source = source
+        timed = [f for f in self.files if f['t_min'] is not None]
+        self.t_min = np.array([f['t_min'] for f in timed])
+        self.t_max = np.array([f['t_max'] for f in timed])
+        self._timed = timed
+
+    @classmethod
+    def scan(cls, source, timestamp_column='timestamp', cache=None, workers=None, progress=None, cancel_event=None):
+        """Builds the per-file index for `source` (see expand_sources). `progress(files_done, total_files)`
+        is called as files finish. Returns None if cancelled."""
+        paths = expand_sources(source)
+        if not paths:
+            raise ValueError(f"No CSV files found for {source}.")
+        on_result = None
+        if progress is not None:
+            done = []
+            on_result = lambda i, info: (done.append(i), progress(len(done), len(paths)))
+        files = _run_pool(_scan_one, [(p, timestamp_column, cache) for p in paths], workers,
+                          cancel_event=cancel_event, on_result=on_result)
+        if files is None:
+            return None
+        return cls(files, timestamp_column=timestamp_column, cache=cache, source=source)
+
+    @property
+    def n_rows(self):
+        return sum(f['n_rows'] for f in self.files)
+
+    @property
+    def column_types(self):
+        """Sniffed {name: {"dtype", "kind"}} over all files, in the order columns first appear."""
+        merged = {}
+        for f in self.files:
+            for name, types in f['column_types'].items():
+                merged.setdefault(name, types)
+        return merged
+
+    def time_range(self):
+        if not len(self.t_min):
+            return None, None
+        return self.t_min.min(), self.t_max.max()
+
+    def overlapping(self, start, end):
+        """The files (index entries, in time order) holding any timestamp in [start, end]."""
+        hits = np.flatnonzero((self.t_max >= start) & (self.t_min <= end))
+        return [self._timed[i] for i in hits]
+
+    def default_window(self, max_rows):
+        """A (start, end) range covering the leading files up to about `max_rows` rows (at least one file)."""
+        if not self._timed:
+            return None, None
+        rows = 0
+        last = 0
+        for i, f in enumerate(self._timed):
+            if i and rows + f['n_rows'] > max_rows:
+                break
+            rows += f['n_rows']
+            last = i
+        return self._timed[0]['t_min'], max(f['t_max'] for f in self._timed[:last + 1])
+
+    def count(self, start, end):
+        """Rows with start <= timestamp <= end. Files entirely inside the range are counted from the
+        index; only the files cut by its ends are opened (timestamp column only)."""
+        total = 0
+        for f in self.overlapping(start, end):
+            if start <= f['t_min'] and f['t_max'] <= end:
+                total += f['n_valid']
+            else:
+                _, index, _ = load_csv(f['path'], cache=self.cache, index_column=self.timestamp_column,
+                                       usecols=[self.timestamp_column])
+                total += index.count(start, end)
+        return total
+
+    @profiler.traced("export.session")
+    def export(self, start, end, file_path, columns=None, float_format=None, block_rows=100_000,
+               transform=None, progress=None, cancel_event=None):
+        """Streams the rows with start <= timestamp <= end into one file (format by extension), one overlapping file at a time,
+        so peak memory is that of the largest file. `transform` (a transforms.Pipeline) runs across the file
+        boundaries as over one recording. Returns the number of rows in the range (before any
+        transform), or None if cancelled."""
+        files = self.overlapping(start, end)
+        columns = list(columns or self.column_types)
+        tmp_path = f"{file_path}.part"
+        counts = {'rows': 0}
+
+        def blocks():
+            for n, f in enumerate(files):
+                if cancel_event is not None and cancel_event.is_set():
+                    return
+                part = _load_one(f['path'], self.timestamp_column, self.cache, columns, start, end)
+                for i in range(0, len(part), block_rows):
+                    yield part.iloc[i:i + block_rows]
+                counts['rows'] += len(part)
+                if progress is not None:
+                    progress(n + 1, len(files))
+
+        try:
+            with open_block_writer(tmp_path, file_path, float_format) as writer:
+                wrote_any = False
+                for block in blocks() if transform is None else transform_blocks(blocks(), transform):
+                    writer.write(block)
+                    wrote_any = True
+                if not wrote_any:
+                    writer.write(pd.DataFrame(columns=columns)) # Header / schema only
+            if cancel_event is not None and cancel_event.is_set():
+                os.remove(tmp_path)
+                return None
+            os.replace(tmp_path, file_path)
+            return counts['rows']
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+@profiler.traced("load.window")
+def load_window(file_set, start, end, columns, workers=None, progress=None, cancel_event=None):
+    """Loads `columns` of the rows with start <= timestamp <= end from the files overlapping
+    the range, parsing the files in parallel. Returns (df, TimestampIndex), or None if cancelled.
+
+    `progress(rows_read, bytes_read, total_bytes, eta)` matches CSVLoader's progress messages,
+    counted per finished file.
+    """
+    ts = file_set.timestamp_column
+    columns = [ts] + [c for c in columns if c != ts]
+    files = file_set.overlapping(start, end)
+    if not files:
+        df = pd.DataFrame({c: pd.Series(dtype=float) for c in columns})
+        return df, TimestampIndex(df[ts])
+
+    total_bytes = sum(f['size'] for f in files)
+    started = time.monotonic()
+    counts = {'rows': 0, 'bytes': 0}
+
+    def on_result(i, part):
+        counts['rows'] += len(part)
+        counts['bytes'] += files[i]['size']
+        if progress is not None:
+            elapsed = time.monotonic() - started
+            eta = elapsed / counts['bytes'] * (total_bytes - counts['bytes'])
+            progress(counts['rows'], counts['bytes'], total_bytes, eta)
+
+    parts = _run_pool(_load_one, [(f['path'], ts, file_set.cache, columns, start, end) for f in files], workers,
+                      cancel_event=cancel_event, on_result=on_result)
+    if parts is None:
+        return None
+
+    df = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+    del parts
+    for name in df.columns:
+        if not pd.api.types.is_numeric_dtype(df[name]):
+            # Categoricals with different categories per file come back from concat as objects
+            df[name] = compact_column(df[name])
+    return df[columns], TimestampIndex(df[ts])
+
+
+class WindowLoader:
+    """Loads a time window of a FileSet on a worker thread, with CSVLoader's queue protocol
+    ("header", "column_types", "progress", "index", "done", "cancelled", "error"), so the GUI
+    can treat a session window like a single file."""
+
+    def __init__(self, file_set, start, end, columns, workers=None):
+        self.file_set = file_set
+        self.file_path = file_set.source
+        self.start_ts = start
+        self.end_ts = end
+        self.columns = columns
+        self.workers = workers
+        self.queue = queue.Queue()
+        self._cancel_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Starts the worker thread. Returns immediately."""
+        self._thread = threading.Thread(target=self._run, name="WindowLoader", daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        """Stops handing files to the pool; files already being parsed still finish."""
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        try:
+            column_types = self.file_set.column_types
+            self.queue.put(("header", list(column_types)))
+            self.queue.put(("column_types", column_types))
+            loaded = load_window(
+                self.file_set, self.start_ts, self.end_ts, self.columns, workers=self.workers,
+                progress=lambda *p: self.queue.put(("progress", p)),
+                cancel_event=self._cancel_event,
+            )
+            if loaded is None:
+                self.queue.put(("cancelled", None))
+                return
+            df, index = loaded
+            self.queue.put(("index", index))
+            self.queue.put(("done", df))
+        except Exception as e:
+            self.queue.put(("error", e))
+
+
+class FileSetScan:
+    """Runs FileSet.scan on a worker thread. Messages put on `self.queue`:
+        ("progress", (files_done, total_files)), ("done", FileSet), ("cancelled", None), ("error", Exception)
+    """
+
+    def __init__(self, source, timestamp_column='timestamp', cache=None, workers=None):
+        self.source = source
+        self.file_path = source
+        self.timestamp_column = timestamp_column
+        self.cache = cache
+        self.workers = workers
+        self.queue = queue.Queue()
+        self._cancel_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Starts the worker thread. Returns immediately."""
+        self._thread = threading.Thread(target=self._run, name="FileSetScan", daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        try:
+            file_set = FileSet.scan(
+                self.source, timestamp_column=self.timestamp_column, cache=self.cache, workers=self.workers,
+                progress=lambda done, total: self.queue.put(("progress", (done, total))),
+                cancel_event=self._cancel_event,
+            )
+            if file_set is None:
+                self.queue.put(("cancelled", None))
+            else:
+                self.queue.put(("done", file_set))
+        except Exception as e:
+            self.queue.put(("error", e))
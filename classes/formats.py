@@ -0,0 +1,124 @@
+import os
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow
+    import pyarrow.compute
+    import pyarrow.feather
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError: # Optional: only needed for Parquet and Feather/Arrow files
+    pyarrow = None
+
+from classes.column_types import column_kind
+
+# File extension -> format; anything else is read as (optionally compressed) CSV text
+FORMATS = {
+    '.parquet': 'parquet',
+    '.pq': 'parquet',
+    '.feather': 'feather',
+    '.arrow': 'feather',
+    '.ipc': 'feather',
+    '.npz': 'npz',
+}
+
+FILE_TYPES = [
+    ("CSV files", "*.csv"),
+    ("Parquet files", "*.parquet *.pq"),
+    ("Feather / Arrow IPC files", "*.feather *.arrow *.ipc"),
+    ("NumPy archives", "*.npz"),
+]
+
+
+def format_for(file_path):
+    """Returns 'csv', 'parquet', 'feather' or 'npz' depending on the file extension."""
+    return FORMATS.get(os.path.splitext(file_path)[1].lower(), 'csv')
+
+
+def is_columnar(file_path):
+    return format_for(file_path) != 'csv'
+
+
+def require_pyarrow(file_path):
+    if pyarrow is None:
+        raise RuntimeError(f"Reading or writing {format_for(file_path)} files needs the 'pyarrow' package (pip install pyarrow).")
+
+
+def _npz_columns(file_path):
+    """{name: dtype} of every array in an .npz, read from the member headers only."""
+    columns = {}
+    with zipfile.ZipFile(file_path) as zf:
+        for member in zf.namelist():
+            with zf.open(member) as fh:
+                version = np.lib.format.read_magic(fh)
+                if version == (1, 0):
+                    _, _, dtype = np.lib.format.read_array_header_1_0(fh)
+                else:
+                    _, _, dtype = np.lib.format.read_array_header_2_0(fh)
+            columns[member[:-4] if member.endswith('.npy') else member] = dtype
+    return columns
+
+
+def read_schema(file_path):
+    """Returns (header, {name: {"dtype", "kind"}}) from a columnar file's schema, without reading any rows."""
+    fmt = format_for(file_path)
+    if fmt == 'npz':
+        empty = pd.DataFrame({name: np.empty(0, dtype=dtype) for name, dtype in _npz_columns(file_path).items()})
+    else:
+        require_pyarrow(file_path)
+        if fmt == 'parquet':
+            schema = pyarrow.parquet.read_schema(file_path)
+        else:
+            with pyarrow.memory_map(file_path) as source:
+                schema = pyarrow.ipc.open_file(source).schema
+        empty = schema.empty_table().to_pandas()
+    return empty.columns.tolist(), {name: {'dtype': str(empty[name].dtype), 'kind': column_kind(empty[name])} for name in empty.columns}
+
+
+def _range_scalars(arrow_type, start, end):
+    """Timestamp bounds in the column's own type; ranges are given in TimestampIndex units (ns for datetimes)."""
+    if pyarrow.types.is_timestamp(arrow_type):
+        return pd.Timestamp(start, unit='ns'), pd.Timestamp(end, unit='ns')
+    return start, end
+
+
+def read_columns(file_path, columns=None, time_range=None, timestamp_column=None):
+    """Reads `columns` (default: all) of a Parquet, Feather or NPZ file into a DataFrame.
+
+    With `time_range=(start, end)` only rows with start <= timestamp_column <= end are returned.
+    Parquet skips whole row groups using their min/max statistics; Feather is memory-mapped
+    and filtered in Arrow before conversion, so unselected rows are never materialised.
+    """
+    fmt = format_for(file_path)
+    if fmt == 'npz':
+        with np.load(file_path, allow_pickle=False) as data:
+            names = data.files if columns is None else [name for name in columns if name in data.files] # Requested order, as for Arrow
+            mask = None
+            if time_range is not None:
+                timestamps = data[timestamp_column]
+                if np.issubdtype(timestamps.dtype, np.datetime64):
+                    timestamps = timestamps.astype('datetime64[ns]').view(np.int64)
+                mask = (timestamps >= time_range[0]) & (timestamps <= time_range[1])
+            return pd.DataFrame({name: data[name] if mask is None else data[name][mask] for name in names}, columns=names)
+
+    require_pyarrow(file_path)
+    if fmt == 'parquet':
+        filters = None
+        if time_range is not None:
+            field_type = pyarrow.parquet.read_schema(file_path).field(timestamp_column).type
+            start, end = _range_scalars(field_type, *time_range)
+            filters = [(timestamp_column, '>=', start), (timestamp_column, '<=', end)]
+        table = pyarrow.parquet.read_table(file_path, columns=columns, filters=filters)
+    else:
+        read = None if columns is None else list(dict.fromkeys(list(columns) + ([timestamp_column] if time_range is not None else [])))
+        table = pyarrow.feather.read_table(file_path, columns=read, memory_map=True)
+        if time_range is not None:
+            start, end = _range_scalars(table.schema.field(timestamp_column).type, *time_range)
+            ts = table.column(timestamp_column)
+            table = table.filter(pyarrow.compute.and_(pyarrow.compute.greater_equal(ts, start), pyarrow.compute.less_equal(ts, end)))
+        if columns is not None:
+            table = table.select(list(columns))
+    return table.to_pandas()
@@ -0,0 +1,175 @@
+import queue
+import threading
+
+import numpy as np
+
+
+class LodPyramid:
+    """Multi-resolution min/max/mean summary of one column, for drawing at any zoom level.
+
+    Level 0 groups the rows into buckets of `base` rows; every further level groups `factor`
+    buckets of the level below. Each bucket keeps the row numbers of its smallest and largest
+    value plus the sum and count of its non-NaN values (so means combine exactly). A window of
+    rows is drawn from the coarsest level that still has at least one bucket per pixel, which
+    costs O(pixels) whatever the window size. Built once per column in O(n).
+    """
+
+    def __init__(self, n_rows, base, factor, levels):
+        self.n_rows = n_rows
+        self.base = base
+        self.factor = factor
+        self.levels = levels # [{"size", "min_idx", "max_idx", "sum", "count"}], finest first
+
+    @classmethod
+    def build(cls, y, base=16, factor=4):
+        y = np.asarray(y, dtype=float)
+        n = len(y)
+        levels = []
+        if n == 0:
+            return cls(0, base, factor, levels)
+
+        # Level 0 straight from the rows
+        n_buckets = -(-n // base)
+        padded = np.full(n_buckets * base, np.nan)
+        padded[:n] = y
+        padded = padded.reshape(n_buckets, base)
+        nan_mask = np.isnan(padded)
+        offsets = np.arange(n_buckets) * base
+        min_idx = offsets + np.argmin(np.where(nan_mask, np.inf, padded), axis=1)
+        max_idx = offsets + np.argmax(np.where(nan_mask, -np.inf, padded), axis=1)
+        level = {
+            "size": base,
+            "min_idx": np.minimum(min_idx, n - 1),
+            "max_idx": np.minimum(max_idx, n - 1),
+            "sum": np.where(nan_mask, 0.0, padded).sum(axis=1),
+            "count": (~nan_mask).sum(axis=1),
+        }
+        levels.append(level)
+
+        # Coarser levels from the one below, until a single bucket covers everything
+        while len(level["min_idx"]) > 1:
+            level = cls._coarsen(y, level, factor)
+            levels.append(level)
+        return cls(n, base, factor, levels)
+
+    @staticmethod
+    def _coarsen(y, level, factor):
+        n_children = len(level["min_idx"])
+        n_buckets = -(-n_children // factor)
+        pad = n_buckets * factor - n_children
+
+        def grouped(values, fill):
+            return np.concatenate((values, np.full(pad, fill, dtype=values.dtype))).reshape(n_buckets, factor)
+
+        min_idx = grouped(level["min_idx"], 0)
+        max_idx = grouped(level["max_idx"], 0)
+        counts = grouped(level["count"], 0)
+        min_values = np.where(counts > 0, y[min_idx], np.inf) # Empty or padding buckets never win
+        max_values = np.where(counts > 0, y[max_idx], -np.inf)
+        rows = np.arange(n_buckets)
+        return {
+            "size": level["size"] * factor,
+            "min_idx": min_idx[rows, np.argmin(min_values, axis=1)],
+            "max_idx": max_idx[rows, np.argmax(max_values, axis=1)],
+            "sum": grouped(level["sum"], 0.0).sum(axis=1),
+            "count": counts.sum(axis=1),
+        }
+
+    def mean(self, level):
+        """Per-bucket means of `level` (NaN for buckets without values)."""
+        entry = self.levels[level]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return entry["sum"] / entry["count"]
+
+    def window_indices(self, y, start, stop, n_buckets):
+        """Returns sorted row numbers of a min/max envelope of rows [start, stop) of `y` (the column
+        the pyramid was built from) with at least `n_buckets` buckets, or None if the window is too
+        small for the pyramid (draw it raw)."""
+        span = stop - start
+        chosen = None
+        for level in self.levels:
+            if level["size"] * n_buckets > span:
+                break
+            chosen = level
+        if chosen is None:
+            return None
+
+        size = chosen["size"]
+        first = -(-start // size) # Buckets wholly inside the window
+        last = max(stop // size, first)
+        # The partial buckets at the edges (less than one bucket each) are scanned exactly, so their
+        # extremes are kept even when the bucket's own extreme lies outside the window
+        edges = [_extremes(y, start, min(first * size, stop)), _extremes(y, max(last * size, start), stop)]
+        indices = np.concatenate([[start, stop - 1], chosen["min_idx"][first:last], chosen["max_idx"][first:last]] + edges)
+        return np.unique(indices)
+
+    def to_arrays(self):
+        """Flat {name: array} form for np.savez; see from_arrays."""
+        arrays = {"shape": np.array([self.n_rows, self.base, self.factor, len(self.levels)])}
+        for i, level in enumerate(self.levels):
+            for key in ("min_idx", "max_idx", "sum", "count"):
+                arrays[f"{key}_{i}"] = level[key]
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        n_rows, base, factor, n_levels = (int(v) for v in arrays["shape"])
+        levels = []
+        size = base
+        for i in range(n_levels):
+            level = {"size": size}
+            for key in ("min_idx", "max_idx", "sum", "count"):
+                level[key] = arrays[f"{key}_{i}"]
+            levels.append(level)
+            size *= factor
+        return cls(n_rows, base, factor, levels)
+
+
+
+def _extremes(y, start, stop):
+    """Row numbers of the smallest and largest non-NaN value of y[start:stop] (none if there are none)."""
+    part = y[start:stop]
+    valid = ~np.isnan(part)
+    if not valid.any():
+        return np.empty(0, dtype=np.int64)
+    return start + np.array([np.argmin(np.where(valid, part, np.inf)), np.argmax(np.where(valid, part, -np.inf))])
+
+class PyramidJob:
+    """Builds LodPyramids on a worker thread, so plotting a long column never waits for one.
+    `values` maps names to y arrays; `store(name, pyramid)`, if given, is called on the worker
+    thread for each built pyramid (e.g. to persist it). Messages put on `self.queue`:
+        ("done", {name: LodPyramid}), ("cancelled", None), ("error", Exception)
+    """
+
+    def __init__(self, values, store=None):
+        self.values = values
+        self.store = store
+        self.queue = queue.Queue()
+        self._cancel_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Starts the worker thread. Returns immediately."""
+        self._thread = threading.Thread(target=self._run, name="PyramidJob", daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        """Asks the worker to stop before the next pyramid."""
+        self._cancel_event.set()
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        try:
+            pyramids = {}
+            for name, y in self.values.items():
+                if self._cancel_event.is_set():
+                    self.queue.put(("cancelled", None))
+                    return
+                pyramids[name] = LodPyramid.build(y)
+                if self.store is not None:
+                    self.store(name, pyramids[name])
+            self.queue.put(("done", pyramids))
+        except Exception as e:
+            self.queue.put(("error", e))
@@ -1,7 +1,24 @@
+import time
+
+from classes.profiler import profiler, span
+
+
 class PointerManager:
-    """Manages interactive, movable pointers on a Matplotlib axis."""
+    """Manages interactive, movable pointers on a Matplotlib axis.
+
+    The pointer lines are animated artists drawn with blitting: after every full canvas draw the
+    static background (data lines, axes, legend) is cached, and a drag only restores that
+    background and redraws the two pointer lines. Motion events are coalesced so at most one
+    frame is rendered per `min_frame_interval` seconds.
 
-    def __init__(self, ax, canvas, start_pointer_line, end_pointer_line, x_data_range_mpl, start_var, end_var, app_instance):
+    With a `sample_index` (a TimestampIndex over the plotted x values) the pointers snap to the
+    nearest real sample, and the selection is tracked as sorted positions in that index so the
+    exact row range can be exported without re-scanning the data.
+    """
+
+    def __init__(self, ax, canvas, start_pointer_line, end_pointer_line, x_data_range_mpl, start_var, end_var, app_instance,
+                 min_frame_interval=1 / 60, sample_index=None, count_var=None, format_value=None, on_selection_changed=None,
+                 on_click=None):
         self.ax = ax
         self.canvas = canvas
         self.start_pointer_line = start_pointer_line
@@ -10,8 +27,31 @@ class PointerManager:
         self.start_var = start_var
         self.end_var = end_var
         self.app = app_instance # --- NEW: Store reference to the main app instance ---
+        self.sample_index = sample_index
+        self.count_var = count_var
+        self.format_value = format_value or str
+        self.on_selection_changed = on_selection_changed # Called after a drag ends, for work too slow to run per frame
+        self.on_click = on_click # Called with the x value of a left click that grabs neither pointer
+
+        # Sorted positions (in sample_index) of the samples under the start/end pointers
+        self.start_pos = None
+        self.end_pos = None
+        if self.sample_index is not None:
+            self.start_pos = self._snap(self.start_pointer_line)
+            self.end_pos = self._snap(self.end_pointer_line)
 
         self.selected_pointer = None
+        self.min_frame_interval = min_frame_interval
+        self._background = None # Cached pixels of everything except the pointers
+        self._pending_x = None # Latest drag position not yet rendered
+        self._last_frame_time = 0.0
+        self._frame_timer = None
+        self.use_blit = getattr(canvas, 'supports_blit', False)
+        if self.use_blit:
+            # Animated artists are skipped by full draws and painted by _on_draw/_blit instead
+            self.start_pointer_line.set_animated(True)
+            self.end_pointer_line.set_animated(True)
+
         self.epsilon = 0.01 * (x_data_range_mpl[1] - x_data_range_mpl[0]) 
         if self.epsilon == 0: 
             self.epsilon = 1e-6 
@@ -19,9 +59,53 @@ class PointerManager:
         self.cid_press = self.canvas.mpl_connect('button_press_event', self.on_press)
         self.cid_motion = self.canvas.mpl_connect('motion_notify_event', self.on_motion)
         self.cid_release = self.canvas.mpl_connect('button_release_event', self.on_release)
+        self.cid_draw = self.canvas.mpl_connect('draw_event', self._on_draw)
 
         self._update_pointer_display() # Initial update of the GUI displays and internal datetimes
 
+    def _snap(self, line, x=None):
+        """Moves `line` onto the sample nearest to `x` (default: its current position). Returns the sorted position."""
+        if x is None:
+            x = line.get_xdata()[0]
+        pos = self.sample_index.nearest(x)
+        if pos is not None:
+            snapped = float(self.sample_index.value_at(pos))
+            line.set_xdata([snapped, snapped])
+        return pos
+
+    def extend_samples(self, sample_index, x_max):
+        """Switches to a sample index over more samples (rows appended to a followed file) and lets
+        the pointers travel up to `x_max`. The pointers keep their samples, so the selection holds."""
+        self.sample_index = sample_index
+        self.x_data_range_mpl = (self.x_data_range_mpl[0], max(self.x_data_range_mpl[1], x_max))
+        if sample_index is not None:
+            # Positions only shift when the new rows did not keep the order; snapping finds them again
+            self.start_pos = self._snap(self.start_pointer_line)
+            self.end_pos = self._snap(self.end_pointer_line)
+            self._update_pointer_display()
+
+    def select(self, start_x, end_x):
+        """Moves the pointers to `start_x` and `end_x` (snapped to the nearest samples) and redraws them."""
+        self.start_pointer_line.set_xdata([start_x, start_x])
+        self.end_pointer_line.set_xdata([end_x, end_x])
+        if self.sample_index is not None:
+            self.start_pos = self._snap(self.start_pointer_line)
+            self.end_pos = self._snap(self.end_pointer_line)
+        self._update_pointer_display()
+        self._redraw_pointers()
+
+    def selected_rows(self):
+        """File rows between the pointers (inclusive): a slice, or row numbers for unsorted x data.
+        None without a sample index."""
+        if self.sample_index is None or self.start_pos is None:
+            return None
+        return self.sample_index.rows_for_positions(self.start_pos, self.end_pos + 1)
+
+    def selected_row_count(self):
+        if self.sample_index is None or self.start_pos is None:
+            return 0
+        return self.end_pos - self.start_pos + 1
+
     def _get_clamped_x_value(self, event):
         """Converts mouse x-coordinate to data x-value, clamped to the plot's data range."""
         if event.inaxes != self.ax: # Check if click is within the axes
@@ -51,20 +135,26 @@ class PointerManager:
         if abs(clicked_x - start_x_pos) < self.epsilon:
             self.selected_pointer = self.start_pointer_line
             self.start_pointer_line.set_color('blue') # Highlight selected pointer
-            self.canvas.draw_idle() # Request redraw for immediate visual feedback
+            self._redraw_pointers() # Immediate visual feedback
             return
 
         # Check if the click is close to the end pointer
         if abs(clicked_x - end_x_pos) < self.epsilon:
             self.selected_pointer = self.end_pointer_line
             self.end_pointer_line.set_color('blue') # Highlight selected pointer
-            self.canvas.draw_idle()
+            self._redraw_pointers()
             return
 
+        if self.on_click is not None:
+            self.on_click(clicked_x)
+
     def on_motion(self, event):
         """Handles mouse motion event (dragging)."""
         if self.selected_pointer is None: return # No pointer is currently selected for dragging
-        
+        with span("pointer.motion"):
+            self._on_drag(event)
+
+    def _on_drag(self, event):
         new_x = self._get_clamped_x_value(event)
         if new_x is None: return # Mouse is outside axes or no valid data x-coord
 
@@ -78,13 +168,53 @@ class PointerManager:
             if new_x < start_x_pos:
                 new_x = start_x_pos # Clamp end pointer to start pointer's position
 
+        # Coalesce: render now if the last frame is old enough, otherwise only remember the
+        # newest position and let a single-shot timer render it
+        self._pending_x = new_x
+        if time.perf_counter() - self._last_frame_time >= self.min_frame_interval:
+            self._render_pending()
+        elif self._frame_timer is None:
+            self._frame_timer = self.canvas.new_timer(interval=max(1, int(self.min_frame_interval * 1000)))
+            self._frame_timer.single_shot = True
+            self._frame_timer.add_callback(self._render_pending)
+            self._frame_timer.start()
+
+    @profiler.traced("pointer.render")
+    def _render_pending(self):
+        """Moves the selected pointer to the newest coalesced position and renders one frame."""
+        self._frame_timer = None
+        if self._pending_x is None or self.selected_pointer is None:
+            return
+        new_x = self._pending_x
+        self._pending_x = None
+        if self.sample_index is not None:
+            # O(log n) snap to the nearest real sample; nothing to draw if it is the same sample
+            pos = self.sample_index.nearest(new_x)
+            if pos is None:
+                return
+            if self.selected_pointer == self.start_pointer_line:
+                pos = min(pos, self.end_pos)
+                if pos == self.start_pos:
+                    return
+                self.start_pos = pos
+            else:
+                pos = max(pos, self.start_pos)
+                if pos == self.end_pos:
+                    return
+                self.end_pos = pos
+            new_x = float(self.sample_index.value_at(pos))
         self.selected_pointer.set_xdata([new_x, new_x]) # Update the line's x-position
         self._update_pointer_display() # Update Tkinter StringVars with new positions
-        self.canvas.draw_idle() # Request redraw
+        self._redraw_pointers()
+        self._last_frame_time = time.perf_counter()
 
     def on_release(self, event):
         """Handles mouse button release event."""
         if self.selected_pointer:
+            self._render_pending() # Don't drop the last coalesced motion event
+            if self._frame_timer is not None:
+                self._frame_timer.stop()
+                self._frame_timer = None
             # Revert pointer color to original
             if self.selected_pointer == self.start_pointer_line:
                 self.start_pointer_line.set_color('red')
@@ -92,7 +222,32 @@ class PointerManager:
                 self.end_pointer_line.set_color('green')
             self.selected_pointer = None # Deselect the pointer
             self._update_pointer_display() # Final update after release
+            self._redraw_pointers()
+            if self.on_selection_changed is not None:
+                self.on_selection_changed()
+
+    def _on_draw(self, event):
+        """After every full draw (initial plot, zoom, pan, resize) re-cache the static background
+        and paint the animated pointers on top of it."""
+        if not self.use_blit:
+            return
+        self._background = self.canvas.copy_from_bbox(self.canvas.figure.bbox)
+        self.ax.draw_artist(self.start_pointer_line)
+        self.ax.draw_artist(self.end_pointer_line)
+
+    def _redraw_pointers(self):
+        """Restores the cached background and redraws only the two pointer lines."""
+        if not self.use_blit:
             self.canvas.draw_idle()
+            return
+        if self._background is None:
+            self.canvas.draw() # Full draw; _on_draw caches the background and paints the pointers
+            return
+        self.canvas.restore_region(self._background)
+        self.ax.draw_artist(self.start_pointer_line)
+        self.ax.draw_artist(self.end_pointer_line)
+        self.canvas.blit(self.canvas.figure.bbox)
+        profiler.frame()
 
     def _update_pointer_display(self):
         """Updates the Tkinter StringVars with the current pointer positions
@@ -100,13 +255,21 @@ class PointerManager:
         start_x_val_mpl = self.start_pointer_line.get_xdata()[0]
         end_x_val_mpl = self.end_pointer_line.get_xdata()[0]
 
-
-        self.start_var.set(f"{start_x_val_mpl}")
-        self.end_var.set(f"{end_x_val_mpl}")
+        if self.sample_index is not None and self.start_pos is not None:
+            # Exact sample values (not float axis coordinates) plus their file rows
+            start_value = self.sample_index.value_at(self.start_pos)
+            end_value = self.sample_index.value_at(self.end_pos)
+            self.start_var.set(f"{self.format_value(start_value)}  (row {self.sample_index.row_at(self.start_pos)})")
+            self.end_var.set(f"{self.format_value(end_value)}  (row {self.sample_index.row_at(self.end_pos)})")
+            if self.count_var is not None:
+                self.count_var.set(f"{self.selected_row_count():,}")
+            start_x_val_mpl, end_x_val_mpl = start_value, end_value
+        else:
+            self.start_var.set(f"{start_x_val_mpl}")
+            self.end_var.set(f"{end_x_val_mpl}")
         # --- NEW: Store numeric values for non-datetime x-axis (important for consistency) ---
         self.app._selected_start_dt = start_x_val_mpl # Store the raw numeric value
         self.app._selected_end_dt = end_x_val_mpl
-        print(self.app._selected_end_dt)
         # --- END NEW ---
 
     def disconnect(self):
@@ -114,6 +277,16 @@ class PointerManager:
         self.canvas.mpl_disconnect(self.cid_press)
         self.canvas.mpl_disconnect(self.cid_motion)
         self.canvas.mpl_disconnect(self.cid_release)
+        self.canvas.mpl_disconnect(self.cid_draw)
+        if self._frame_timer is not None:
+            self._frame_timer.stop()
+            self._frame_timer = None
+        self._background = None
+        if self.count_var is not None:
+            self.count_var.set("")
+        # Hand the lines back to normal drawing so they stay visible after the manager is gone
+        self.start_pointer_line.set_animated(False)
+        self.end_pointer_line.set_animated(False)
         # --- NEW: Clear stored datetime objects on disconnect ---
         self.app._selected_start_dt = None
         self.app._selected_end_dt = None
@@ -0,0 +1,189 @@
+import atexit
+import collections
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+ENV_VAR = "CSV_EDITOR_PROFILE" # "1" to collect timings, or a path to also write a Chrome trace on exit
+MAX_EVENTS = 1_000_000 # Trace events kept; per-name totals keep counting after that
+FRAME_WINDOW = 2.0 # Seconds of frames the FPS readout averages over
+
+
+class _NullSpan:
+    """What span() returns while profiling is off: entering and leaving it does nothing."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    def __init__(self, profiler, name, args):
+        self.profiler = profiler
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler._record(self.name, self.start, time.perf_counter_ns() - self.start, self.args)
+        return False
+
+    def set(self, **args):
+        """Attaches values learned inside the span (row counts, sizes) to its trace event."""
+        self.args.update(args)
+
+
+class Profiler:
+    """Wall-clock spans around the slow and the latency-sensitive paths (load, type coercion,
+    plotting, canvas draws, pointer drags, export), plus a frame counter for the FPS readout.
+
+    Disabled by default: span() then returns a shared no-op context manager, so instrumented
+    code pays one attribute check per call. When enabled, every span is kept as a Chrome trace
+    event (open the file from write_trace in chrome://tracing or Perfetto) and summed per name.
+    Spans may be opened from any thread; worker processes are not traced.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.trace_path = None
+        self._origin = time.perf_counter_ns()
+        self._events = []
+        self._dropped = 0
+        self._totals = {} # name -> [count, total_ns, max_ns, last_ns]
+        self._frames = collections.deque(maxlen=1000)
+        self._lock = threading.Lock()
+        self._registered = False
+
+    def enable(self, trace_path=None):
+        """Starts collecting. At exit a summary goes to stderr, and with `trace_path` the trace is written there."""
+        if not self._registered:
+            atexit.register(self._report_at_exit)
+            self._registered = True
+        self.trace_path = trace_path or self.trace_path
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def span(self, name, **args):
+        """Context manager timing the code inside it under `name`; `args` end up in the trace."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, args)
+
+    def traced(self, name):
+        """Decorator form of span(); whether to time is decided per call."""
+        def decorate(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                with _Span(self, name, {}):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def frame(self):
+        """Counts one rendered frame (full draw or blit) for fps()."""
+        if self.enabled:
+            self._frames.append(time.perf_counter())
+
+    def fps(self):
+        """Frames per second over the last FRAME_WINDOW seconds (0 when idle)."""
+        now = time.perf_counter()
+        recent = [t for t in list(self._frames) if now - t <= FRAME_WINDOW]
+        if len(recent) < 2:
+            return 0.0
+        return (len(recent) - 1) / max(now - recent[0], 1e-9)
+
+    def _record(self, name, start, duration, args):
+        with self._lock:
+            totals = self._totals.get(name)
+            if totals is None:
+                totals = self._totals[name] = [0, 0, 0, 0]
+            totals[0] += 1
+            totals[1] += duration
+            totals[2] = max(totals[2], duration)
+            totals[3] = duration
+            if len(self._events) < MAX_EVENTS:
+                self._events.append((name, start, duration, threading.get_ident(), threading.current_thread().name, args))
+            else:
+                self._dropped += 1
+
+    def stats(self):
+        """{name: {"count", "total_ms", "mean_ms", "max_ms", "last_ms"}} of every span name seen so far."""
+        with self._lock:
+            totals = {name: list(values) for name, values in self._totals.items()}
+        return {
+            name: {"count": count, "total_ms": total / 1e6, "mean_ms": total / count / 1e6,
+                   "max_ms": longest / 1e6, "last_ms": last / 1e6}
+            for name, (count, total, longest, last) in totals.items()
+        }
+
+    def report(self):
+        """A text table of stats(), slowest total first."""
+        lines = [f"{'span':<24} {'count':>8} {'total ms':>11} {'mean ms':>9} {'max ms':>9}"]
+        for name, s in sorted(self.stats().items(), key=lambda item: -item[1]["total_ms"]):
+            lines.append(f"{name:<24} {s['count']:>8,} {s['total_ms']:>11.1f} {s['mean_ms']:>9.3f} {s['max_ms']:>9.1f}")
+        if self._dropped:
+            lines.append(f"({self._dropped:,} spans not kept in the trace: over {MAX_EVENTS:,})")
+        return "\n".join(lines)
+
+    def write_trace(self, file_path):
+        """Writes the spans collected so far as Chrome trace JSON ("X" complete events, microseconds)."""
+        pid = os.getpid()
+        with self._lock:
+            events = list(self._events)
+        trace = []
+        threads = {}
+        for name, start, duration, tid, thread_name, args in events:
+            threads[tid] = thread_name
+            trace.append({"name": name, "ph": "X", "pid": pid, "tid": tid,
+                          "ts": (start - self._origin) / 1e3, "dur": duration / 1e3,
+                          "args": {key: _jsonable(value) for key, value in args.items()}})
+        for tid, thread_name in threads.items():
+            trace.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": thread_name}})
+        with open(file_path, 'w') as fh:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, fh)
+
+    def _report_at_exit(self):
+        if not self._totals:
+            return
+        print(self.report(), file=sys.stderr)
+        if self.trace_path:
+            try:
+                self.write_trace(self.trace_path)
+                print(f"Wrote profile trace to {self.trace_path}", file=sys.stderr)
+            except OSError as e:
+                print(f"Could not write profile trace to {self.trace_path}: {e}", file=sys.stderr)
+
+
+def _jsonable(value):
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    try:
+        return value.item() # NumPy scalars
+    except AttributeError:
+        return str(value)
+
+
+profiler = Profiler()
+span = profiler.span
+
+_setting = os.environ.get(ENV_VAR, "").strip()
+if _setting and _setting.lower() not in ("0", "false", "no", "off"):
+    profiler.enable(None if _setting.lower() in ("1", "true", "yes", "on") else _setting)
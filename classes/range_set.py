@@ -0,0 +1,193 @@
+import glob
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+SIDECAR_SUFFIX = ".ranges.csv" # Ranges of <recording> are kept in <recording>.ranges.csv next to it
+
+
+def sidecar_path(source):
+    """The ranges file of a recording: `<file>.ranges.csv`, or for a session (directory or glob)
+    `<directory>.ranges.csv` / `session.ranges.csv` in the glob's directory."""
+    if glob.has_magic(source):
+        return os.path.join(os.path.dirname(source) or ".", "session" + SIDECAR_SUFFIX)
+    return os.path.normpath(source) + SIDECAR_SUFFIX
+
+
+def safe_name(label):
+    """`label` reduced to characters that are safe in a file name on every platform."""
+    return re.sub(r'[^\w.-]+', '_', label).strip('._') or "range"
+
+
+class _Node:
+    __slots__ = ('center', 'by_start', 'by_end', 'left', 'right')
+
+
+def _build(intervals):
+    if not intervals:
+        return None
+    endpoints = sorted(v for start, end, _ in intervals for v in (start, end))
+    node = _Node()
+    node.center = endpoints[len(endpoints) // 2]
+    here = [iv for iv in intervals if iv[0] <= node.center <= iv[1]]
+    node.by_start = sorted(here, key=lambda iv: iv[0])
+    node.by_end = sorted(here, key=lambda iv: iv[1], reverse=True)
+    node.left = _build([iv for iv in intervals if iv[1] < node.center])
+    node.right = _build([iv for iv in intervals if iv[0] > node.center])
+    return node
+
+
+class IntervalTree:
+    """Centered interval tree over closed intervals [start, end], for hit-testing many ranges.
+
+    overlapping() visits O(log n) nodes plus the hits. The tree is static: RangeSet rebuilds it
+    (O(n log n)) whenever a range changes, which happens far less often than the hit tests.
+    """
+
+    def __init__(self, intervals=()):
+        """`intervals`: iterable of (start, end, key); the queries return the keys."""
+        intervals = [(start, end, key) for start, end, key in intervals if start <= end]
+        self.n = len(intervals)
+        self.root = _build(intervals)
+
+    def __len__(self):
+        return self.n
+
+    def overlapping(self, lo, hi):
+        """Keys of the intervals that share at least one point with [lo, hi]."""
+        keys = []
+        node = self.root
+        pending = []
+        while node is not None or pending:
+            if node is None:
+                node = pending.pop()
+            if hi < node.center:
+                # Every interval here contains the center, so it overlaps iff it starts by `hi`
+                for start, _, key in node.by_start:
+                    if start > hi:
+                        break
+                    keys.append(key)
+                node = node.left
+            elif lo > node.center:
+                for _, end, key in node.by_end:
+                    if end < lo:
+                        break
+                    keys.append(key)
+                node = node.right
+            else:
+                keys.extend(key for _, _, key in node.by_start)
+                if node.right is not None:
+                    pending.append(node.right)
+                node = node.left
+        return keys
+
+    def at(self, x):
+        """Keys of the intervals containing `x`."""
+        return self.overlapping(x, x)
+
+
+class RangeSet:
+    """Named time ranges of one recording (labelled events), in timestamp units of its index.
+
+    Each range is a dict {'label', 'start', 'end'} with start <= end, both inclusive. Ranges are
+    kept in start order; `tree` indexes their positions in `ranges` for hit-testing. Saved as
+    a CSV with 'label', 'start' and 'end' columns, which chunker.read_regions also accepts.
+    """
+
+    def __init__(self, ranges=()):
+        self.ranges = [{'label': str(r['label']), 'start': r['start'], 'end': r['end']} for r in ranges]
+        self._reindex()
+
+    def __len__(self):
+        return len(self.ranges)
+
+    def _reindex(self):
+        self.ranges.sort(key=lambda r: (r['start'], r['end']))
+        self.tree = IntervalTree((r['start'], r['end'], i) for i, r in enumerate(self.ranges))
+
+    def add(self, label, start, end):
+        """Adds a range (the bounds may come in either order). Returns the new range dict."""
+        start, end = min(start, end), max(start, end)
+        new = {'label': label, 'start': start, 'end': end}
+        self.ranges.append(new)
+        self._reindex()
+        return new
+
+    def update(self, range_, label=None, start=None, end=None):
+        """Changes the label and/or bounds of `range_` (one of `ranges`) in place."""
+        if label is not None:
+            range_['label'] = label
+        start = range_['start'] if start is None else start
+        end = range_['end'] if end is None else end
+        range_['start'], range_['end'] = min(start, end), max(start, end)
+        self._reindex()
+
+    def remove(self, range_):
+        self.ranges = [r for r in self.ranges if r is not range_]
+        self._reindex()
+
+    def position(self, range_):
+        """Position of `range_` in `ranges` (which is start order), or None."""
+        return next((i for i, r in enumerate(self.ranges) if r is range_), None)
+
+    def at(self, x, tolerance=0):
+        """Ranges within `tolerance` of `x`, shortest first (the innermost of nested ranges)."""
+        hits = [self.ranges[i] for i in self.tree.overlapping(x - tolerance, x + tolerance)]
+        return sorted(hits, key=lambda r: r['end'] - r['start'])
+
+    def overlapping(self, lo, hi):
+        """Ranges sharing at least one point with [lo, hi], in start order."""
+        return [self.ranges[i] for i in sorted(self.tree.overlapping(lo, hi))]
+
+    def extent(self):
+        """(first start, last end) over all ranges, or None if there are none."""
+        if not self.ranges:
+            return None
+        return self.ranges[0]['start'], max(r['end'] for r in self.ranges)
+
+    def windows(self, index, prefix="range", positions=None):
+        """(bounds, names) for writing every range to its own file with chunker.chunk_file: an (n, 2)
+        int array of [lo, hi) positions in `index` (a TimestampIndex) and a file name stem per range,
+        `<prefix>_<n>_<label>` with n the range's place in start order. Ranges without a row in the
+        index are left out, as are those not in `positions` (places in `ranges`), if given."""
+        bounds, names = [], []
+        for i, r in enumerate(self.ranges):
+            if positions is not None and i not in positions:
+                continue
+            lo, hi = index.bounds(r['start'], r['end'])
+            hi = min(hi, index.n_valid)
+            if hi > lo:
+                bounds.append((lo, hi))
+                names.append(f"{prefix}_{i:04d}_{safe_name(r['label'])}")
+        return np.array(bounds, dtype=np.int64).reshape(-1, 2), names
+
+    @classmethod
+    def load(cls, file_path):
+        """Reads a ranges file written by save(); a missing 'label' column labels every range "range"."""
+        df = pd.read_csv(file_path)
+        missing = {'start', 'end'} - set(df.columns)
+        if missing:
+            raise ValueError(f"Ranges file is missing column(s): {', '.join(sorted(missing))}")
+        labels = df['label'].fillna("").astype(str).tolist() if 'label' in df.columns else ["range"] * len(df)
+        return cls({'label': label, 'start': start, 'end': end}
+                   for label, start, end in zip(labels, df['start'].tolist(), df['end'].tolist()))
+
+    def save(self, file_path):
+        """Writes the ranges to `file_path`, replacing it atomically."""
+        df = pd.DataFrame({
+            'label': [r['label'] for r in self.ranges],
+            'start': [_scalar(r['start']) for r in self.ranges],
+            'end': [_scalar(r['end']) for r in self.ranges],
+        })
+        tmp_path = f"{file_path}.part"
+        df.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, file_path)
+
+
+def _scalar(value):
+    try:
+        return value.item() # NumPy scalars, so int64 timestamps are written without a float round-trip
+    except AttributeError:
+        return value
@@ -0,0 +1,142 @@
+import numpy as np
+
+EPOCH_UNITS = (1.0, 1e-3, 1e-6, 1e-9) # Seconds per unit of epoch timestamps in s, ms, us and ns
+EPOCH_SECONDS = (6.3e8, 4.1e9) # 1990 .. 2100: the range a real epoch timestamp falls in
+
+
+def epoch_seconds_per_unit(value):
+    """Seconds per unit of an epoch timestamp in s, ms, us or ns, told apart by magnitude (the
+    value must fall between 1990 and 2100), or None if `value` does not look like one."""
+    for unit in EPOCH_UNITS:
+        if EPOCH_SECONDS[0] <= abs(value) * unit < EPOCH_SECONDS[1]:
+            return unit
+    return None
+
+
+def parse_timestamp(text):
+    """Parses a timestamp typed by the user: an int when it is whole, else a float.
+    Integers are parsed exactly, so nanosecond epochs do not go through a float."""
+    text = str(text).strip()
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    value = float(text)
+    return int(value) if value.is_integer() else value
+
+
+class TimestampIndex:
+    """Sorted view of a timestamp column for O(log n) range lookups.
+
+    Built once per loaded file. Monotonic columns are searched in place; anything else
+    (out-of-order rows, NaNs) gets a precomputed stable argsort permutation instead.
+    """
+
+    def __init__(self, timestamps):
+        values = np.asarray(timestamps)
+        if np.issubdtype(values.dtype, np.datetime64):
+            values = values.astype('datetime64[ns]').view(np.int64)
+        elif not np.issubdtype(values.dtype, np.number):
+            values = values.astype(float)
+
+        self.n_rows = len(values)
+        has_nan = np.issubdtype(values.dtype, np.floating) and bool(np.isnan(values).any())
+        is_sorted = self.n_rows < 2 or bool(np.all(values[1:] >= values[:-1]))
+
+        if is_sorted and not has_nan:
+            self.order = None # Row i of the file is position i of the index
+            self.sorted_values = values
+        else:
+            self.order = np.argsort(values, kind='stable') # NaNs sort to the end
+            self.sorted_values = values[self.order]
+
+        # Positions [0, n_valid) hold real timestamps; NaNs (if any) come after them
+        self.n_valid = self.n_rows - int(np.count_nonzero(np.isnan(self.sorted_values))) if has_nan else self.n_rows
+
+    def extend(self, timestamps):
+        """Returns an index over `timestamps`, whose first n_rows values are the ones this index
+        was built over (rows appended to a growing file). O(new rows) while they keep the
+        order; otherwise the index is rebuilt."""
+        values = np.asarray(timestamps)
+        if np.issubdtype(values.dtype, np.datetime64):
+            values = values.astype('datetime64[ns]').view(np.int64)
+        elif not np.issubdtype(values.dtype, np.number):
+            values = values.astype(float)
+        new = values[self.n_rows:]
+        if self.order is not None or (np.issubdtype(new.dtype, np.floating) and np.isnan(new).any()):
+            return TimestampIndex(values)
+        if len(new) and ((self.n_rows and new[0] < self.sorted_values[-1]) or (len(new) > 1 and np.any(new[1:] < new[:-1]))):
+            return TimestampIndex(values)
+        index = TimestampIndex.__new__(TimestampIndex)
+        index.n_rows = len(values)
+        index.order = None
+        index.sorted_values = values
+        index.n_valid = len(values)
+        return index
+
+    def truncate(self, n_rows):
+        """Returns an index over the first `n_rows` rows only. O(1) for monotonic data."""
+        if n_rows >= self.n_rows:
+            return self
+        if self.order is not None:
+            return TimestampIndex(self._values()[:n_rows])
+        index = TimestampIndex.__new__(TimestampIndex)
+        index.n_rows = n_rows
+        index.order = None
+        index.sorted_values = self.sorted_values[:n_rows]
+        index.n_valid = n_rows
+        return index
+
+    def _values(self):
+        """The indexed values in file order."""
+        if self.order is None:
+            return self.sorted_values
+        values = np.empty_like(self.sorted_values)
+        values[self.order] = self.sorted_values
+        return values
+
+    @property
+    def is_monotonic(self):
+        return self.order is None
+
+    def bounds(self, start, end):
+        """Returns (lo, hi) positions in sorted order covering start <= t <= end."""
+        lo = int(np.searchsorted(self.sorted_values, start, side='left'))
+        hi = int(np.searchsorted(self.sorted_values, end, side='right'))
+        return lo, max(lo, hi)
+
+    def rows(self, start, end):
+        """Returns the file rows with start <= t <= end, in file order.
+
+        A slice for monotonic files (no data is touched), otherwise an array of row numbers.
+        """
+        return self.rows_for_positions(*self.bounds(start, end))
+
+    def rows_for_positions(self, lo, hi):
+        """Like rows(), for the sorted positions [lo, hi) instead of a timestamp range."""
+        if self.order is None:
+            return slice(lo, hi)
+        return np.sort(self.order[lo:hi])
+
+    def nearest(self, t):
+        """Returns the sorted position of the real sample closest to `t` (O(log n)), or None if there is none."""
+        if self.n_valid == 0:
+            return None
+        values = self.sorted_values[:self.n_valid]
+        pos = int(np.searchsorted(values, t, side='left'))
+        if pos >= self.n_valid:
+            return self.n_valid - 1
+        if pos > 0 and t - values[pos - 1] <= values[pos] - t:
+            return pos - 1
+        return pos
+
+    def value_at(self, pos):
+        return self.sorted_values[pos]
+
+    def row_at(self, pos):
+        """File row number of the sample at sorted position `pos`."""
+        return int(pos) if self.order is None else int(self.order[pos])
+
+    def count(self, start, end):
+        lo, hi = self.bounds(start, end)
+        return hi - lo
@@ -0,0 +1,331 @@
+import numpy as np
+import pandas as pd
+
+DEFAULT_INTERPOLATE_LIMIT = 10_000 # Longest NaN run (rows) that interpolation fills
+
+
+def _numeric_columns(block, timestamp_column):
+    return [c for c in block.columns
+            if c != timestamp_column and c != 'chunk_id' and pd.api.types.is_numeric_dtype(block[c])]
+
+
+def _timestamps(block, timestamp_column):
+    """The timestamp column as int64 (datetimes as ns) or float, plus whether it was datetime."""
+    values = block[timestamp_column].to_numpy()
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype('datetime64[ns]').view(np.int64), True
+    return values, False
+
+
+def _concat(frames):
+    frames = [f for f in frames if f is not None and len(f)]
+    if not frames:
+        return None
+    return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0].reset_index(drop=True)
+
+
+class Stage:
+    """One step of a Pipeline. Stages see the rows as a stream of blocks; any state needed to make the
+    result independent of where blocks are cut is carried over from one block to the next."""
+
+    def reset(self):
+        pass
+
+    def process(self, block, pipeline):
+        return block
+
+    def flush(self, pipeline):
+        """Returns rows held back for a following block, at the end of the stream (or None)."""
+        return None
+
+
+class Interpolate(Stage):
+    """Linear interpolation of NaN runs (against the timestamp if present, else the row position).
+    Runs longer than `limit` rows, and runs at the very start or end of the data, stay NaN.
+    Trailing NaN runs of up to `limit` rows are held back until the next block resolves them."""
+
+    def __init__(self, limit=DEFAULT_INTERPOLATE_LIMIT):
+        self.limit = int(limit)
+        self.reset()
+
+    def reset(self):
+        self.carry = None
+        self.state = {} # column -> (x, value, NaNs emitted since that value)
+        self.rows_emitted = 0
+        self.origin = None
+
+    def _x(self, block, pipeline):
+        if pipeline.timestamp_column in block.columns:
+            ts = _timestamps(block, pipeline.timestamp_column)[0]
+            if self.origin is None:
+                self.origin = ts[0] # Relative to the first timestamp: epoch ns lose precision as floats
+            return (ts - self.origin).astype(float)
+        return np.arange(self.rows_emitted, self.rows_emitted + len(block), dtype=float)
+
+    def process(self, block, pipeline, final=False):
+        buf = _concat([self.carry, block])
+        if buf is None:
+            return block
+        n = len(buf)
+        x = self._x(buf, pipeline)
+        positions = np.arange(n)
+        cut = n
+        filled = {}
+
+        for name in _numeric_columns(buf, pipeline.timestamp_column):
+            v = buf[name].to_numpy(dtype=float, na_value=np.nan)
+            valid = ~np.isnan(v)
+            state = self.state.get(name)
+            prev_valid = np.maximum.accumulate(np.where(valid, positions, -1))
+            next_valid = np.minimum.accumulate(np.where(valid, positions, n)[::-1])[::-1]
+
+            if not valid.all():
+                known_x, known_v = x[valid], v[valid]
+                if state is not None:
+                    known_x = np.concatenate(([state[0]], known_x))
+                    known_v = np.concatenate(([state[1]], known_v))
+                # Run length of each NaN, counting NaNs of the same run emitted in earlier blocks
+                run = next_valid - prev_valid - 1
+                leading = prev_valid < 0
+                if state is not None:
+                    run = np.where(leading, run + state[2], run)
+                fill = ~valid & (run <= self.limit) & (next_valid < n) & (~leading | (state is not None))
+                if len(known_x) and fill.any():
+                    v = v.copy()
+                    v[fill] = np.interp(x[fill], known_x, known_v)
+
+                last = int(prev_valid[-1])
+                if not final and run[-1] <= self.limit and (last >= 0 or state is not None):
+                    cut = min(cut, last + 1) # Could still be filled once the next value arrives
+
+            filled[name] = (v, prev_valid) # Always float, so every output block has the same column types
+
+        out = buf.iloc[:cut].copy()
+        for name, (values, _) in filled.items():
+            out[name] = values[:cut]
+
+        # Interpolation state as of the last emitted row
+        for name, (v, prev_valid) in filled.items():
+            if cut == 0:
+                break
+            p = int(prev_valid[cut - 1])
+            state = self.state.get(name)
+            if p >= 0:
+                self.state[name] = (x[p], v[p], cut - 1 - p)
+            elif state is not None:
+                self.state[name] = (state[0], state[1], state[2] + cut)
+
+        self.carry = buf.iloc[cut:].reset_index(drop=True) if cut < n else None
+        self.rows_emitted += cut
+        return out
+
+    def flush(self, pipeline):
+        if self.carry is None:
+            return None
+        carry, self.carry = self.carry, None
+        return self.process(carry, pipeline, final=True)
+
+
+class Resample(Stage):
+    """Averages the rows into fixed timestamp bins of `period` (in timestamp units, ns for datetimes),
+    aligned to multiples of the period. Empty bins become rows of NaN so the output has a fixed rate;
+    text columns keep the first value of each bin. Needs rows in timestamp order."""
+
+    def __init__(self, period):
+        if period <= 0:
+            raise ValueError("The resampling period must be positive.")
+        self.period = period
+        self.reset()
+
+    def reset(self):
+        self.carry = None
+        self.next_bin = None # First bin not emitted yet, so gaps between blocks are filled too
+
+    def process(self, block, pipeline, final=False):
+        ts_col = pipeline.timestamp_column
+        if ts_col not in block.columns:
+            raise ValueError(f"Resampling needs the '{ts_col}' column.")
+        buf = _concat([self.carry, block])
+        if buf is None:
+            return block
+        ts, is_datetime = _timestamps(buf, ts_col)
+        bins = np.floor_divide(ts, self.period).astype(np.int64)
+        if len(bins) > 1 and (np.diff(bins) < 0).any():
+            raise ValueError("Resampling needs rows in timestamp order.")
+
+        if final:
+            done = len(buf)
+        else:
+            # The last bin may continue in the next block
+            done = int(np.searchsorted(bins, bins[-1], side='left'))
+        self.carry = buf.iloc[done:].reset_index(drop=True) if done < len(buf) else None
+        if done == 0:
+            return buf.iloc[0:0]
+        return self._aggregate(buf.iloc[:done], bins[:done], is_datetime, pipeline)
+
+    def _aggregate(self, rows, bins, is_datetime, pipeline):
+        starts = np.flatnonzero(np.concatenate(([True], bins[1:] != bins[:-1])))
+        unique_bins = bins[starts]
+        first_bin = unique_bins[0] if self.next_bin is None else min(self.next_bin, unique_bins[0])
+        grid = np.arange(first_bin, unique_bins[-1] + 1)
+        slots = unique_bins - first_bin
+        self.next_bin = unique_bins[-1] + 1
+
+        out = {}
+        numeric = set(_numeric_columns(rows, pipeline.timestamp_column))
+        for name in rows.columns:
+            if name == pipeline.timestamp_column:
+                values = grid * self.period
+                out[name] = values.astype('datetime64[ns]') if is_datetime else values
+            elif name in numeric:
+                v = rows[name].to_numpy(dtype=float, na_value=np.nan)
+                valid = ~np.isnan(v)
+                sums = np.add.reduceat(np.where(valid, v, 0.0), starts)
+                counts = np.add.reduceat(valid.astype(np.int64), starts)
+                column = np.full(len(grid), np.nan)
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    column[slots] = np.where(counts > 0, sums / counts, np.nan)
+                out[name] = column
+            else:
+                column = np.full(len(grid), None, dtype=object)
+                column[slots] = rows[name].to_numpy(dtype=object)[starts]
+                out[name] = column
+        return pd.DataFrame(out, columns=rows.columns)
+
+    def flush(self, pipeline):
+        if self.carry is None:
+            return None
+        carry, self.carry = self.carry, None
+        return self.process(carry, pipeline, final=True)
+
+
+class Normalize(Stage):
+    """Z-score ('zscore') or min-max ('minmax') scaling with whole-file statistics, so every block
+    and chunk is scaled the same way. `stats` maps column names to summaries (see ColumnStats.summary)."""
+
+    def __init__(self, method, stats):
+        if method not in ('zscore', 'minmax'):
+            raise ValueError(f"Unknown normalization: {method!r} (expected 'zscore' or 'minmax').")
+        self.method = method
+        self.stats = stats
+
+    def process(self, block, pipeline):
+        block = block.copy()
+        for name in _numeric_columns(block, pipeline.timestamp_column):
+            summary = self.stats.get(name)
+            if summary is None or not summary['count']:
+                continue
+            v = block[name].to_numpy(dtype=float, na_value=np.nan)
+            if self.method == 'zscore':
+                offset, scale = summary['mean'], summary['std']
+            else:
+                offset, scale = summary['min'], summary['max'] - summary['min']
+            block[name] = (v - offset) / scale if scale else np.where(np.isnan(v), np.nan, 0.0) # Constant channels -> 0
+        return block
+
+
+class RollingMean(Stage):
+    """Trailing moving average over `window` rows (a box low-pass filter), ignoring NaNs.
+    The last window - 1 values of each column are carried over, so block edges are exact."""
+
+    def __init__(self, window):
+        self.window = int(window)
+        if self.window < 1:
+            raise ValueError("The rolling window must be at least one row.")
+        self.reset()
+
+    def reset(self):
+        self.history = {} # column -> last window - 1 values
+
+    def process(self, block, pipeline):
+        if not len(block) or self.window == 1:
+            return block
+        block = block.copy()
+        for name in _numeric_columns(block, pipeline.timestamp_column):
+            v = block[name].to_numpy(dtype=float, na_value=np.nan)
+            previous = self.history.get(name, np.empty(0))
+            extended = np.concatenate((previous, v))
+            valid = ~np.isnan(extended)
+            sums = np.concatenate(([0.0], np.cumsum(np.where(valid, extended, 0.0))))
+            counts = np.concatenate(([0], np.cumsum(valid)))
+            ends = np.arange(len(previous), len(extended)) + 1
+            starts = np.maximum(ends - self.window, 0)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                block[name] = (sums[ends] - sums[starts]) / (counts[ends] - counts[starts])
+            self.history[name] = extended[-(self.window - 1):]
+        return block
+
+
+class Pipeline:
+    """An ordered list of stages applied to each block of an export as it streams to disk.
+
+    Call reset() before each stream (write_rows does), feed blocks to process(), then write
+    whatever flush() returns. Stages only touch numeric columns other than the timestamp.
+    """
+
+    def __init__(self, stages, timestamp_column='timestamp'):
+        self.stages = stages
+        self.timestamp_column = timestamp_column
+
+    def reset(self):
+        for stage in self.stages:
+            stage.reset()
+
+    def process(self, block):
+        for stage in self.stages:
+            block = stage.process(block, self)
+        return block
+
+    def flush(self):
+        pending = None
+        for stage in self.stages:
+            parts = []
+            if pending is not None and len(pending):
+                parts.append(stage.process(pending, self))
+            parts.append(stage.flush(self))
+            pending = _concat(parts)
+        return pending
+
+    def apply(self, df):
+        """Runs the whole pipeline over one frame (e.g. a chunk window) from a fresh state."""
+        self.reset()
+        return _concat([self.process(df), self.flush()]) if len(df) else df
+
+
+STAGES = "interpolate[=max_gap_rows], resample=period, rolling=rows, zscore, minmax"
+
+
+def needs_stats(spec):
+    return any(part.strip().split('=')[0] in ('zscore', 'minmax') for part in (spec or '').split(','))
+
+
+def parse_pipeline(spec, timestamp_column='timestamp', stats=None):
+    """Builds a Pipeline from a comma-separated spec such as "interpolate,resample=1000000,rolling=5,zscore".
+    Stages run in the order given. `stats` ({name: summary}) is required for zscore/minmax.
+    Returns None for an empty spec; raises ValueError for anything it does not understand."""
+    stages = []
+    for part in (spec or '').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, arg = part.partition('=')
+        name = name.strip().lower()
+        try:
+            if name == 'interpolate':
+                stages.append(Interpolate(int(arg) if arg else DEFAULT_INTERPOLATE_LIMIT))
+            elif name == 'resample':
+                period = float(arg)
+                stages.append(Resample(int(period) if period.is_integer() else period))
+            elif name == 'rolling':
+                stages.append(RollingMean(int(arg)))
+            elif name in ('zscore', 'minmax'):
+                if stats is None:
+                    raise ValueError(f"'{name}' needs column statistics.")
+                stages.append(Normalize(name, stats))
+            else:
+                raise ValueError(f"Unknown transform {name!r} (expected {STAGES}).")
+        except (TypeError, ValueError) as e:
+            if 'expected' in str(e) or 'needs' in str(e):
+                raise
+            raise ValueError(f"Invalid transform {part!r}: {e}") from None
+    return Pipeline(stages, timestamp_column=timestamp_column) if stages else None
@@ -0,0 +1,17 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+
+@pytest.fixture
+def make_csv(tmp_path):
+    """Writes a small sensor log (integer ns timestamps plus float channels) and returns its path."""
+    def make(name="log.csv", n_rows=1000, start=0, step=1_000_000, columns=("a", "b"), seed=0):
+        rng = np.random.default_rng(seed)
+        df = pd.DataFrame({'timestamp': start + np.arange(n_rows, dtype=np.int64) * step})
+        for column in columns:
+            df[column] = rng.standard_normal(n_rows)
+        path = tmp_path / name
+        df.to_csv(path, index=False)
+        return str(path)
+    return make
@@ -1,8 +1,17 @@
+import argparse
 import tkinter as tk
 from classes.csv_plotter import CSVPlotterApp
+from classes.profiler import ENV_VAR, profiler
 
 # Main part of the application
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CSV editor for sensor logs.")
+    parser.add_argument("--profile", action="store_true", help=f"Time load, plot, draw, drag and export (also via {ENV_VAR}=1)")
+    parser.add_argument("--trace", metavar="TRACE.json", help="Also write a Chrome trace of the timings to this file (implies --profile)")
+    args = parser.parse_args()
+    if args.profile or args.trace:
+        profiler.enable(args.trace)
+
     root = tk.Tk()
     app = CSVPlotterApp(root)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
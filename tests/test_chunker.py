@@ -0,0 +1,97 @@
+import glob
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from classes.chunker import chunk_file, window_bounds
+from classes.timestamp_index import TimestampIndex
+
+
+@pytest.fixture
+def frame():
+    # Timestamps 0, 10, 20, ... with a gap between 500 and 800
+    ts = np.r_[np.arange(0, 510, 10), np.arange(800, 1010, 10)]
+    return pd.DataFrame({"ts": ts, "value": np.arange(len(ts), dtype=float)})
+
+
+def test_row_windows_with_overlap(frame):
+    index = TimestampIndex(frame["ts"])
+    bounds = window_bounds(index, window=10, stride=5)
+    assert bounds[0].tolist() == [0, 10] and bounds[1].tolist() == [5, 15]
+    assert np.all(bounds[:, 1] - bounds[:, 0] == 10)
+    assert bounds[-1, 1] <= len(frame)
+    assert len(bounds) == (len(frame) - 10) // 5 + 1
+
+
+def test_time_windows_are_half_open_and_inside_the_region(frame):
+    index = TimestampIndex(frame["ts"])
+    bounds = window_bounds(index, window=100, stride=100, unit='time', regions=[(0, 450)])
+    ts = frame["ts"].to_numpy()
+    # [0, 100), [100, 200), [200, 300), [300, 400); [400, 500) would stick out of the region
+    assert [ts[lo:hi].tolist() for lo, hi in bounds] == [list(range(t, t + 100, 10)) for t in range(0, 400, 100)]
+
+
+def test_time_windows_skip_gaps(frame):
+    index = TimestampIndex(frame["ts"])
+    bounds = window_bounds(index, window=100, stride=100, unit='time')
+    ts = frame["ts"].to_numpy()
+    starts = [ts[lo] for lo, hi in bounds]
+    assert 500 in starts and 600 not in starts and 700 not in starts # [600, 700) is empty
+    for lo, hi in bounds:
+        assert ts[hi - 1] - ts[lo] < 100
+
+
+def test_time_windows_on_unsorted_timestamps(frame):
+    shuffled = frame.sample(frac=1, random_state=0).reset_index(drop=True)
+    index = TimestampIndex(shuffled["ts"])
+    sorted_bounds = window_bounds(TimestampIndex(frame["ts"]), 100, 50, unit='time')
+    np.testing.assert_array_equal(window_bounds(index, 100, 50, unit='time'), sorted_bounds)
+
+
+def test_invalid_windows(frame):
+    index = TimestampIndex(frame["ts"])
+    with pytest.raises(ValueError):
+        window_bounds(index, 0, 1)
+    with pytest.raises(ValueError):
+        window_bounds(index, 10, 10, unit='samples')
+    assert window_bounds(index, 10_000, 1, unit='time').shape == (0, 2)
+
+
+def read_chunks(out_dir, pattern):
+    return [pd.read_csv(path) for path in sorted(glob.glob(os.path.join(out_dir, pattern)))]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_chunk_file_writes_each_window(frame, tmp_path, workers):
+    shuffled = frame.sample(frac=1, random_state=1).reset_index(drop=True)
+    index = TimestampIndex(shuffled["ts"])
+    bounds = window_bounds(index, window=100, stride=100, unit='time')
+    written = chunk_file(shuffled, index, bounds, str(tmp_path), workers=workers, tasks_per_worker=1)
+
+    chunks = read_chunks(tmp_path, "chunk_*.csv")
+    assert written == len(chunks) == len(bounds)
+    ts = np.sort(frame["ts"].to_numpy())
+    for chunk, (lo, hi) in zip(chunks, bounds):
+        assert sorted(chunk["ts"]) == ts[lo:hi].tolist()
+        assert chunk["value"].tolist() == shuffled["value"][shuffled["ts"].isin(ts[lo:hi])].tolist() # File order kept
+
+
+def test_chunk_file_shards_from_a_worker_thread(frame, tmp_path):
+    index = TimestampIndex(frame["ts"])
+    bounds = window_bounds(index, window=10, stride=10)
+    result = []
+    # The GUI calls chunk_file from a worker thread, which switches the pool to threads
+    thread = threading.Thread(target=lambda: result.append(
+        chunk_file(frame, index, bounds, str(tmp_path), workers=2, shard_size=3)))
+    thread.start()
+    thread.join()
+
+    shards = read_chunks(tmp_path, "chunk_shard_*.csv")
+    assert result == [len(bounds)]
+    assert len(shards) == -(-len(bounds) // 3)
+    combined = pd.concat(shards)
+    assert combined["chunk_id"].tolist() == np.repeat(np.arange(len(bounds)), 10).tolist()
+    assert combined["value"].tolist() == frame["value"].iloc[:len(bounds) * 10].tolist()
@@ -0,0 +1,90 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from classes.column_cache import ColumnCache
+
+
+def is_memory_mapped(values):
+    while values is not None:
+        if isinstance(values, np.memmap):
+            return True
+        values = values.base
+    return False
+
+
+def entry_size(cache, path):
+    entry_dir = cache._entry_dir(path)
+    return sum(e.stat().st_size for e in os.scandir(entry_dir))
+
+
+def test_round_trip_is_memory_mapped(tmp_path, make_csv):
+    path = make_csv()
+    cache = ColumnCache(str(tmp_path / "cache"))
+    df = pd.read_csv(path)
+    cache.store(path, df)
+
+    hit = cache.lookup(path, ["timestamp", "a"])
+    assert list(hit.columns) == ["timestamp", "a"]
+    np.testing.assert_array_equal(hit["timestamp"], df["timestamp"])
+    np.testing.assert_array_equal(hit["a"], df["a"])
+    assert is_memory_mapped(hit["a"].to_numpy())
+
+
+def test_store_merges_columns(tmp_path, make_csv):
+    path = make_csv()
+    cache = ColumnCache(str(tmp_path / "cache"))
+    df = pd.read_csv(path)
+    cache.store(path, df[["timestamp"]])
+    cache.store(path, df[["b"]])
+    assert sorted(cache.lookup(path).columns) == ["b", "timestamp"]
+
+
+def test_rewrite_with_same_size_and_mtime_is_a_miss(tmp_path, make_csv):
+    path = make_csv()
+    cache = ColumnCache(str(tmp_path / "cache"))
+    cache.store(path, pd.read_csv(path))
+    st = os.stat(path)
+
+    with open(path, 'r+b') as fh: # Same length, different bytes
+        data = bytearray(fh.read())
+        data[-3:-1] = b"99" if data[-3:-1] != b"99" else b"11"
+        fh.seek(0)
+        fh.write(data)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert os.path.getsize(path) == st.st_size
+
+    assert cache.lookup(path) is None
+    assert not os.path.exists(cache._entry_dir(path)) # The stale entry is dropped
+
+
+def test_eviction_drops_least_recently_used(tmp_path, make_csv):
+    first, second = make_csv("first.csv"), make_csv("second.csv")
+    cache = ColumnCache(str(tmp_path / "cache"))
+    cache.store(first, pd.read_csv(first))
+    cache.store(second, pd.read_csv(second))
+    # first is the older entry, but reading it makes it the most recently used one
+    os.utime(os.path.join(cache._entry_dir(first), "meta.json"), (1, 1))
+    os.utime(os.path.join(cache._entry_dir(second), "meta.json"), (2, 2))
+    assert cache.lookup(first) is not None
+
+    cache.max_bytes = max(entry_size(cache, first), entry_size(cache, second))
+    cache.evict()
+    assert cache.lookup(first) is not None
+    assert cache.lookup(second) is None
+
+
+def test_derived_data_goes_with_its_entry(tmp_path, make_csv):
+    path = make_csv()
+    cache = ColumnCache(str(tmp_path / "cache"))
+    cache.store_derived(path, "stats", {"x": np.arange(3)}) # No entry yet: ignored
+    assert cache.lookup_derived(path, "stats") is None
+
+    cache.store(path, pd.read_csv(path))
+    cache.store_derived(path, "stats", {"x": np.arange(3)})
+    np.testing.assert_array_equal(cache.lookup_derived(path, "stats")["x"], np.arange(3))
+
+    with open(path, 'a') as fh:
+        fh.write("999999999,0.0,0.0\n")
+    assert cache.lookup_derived(path, "stats") is None
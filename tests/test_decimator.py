@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from classes.decimator import minmax_decimate
+
+
+def bucket_extremes(y, n_buckets):
+    """Min and max of every bucket, computed the slow way."""
+    size = -(-len(y) // n_buckets)
+    return [(np.nanmin(y[i:i + size]), np.nanmax(y[i:i + size])) for i in range(0, len(y), size)]
+
+
+@pytest.mark.parametrize("n_rows, n_buckets", [(10_000, 100), (10_007, 64), (999, 7)])
+def test_keeps_every_bucket_extreme(n_rows, n_buckets):
+    y = np.random.default_rng(2).standard_normal(n_rows)
+    y[n_rows // 3] = 50.0 # A single-row spike must survive
+    indices = minmax_decimate(y, n_buckets)
+
+    assert np.all(np.diff(indices) > 0)
+    assert indices[0] == 0 and indices[-1] == n_rows - 1
+    assert len(indices) <= 2 * n_buckets + 2
+    assert n_rows // 3 in indices
+    kept = set(y[indices])
+    for low, high in bucket_extremes(y, n_buckets):
+        assert low in kept and high in kept
+
+
+def test_ignores_nans_unless_bucket_is_empty():
+    y = np.arange(100, dtype=float)
+    y[10:20] = np.nan # One whole bucket of NaNs
+    y[45] = np.nan
+    indices = minmax_decimate(y, 10)
+    assert 45 not in indices
+    assert {40, 49} <= set(indices) # The NaN at 45 does not hide its bucket's extremes
+    assert set(indices[np.isnan(y[indices])]) <= set(range(10, 20)) # Only the empty bucket keeps a gap row
+
+
+def test_short_input_is_returned_whole():
+    np.testing.assert_array_equal(minmax_decimate(np.ones(20), 10), np.arange(20))
+    assert len(minmax_decimate(np.empty(0), 10)) == 0
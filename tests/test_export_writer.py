@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from classes.export_writer import FAST_FLOAT_FORMAT, write_rows
+
+
+def tricky_floats(n, dtype):
+    rng = np.random.default_rng(8)
+    values = rng.standard_normal(n) * 10.0 ** rng.integers(-8, 12, n)
+    values[:12] = [np.nan, np.inf, -np.inf, 0.0, -0.0, 0.5e-6, -0.5e-6, 1.0000005, -2.4999995, 9.2e12, 1e300, -1e-300]
+    with np.errstate(over='ignore'): # 1e300 becomes inf in float32
+        return values.astype(dtype)
+
+
+@pytest.mark.parametrize("dtype", [np.float64, np.float32])
+def test_fast_floats_match_pandas(tmp_path, dtype):
+    n = 3000
+    df = pd.DataFrame({
+        "timestamp": np.arange(n, dtype=np.int64),
+        "x": tricky_floats(n, dtype),
+        "flag": np.arange(n) % 3 == 0,
+    })
+    path = tmp_path / "fast.csv"
+    write_rows(df, slice(None), str(path), block_rows=700, float_format=FAST_FLOAT_FORMAT)
+    assert path.read_text() == df.to_csv(index=False, float_format=FAST_FLOAT_FORMAT)
+
+
+def test_fast_floats_with_text_columns(tmp_path):
+    df = pd.DataFrame({
+        "x": [1.25, np.nan, -3.0],
+        "label": ["plain", "with, comma", 'with "quote"'],
+        "kind": pd.Categorical(["a", "b", "a"]),
+    })
+    path = tmp_path / "mixed.csv"
+    write_rows(df, np.array([2, 0, 1]), str(path), float_format=FAST_FLOAT_FORMAT)
+    assert path.read_text() == df.iloc[[2, 0, 1]].to_csv(index=False, float_format=FAST_FLOAT_FORMAT)
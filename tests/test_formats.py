@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from classes.export_writer import write_rows
+from classes.formats import format_for, read_columns, read_schema
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(7)
+    n = 500
+    return pd.DataFrame({
+        "timestamp": np.arange(n, dtype=np.int64) * 1_000_000 + 1_700_000_000_000_000_000,
+        "value": rng.standard_normal(n),
+        "count": rng.integers(0, 100, n),
+        "flag": rng.integers(0, 2, n).astype(bool),
+    })
+
+
+def round_trip_formats():
+    formats = ["npz"]
+    try:
+        import pyarrow # noqa: F401
+    except ImportError:
+        return formats
+    return formats + ["parquet", "feather"]
+
+
+@pytest.mark.parametrize("fmt", round_trip_formats())
+def test_round_trip(frame, tmp_path, fmt):
+    path = str(tmp_path / f"log.{fmt}")
+    rows = np.r_[5:60, 100:480] # A selection spanning several blocks
+    write_rows(frame, rows, path, block_rows=64)
+
+    expected = frame.iloc[rows].reset_index(drop=True)
+    pd.testing.assert_frame_equal(read_columns(path), expected)
+    pd.testing.assert_frame_equal(read_columns(path, ["value", "timestamp"]), expected[["value", "timestamp"]])
+
+    header, columns = read_schema(path)
+    assert header == list(frame.columns)
+    assert columns["timestamp"]["dtype"] == "int64"
+
+
+@pytest.mark.parametrize("fmt", round_trip_formats())
+def test_time_range_filter(frame, tmp_path, fmt):
+    path = str(tmp_path / f"log.{fmt}")
+    write_rows(frame, slice(None), path)
+    start, end = frame["timestamp"].iloc[[10, 20]]
+    out = read_columns(path, ["value"], time_range=(start, end), timestamp_column="timestamp")
+    assert out["value"].tolist() == frame["value"].iloc[10:21].tolist() # Both ends inclusive
+    assert list(out.columns) == ["value"]
+
+
+@pytest.mark.parametrize("fmt", round_trip_formats())
+def test_datetime_column(tmp_path, fmt):
+    times = pd.date_range("2024-01-01", periods=50, freq="ms")
+    df = pd.DataFrame({"timestamp": times, "value": np.arange(50.0)})
+    path = str(tmp_path / f"log.{fmt}")
+    write_rows(df, slice(None), path)
+    out = read_columns(path, time_range=(times[3].value, times[7].value), timestamp_column="timestamp")
+    assert out["value"].tolist() == [3.0, 4.0, 5.0, 6.0, 7.0]
+    assert out["timestamp"].astype("datetime64[ns]").tolist() == list(times[3:8])
+
+
+def test_empty_selection_still_writes_columns(frame, tmp_path):
+    path = str(tmp_path / "empty.npz")
+    write_rows(frame, np.empty(0, dtype=int), path)
+    out = read_columns(path)
+    assert len(out) == 0 and list(out.columns) == list(frame.columns)
+
+
+def test_csv_round_trip(frame, tmp_path):
+    path = str(tmp_path / "log.csv.gz")
+    write_rows(frame, slice(None), path, block_rows=100)
+    pd.testing.assert_frame_equal(pd.read_csv(path), frame, rtol=1e-12)
+
+
+def test_format_for():
+    assert [format_for(p) for p in ("a.PARQUET", "a.pq", "a.arrow", "a.npz", "a.csv.gz", "a.txt")] == \
+        ["parquet", "parquet", "feather", "npz", "csv", "csv"]
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from classes.lod_pyramid import LodPyramid
+
+
+@pytest.fixture
+def column():
+    y = np.cumsum(np.random.default_rng(3).standard_normal(50_000))
+    y[np.random.default_rng(4).choice(len(y), 500, replace=False)] = np.nan
+    return y
+
+
+def test_levels_summarise_their_buckets(column):
+    pyramid = LodPyramid.build(column)
+    assert pyramid.levels[-1]["min_idx"].shape == (1,)
+    top = pyramid.levels[-1]
+    assert column[top["min_idx"][0]] == np.nanmin(column)
+    assert column[top["max_idx"][0]] == np.nanmax(column)
+    assert top["count"][0] == np.count_nonzero(~np.isnan(column))
+    assert top["sum"][0] == pytest.approx(np.nansum(column))
+
+    level = pyramid.levels[1]
+    size = level["size"]
+    for bucket in (0, 7, len(level["min_idx"]) - 1):
+        part = column[bucket * size:(bucket + 1) * size]
+        assert column[level["min_idx"][bucket]] == np.nanmin(part)
+        assert column[level["max_idx"][bucket]] == np.nanmax(part)
+        assert pyramid.mean(1)[bucket] == pytest.approx(np.nanmean(part))
+
+
+def test_window_keeps_the_window_extremes(column):
+    pyramid = LodPyramid.build(column)
+    rng = np.random.default_rng(5)
+    checked = 0
+    while checked < 200:
+        start, stop = sorted(rng.integers(0, len(column) + 1, 2))
+        indices = pyramid.window_indices(column, start, stop, n_buckets=50)
+        if indices is None:
+            assert stop - start < pyramid.base * 50
+            continue
+        checked += 1
+        assert indices[0] == start and indices[-1] == stop - 1
+        assert np.all(np.diff(indices) > 0)
+        window = column[start:stop]
+        kept = column[indices]
+        assert np.nanmin(kept) == np.nanmin(window)
+        assert np.nanmax(kept) == np.nanmax(window)
+
+
+def test_array_round_trip(column, tmp_path):
+    pyramid = LodPyramid.build(column)
+    path = tmp_path / "pyramid.npz"
+    np.savez(path, **pyramid.to_arrays())
+    with np.load(path) as arrays:
+        loaded = LodPyramid.from_arrays(dict(arrays))
+
+    assert (loaded.n_rows, loaded.base, loaded.factor) == (pyramid.n_rows, pyramid.base, pyramid.factor)
+    assert len(loaded.levels) == len(pyramid.levels)
+    np.testing.assert_array_equal(loaded.window_indices(column, 123, 45_678, 40),
+                                  pyramid.window_indices(column, 123, 45_678, 40))
+
+
+def test_empty_column():
+    pyramid = LodPyramid.build(np.empty(0))
+    assert pyramid.levels == []
+    assert pyramid.window_indices(np.empty(0), 0, 0, 10) is None
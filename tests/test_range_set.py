@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from classes.chunker import read_regions
+from classes.range_set import IntervalTree, RangeSet, safe_name, sidecar_path
+from classes.timestamp_index import TimestampIndex
+
+
+def brute_force(intervals, lo, hi):
+    return sorted(key for start, end, key in intervals if start <= hi and end >= lo)
+
+
+@pytest.mark.parametrize("n", [0, 1, 2, 50, 500])
+def test_tree_matches_brute_force(n):
+    rng = np.random.default_rng(n)
+    starts = rng.integers(0, 1000, n)
+    intervals = [(int(s), int(s + w), i) for i, (s, w) in enumerate(zip(starts, rng.integers(0, 100, n)))]
+    intervals.append((5, 5, -1)) # A single point
+    tree = IntervalTree(intervals)
+    assert len(tree) == len(intervals)
+
+    for lo in list(rng.integers(-50, 1150, 100)) + [5]:
+        for hi in (lo, lo + 1, lo + 37, lo + 400):
+            assert sorted(tree.overlapping(lo, hi)) == brute_force(intervals, lo, hi)
+        assert sorted(tree.at(lo)) == brute_force(intervals, lo, lo)
+
+
+def test_tree_drops_reversed_intervals():
+    assert IntervalTree([(3, 1, "bad")]).at(2) == []
+
+
+def test_range_set_queries():
+    ranges = RangeSet()
+    outer = ranges.add("outer", 100, 0) # Bounds in either order
+    inner = ranges.add("inner", 40, 60)
+    late = ranges.add("late", 200, 300)
+    assert outer['start'] == 0 and outer['end'] == 100
+    assert ranges.at(50) == [inner, outer] # Innermost first
+    assert ranges.at(150) == []
+    assert ranges.at(105, tolerance=5) == [outer]
+    assert ranges.overlapping(90, 250) == [outer, late]
+    assert ranges.extent() == (0, 300)
+
+    ranges.update(inner, start=150, label="moved")
+    assert ranges.at(150) == [inner] and inner['label'] == "moved"
+    ranges.remove(late)
+    assert ranges.at(250) == [] and len(ranges) == 2
+
+
+def test_windows_and_names():
+    index = TimestampIndex(np.arange(0, 100, 10)) # 0, 10, ..., 90
+    ranges = RangeSet([{'label': "a/b c", 'start': 15, 'end': 40},
+                       {'label': "none", 'start': 91, 'end': 99}, # No rows
+                       {'label': "all", 'start': -5, 'end': 500}])
+    bounds, names = ranges.windows(index, prefix="ev")
+    assert bounds.tolist() == [[0, 10], [2, 5]] # [20, 30, 40] inclusive of the end
+    assert names == ["ev_0000_all", "ev_0001_a_b_c"]
+
+    bounds, names = ranges.windows(index, positions={1, 2})
+    assert bounds.tolist() == [[2, 5]] and names == ["range_0001_a_b_c"]
+
+
+def test_save_load_round_trip(tmp_path):
+    big = 1_700_000_000_123_456_789
+    ranges = RangeSet([{'label': "first", 'start': np.int64(big), 'end': np.int64(big + 1)},
+                       {'label': "second, quoted", 'start': 5, 'end': 9}])
+    path = str(tmp_path / "log.csv.ranges.csv")
+    ranges.save(path)
+
+    loaded = RangeSet.load(path)
+    assert loaded.ranges == [{'label': "second, quoted", 'start': 5, 'end': 9},
+                             {'label': "first", 'start': big, 'end': big + 1}] # Exact int64 bounds
+    assert read_regions(path) == [(5, 9), (big, big + 1)]
+
+
+def test_load_rejects_files_without_bounds(tmp_path):
+    path = tmp_path / "bad.csv"
+    path.write_text("label,start\nx,1\n")
+    with pytest.raises(ValueError):
+        RangeSet.load(str(path))
+
+
+def test_names_and_sidecars():
+    assert safe_name("..weird/label?") == "weird_label"
+    assert safe_name("///") == "range"
+    assert sidecar_path("data/log.csv") == "data/log.csv.ranges.csv"
+    assert sidecar_path("data/*.csv") == "data/session.ranges.csv"
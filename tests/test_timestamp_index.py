@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from classes.timestamp_index import TimestampIndex, epoch_seconds_per_unit, parse_timestamp
+
+
+def mask_rows(values, start, end):
+    values = np.asarray(values, dtype=float)
+    return np.flatnonzero((values >= start) & (values <= end))
+
+
+def as_rows(rows, n_rows):
+    return np.arange(n_rows)[rows] if isinstance(rows, slice) else rows
+
+
+@pytest.mark.parametrize("kind", ["sorted", "shuffled", "duplicates", "nan"])
+def test_rows_match_boolean_mask(kind):
+    rng = np.random.default_rng(1)
+    values = np.arange(2000, dtype=float) * 0.5
+    if kind == "shuffled":
+        rng.shuffle(values)
+    elif kind == "duplicates":
+        values = np.repeat(values[:500], 4)
+    elif kind == "nan":
+        values[rng.choice(len(values), 100, replace=False)] = np.nan
+        rng.shuffle(values)
+    index = TimestampIndex(values)
+    assert index.is_monotonic == (kind in ("sorted", "duplicates"))
+
+    for start, end in [(-5, -1), (0, 0), (10.25, 10.75), (100, 400.5), (999, 5000), (300, 200)]:
+        rows = as_rows(index.rows(start, end), len(values))
+        np.testing.assert_array_equal(rows, mask_rows(values, start, end))
+        assert index.count(start, end) == len(rows)
+
+
+def test_monotonic_ranges_are_slices():
+    index = TimestampIndex(np.arange(100))
+    assert index.rows(10, 20) == slice(10, 21)
+
+
+def test_nan_rows_sort_last():
+    index = TimestampIndex([3.0, np.nan, 1.0, 2.0])
+    assert index.n_valid == 3
+    assert [index.row_at(pos) for pos in range(3)] == [2, 3, 0]
+
+
+def test_datetime_timestamps():
+    times = pd.date_range("2024-01-01", periods=10, freq="s")
+    index = TimestampIndex(times)
+    start, end = times[2].value, times[4].value
+    assert index.rows(start, end) == slice(2, 5)
+
+
+def test_nearest():
+    index = TimestampIndex([0, 10, 20, 30])
+    assert [index.nearest(t) for t in (-5, 4, 6, 15, 29, 100)] == [0, 0, 1, 1, 3, 3]
+
+
+def test_extend_and_truncate():
+    index = TimestampIndex(np.arange(10))
+    grown = index.extend(np.arange(15))
+    assert grown.is_monotonic and grown.rows(8, 12) == slice(8, 13)
+    rebuilt = index.extend(np.r_[np.arange(10), [5, 20]])
+    np.testing.assert_array_equal(as_rows(rebuilt.rows(5, 5), 12), [5, 10])
+    assert TimestampIndex(np.arange(10)).truncate(4).rows(0, 100) == slice(0, 4)
+
+
+def test_parse_timestamp_keeps_large_integers_exact():
+    assert parse_timestamp(" 1700000000123456789 ") == 1700000000123456789
+    assert parse_timestamp("12.0") == 12
+    assert parse_timestamp("1.5") == 1.5
+
+
+def test_epoch_units_by_magnitude():
+    seconds = 1_700_000_000
+    assert epoch_seconds_per_unit(seconds) == 1.0
+    assert epoch_seconds_per_unit(seconds * 10 ** 3) == 1e-3
+    assert epoch_seconds_per_unit(seconds * 10 ** 6) == 1e-6
+    assert epoch_seconds_per_unit(seconds * 10 ** 9) == 1e-9
+    assert epoch_seconds_per_unit(12345) is None
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from classes.export_writer import write_rows
+from classes.transforms import parse_pipeline
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(6)
+    n = 1000
+    ts = np.cumsum(rng.integers(1, 30, n)) # Irregular sampling
+    a = rng.standard_normal(n)
+    a[rng.choice(n, 80, replace=False)] = np.nan
+    a[400:460] = np.nan # A long gap
+    b = np.cumsum(rng.standard_normal(n))
+    return pd.DataFrame({"timestamp": ts, "a": a, "b": b})
+
+
+def stats_for(df):
+    return {name: {"count": int(df[name].count()), "mean": df[name].mean(), "std": df[name].std(),
+                   "min": df[name].min(), "max": df[name].max()} for name in ("a", "b")}
+
+
+SPECS = ["interpolate", "interpolate=20", "resample=100", "rolling=7", "zscore", "minmax",
+         "interpolate,resample=250,rolling=3,zscore"]
+
+
+@pytest.mark.parametrize("spec", SPECS)
+def test_output_does_not_depend_on_block_size(frame, tmp_path, spec):
+    transform = parse_pipeline(spec, "timestamp", stats_for(frame))
+    expected = transform.apply(frame).reset_index(drop=True)
+
+    for block_rows in (5, 64, 333, 10_000):
+        path = tmp_path / f"out_{block_rows}.csv"
+        write_rows(frame, slice(0, len(frame)), str(path), block_rows=block_rows, transform=transform)
+        pd.testing.assert_frame_equal(pd.read_csv(path), expected, check_dtype=False, rtol=1e-9)
+
+
+def test_interpolate_respects_gap_limit(frame):
+    out = parse_pipeline("interpolate=20", "timestamp").apply(frame)
+    assert out["a"].iloc[400:460].isna().all() # Longer than the limit: left alone
+    assert out["a"].iloc[:400].notna().all()
+
+
+def test_rolling_mean_matches_pandas(frame):
+    out = parse_pipeline("rolling=5", "timestamp").apply(frame)
+    np.testing.assert_allclose(out["b"], frame["b"].rolling(5, min_periods=1).mean())
+    assert out["timestamp"].tolist() == frame["timestamp"].tolist()
+
+
+def test_parse_errors():
+    assert parse_pipeline("") is None
+    for spec in ("smooth", "rolling=x", "rolling=0", "zscore"):
+        with pytest.raises(ValueError):
+            parse_pipeline(spec)